@@ -0,0 +1,301 @@
+################################################################
+#
+#                   DHCP STREAM FACTORY
+#
+# What this script shows you how to configure DHCP DISCOVER
+# streams of many clients on many ports.
+#
+# What this script example does:
+# 1. Compile the Ethernet/IPv4/UDP/DHCP header and the DHCP
+#    options once into a byte template, with the offsets of the
+#    client MAC, chaddr, xid and client identifier fields
+# 2. Plan the client streams. A stream sends a block of clients
+#    from a template patched with the first client, and four
+#    modifiers count the lowest two bytes of the source MAC,
+#    chaddr, client identifier and xid. If the ports do not have
+#    enough modifiers, every client gets its own stream with a
+#    patched template.
+# 3. Create the streams across the ports and configure all of
+#    them in one pipelined batch
+#
+################################################################
+
+import asyncio
+
+from xoa_driver import testers
+from xoa_driver import modules
+from xoa_driver import enums
+from xoa_driver import utils
+from xoa_driver.hlfuncs import mgmt, headers
+from xoa_driver.misc import Hex
+import logging
+import time
+from typing import Any, NamedTuple
+
+#---------------------------
+# GLOBAL PARAMS
+#---------------------------
+CHASSIS_IP = "10.165.136.70"
+USERNAME = "XOA"
+TX_PORTS = ["3/1", "3/2"]
+CLIENTS = 4096
+CLIENTS_PER_STREAM = 256        # Clients of a stream counted by modifiers, at most 65536
+CLIENT_MAC_BASE = "aaaa.aaaa.0000"
+XID_BASE = 0x00003D1D
+CLIENT_PPS = 1                  # DISCOVER packets per second of each client
+FRAME_SIZE = 314
+PARAM_REQUEST_LIST = [1, 3, 6, 42]
+
+# Set to True to log how long it takes to build the headers of BENCHMARK_CLIENTS clients.
+RUN_BENCHMARK = False
+BENCHMARK_CLIENTS = 4096
+
+#---------------------------
+# DhcpTemplate
+#---------------------------
+MAC_FIELDS = ("eth_src", "chaddr", "client_id")
+DHCP_MODIFIERS = len(MAC_FIELDS) + 1        # the MAC fields and xid
+DHCP_SEGMENTS = [
+    enums.ProtocolOption.ETHERNET,
+    enums.ProtocolOption.IP,
+    enums.ProtocolOption.UDP,
+    enums.ProtocolOption.DHCPV4,
+]
+
+
+class DhcpTemplate(NamedTuple):
+    header: bytes
+    offsets: dict[str, int]     # byte offsets of the MAC fields and xid in the header
+    frame_size: int
+
+    def patch(self, mac: int, xid: int) -> bytes:
+        """The header of a client."""
+        header = bytearray(self.header)
+        mac_bytes = mac.to_bytes(6, "big")
+        for field in MAC_FIELDS:
+            header[self.offsets[field]:self.offsets[field] + 6] = mac_bytes
+        header[self.offsets["xid"]:self.offsets["xid"] + 4] = xid.to_bytes(4, "big")
+        return bytes(header)
+
+
+def compile_dhcp_template(req_list: list[int], frame_size: int) -> DhcpTemplate:
+    """DHCP DISCOVER header with all client fields zero, built once from the header objects."""
+    dhcp_options = [
+        headers.DHCPOptionMessageType(),
+        headers.DHCPOptionClientIdentifier(),
+        headers.DHCPOptionRequestedIP(),
+        headers.DHCPOptionParamRequestList(req_list=list(req_list)),
+        headers.DHCPOptionEnd(),
+    ]
+    eth_length, ip_length, udp_length, dhcp_length = 14, 20, 8, 240
+    options_length = sum(len(str(o)) // 2 for o in dhcp_options)
+    header_length = eth_length + ip_length + udp_length + dhcp_length + options_length
+    frame_size = max(frame_size, header_length + 4)
+
+    eth = headers.Ethernet()
+    eth.dst_mac = "ffff.ffff.ffff"
+    eth.ethertype = headers.EtherType.IPv4
+
+    ip = headers.IPV4()
+    ip.src = "0.0.0.0"
+    ip.dst = "255.255.255.255"
+    ip.total_length = frame_size - eth_length - 4
+    ip.proto = headers.IPProtocol.UDP
+
+    udp = headers.UDP()
+    udp.src_port = 68
+    udp.dst_port = 67
+    udp.length = ip.total_length - ip_length
+
+    dhcp = headers.DHCPV4()
+
+    dhcp_offset = eth_length + ip_length + udp_length
+    options_offset = dhcp_offset + dhcp_length
+    offsets = {
+        "eth_src": 6,
+        "xid": dhcp_offset + 4,
+        "chaddr": dhcp_offset + 28,
+        # code, length and hardware type precede the MAC of the client identifier option
+        "client_id": options_offset + len(str(dhcp_options[0])) // 2 + 3,
+    }
+    header = bytes.fromhex(str(eth) + str(ip) + str(udp) + str(dhcp) + "".join(str(o) for o in dhcp_options))
+    return DhcpTemplate(header=header, offsets=offsets, frame_size=frame_size)
+
+#---------------------------
+# plan_client_streams
+#---------------------------
+class DhcpStreamPlan(NamedTuple):
+    first_client: int
+    client_count: int
+    header: bytes
+    modifiers: list[tuple[int, int, int]]       # (position, min_val, max_val) of INC modifiers on 16 bits
+
+
+def plan_client_streams(template: DhcpTemplate, clients: int, mac_base: int, xid_base: int, clients_per_stream: int, use_modifiers: bool) -> list[DhcpStreamPlan]:
+    """The streams of the clients: blocks of clients counted by modifiers, or one stream per client.
+
+    A block does not cross a 65536 boundary of the lowest two bytes of the MAC or the xid,
+    since a 16-bit modifier cannot carry into the upper bytes.
+    """
+    plans = []
+    client = 0
+    while client < clients:
+        mac, xid = mac_base + client, (xid_base + client) & 0xFFFF_FFFF
+        if use_modifiers:
+            count = min(clients_per_stream, clients - client, 0x10000 - (mac & 0xFFFF), 0x10000 - (xid & 0xFFFF))
+        else:
+            count = 1
+        modifiers = []
+        if count > 1:
+            modifiers = [(template.offsets[field] + 4, mac & 0xFFFF, (mac & 0xFFFF) + count - 1) for field in MAC_FIELDS]
+            modifiers.append((template.offsets["xid"] + 2, xid & 0xFFFF, (xid & 0xFFFF) + count - 1))
+        plans.append(DhcpStreamPlan(client, count, template.patch(mac, xid), modifiers))
+        client += count
+    return plans
+
+#---------------------------
+# configure_client_streams
+#---------------------------
+async def configure_client_streams(port_objs: list[Any], plans: list[DhcpStreamPlan], template: DhcpTemplate, client_pps: int, max_streams_per_port: int) -> None:
+    """Create the streams evenly across the ports and configure all of them in one batch."""
+    per_port = -(-len(plans) // len(port_objs))
+    if per_port > max_streams_per_port:
+        raise ValueError(f"{len(plans)} streams do not fit in {len(port_objs)} ports of {max_streams_per_port} streams")
+    port_plans = [plans[i * per_port:(i + 1) * per_port] for i in range(len(port_objs))]
+
+    # creating a stream and adding modifiers need the replies, the rest is pipelined
+    async def create(port_obj: Any, count: int) -> list[Any]:
+        return [await port_obj.streams.create() for _ in range(count)]
+
+    stream_objs = await asyncio.gather(*[create(port_obj, len(p)) for port_obj, p in zip(port_objs, port_plans)])
+    pairs = [pair for streams, p in zip(stream_objs, port_plans) for pair in zip(streams, p)]
+    await asyncio.gather(*[stream.packet.header.modifiers.configure(len(plan.modifiers)) for stream, plan in pairs if plan.modifiers])
+
+    tokens = []
+    for stream, plan in pairs:
+        tokens += [
+            stream.tpld_id.set(test_payload_identifier=-1),
+            stream.enable.set_on(),
+            stream.comment.set(comment=f"DHCP clients {plan.first_client}-{plan.first_client + plan.client_count - 1}"),
+            stream.rate.pps.set(stream_rate_pps=client_pps * plan.client_count),
+            stream.packet.length.set(length_type=enums.LengthType.FIXED, min_val=template.frame_size, max_val=template.frame_size),
+            stream.payload.content.set(payload_type=enums.PayloadType.PATTERN, hex_data=Hex("00")),
+            stream.packet.header.protocol.set(segments=DHCP_SEGMENTS),
+            stream.packet.header.data.set(hex_data=Hex(plan.header.hex().upper())),
+        ]
+        for i, (position, min_val, max_val) in enumerate(plan.modifiers):
+            modifier = stream.packet.header.modifiers.obtain(i)
+            tokens += [
+                modifier.specification.set(position=position, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1),
+                modifier.range.set(min_val=min_val, step=1, max_val=max_val),
+            ]
+    async for _ in utils.apply_iter(*tokens):
+        pass
+
+#---------------------------
+# benchmark_header_builder
+#---------------------------
+def benchmark_header_builder(clients: int, mac_base: int, xid_base: int) -> None:
+    """Compare building every client header from the header objects with patching the compiled template."""
+    _t0 = time.perf_counter()
+    eth, ip, udp, dhcp = headers.Ethernet(), headers.IPV4(), headers.UDP(), headers.DHCPV4()
+    eth.dst_mac, eth.ethertype = "ffff.ffff.ffff", headers.EtherType.IPv4
+    ip.dst, ip.total_length, ip.proto = "255.255.255.255", FRAME_SIZE - 18, headers.IPProtocol.UDP
+    udp.src_port, udp.dst_port, udp.length = 68, 67, FRAME_SIZE - 38
+    client_id = headers.DHCPOptionClientIdentifier()
+    for _client in range(clients):
+        _mac = f"{mac_base + _client:012X}"
+        eth.src_mac, dhcp.chaddr, client_id.client_mac = _mac, _mac, _mac
+        dhcp.xid = f"{xid_base + _client:08X}"
+        Hex(str(eth) + str(ip) + str(udp) + str(dhcp) + str(headers.DHCPOptionMessageType()) + str(client_id)
+            + str(headers.DHCPOptionRequestedIP()) + str(headers.DHCPOptionParamRequestList(req_list=PARAM_REQUEST_LIST)) + str(headers.DHCPOptionEnd()))
+    _t1 = time.perf_counter()
+    template = compile_dhcp_template(PARAM_REQUEST_LIST, FRAME_SIZE)
+    for _client in range(clients):
+        Hex(template.patch(mac_base + _client, xid_base + _client).hex().upper())
+    _t2 = time.perf_counter()
+    plans = plan_client_streams(template, clients, mac_base, xid_base, CLIENTS_PER_STREAM, use_modifiers=True)
+    _t3 = time.perf_counter()
+    logging.info(f"{clients} clients: header objects {(_t1-_t0)*1000:.1f} ms, patched template {(_t2-_t1)*1000:.1f} ms, {len(plans)} modifier streams {(_t3-_t2)*1000:.1f} ms")
+
+#---------------------------
+# dhcp_stream_factory
+#---------------------------
+async def dhcp_stream_factory(chassis: str, username: str, port_strs: list[str], clients: int, clients_per_stream: int, mac_base: str, xid_base: int, client_pps: int):
+    # configure basic logger
+    logging.basicConfig(
+        format="%(asctime)s  %(message)s",
+        level=logging.DEBUG,
+        handlers=[
+            logging.FileHandler(filename="test.log", mode="a"),
+            logging.StreamHandler()]
+        )
+    _mac_base = int(mac_base.replace(".", "").replace(":", "").replace("-", ""), 16)
+    if RUN_BENCHMARK:
+        benchmark_header_builder(BENCHMARK_CLIENTS, _mac_base, xid_base)
+
+    template = compile_dhcp_template(PARAM_REQUEST_LIST, FRAME_SIZE)
+
+    # Establish connection to a Valkyrie tester using Python context manager
+    # The connection will be automatically terminated when it is out of the block
+    async with testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False) as tester:
+        logging.info(f"===================================")
+        logging.info(f"{'Connect to chassis:':<20}{chassis}")
+        logging.info(f"{'Username:':<20}{username}")
+
+        port_objs = []
+        for port_str in port_strs:
+            _mid = int(port_str.split("/")[0])
+            _pid = int(port_str.split("/")[1])
+            module_obj = tester.modules.obtain(_mid)
+            if isinstance(module_obj, modules.E100ChimeraModule):
+                logging.info(f"Module {_mid} is a Chimera module, skip port {port_str}")
+                continue
+            port_objs.append(module_obj.ports.obtain(_pid))
+
+        # reserve and reset the ports in parallel
+        await asyncio.gather(*[mgmt.reserve_ports(ports=[port_obj], reset=True) for port_obj in port_objs])
+        await asyncio.gather(*[
+            utils.apply(
+                port_obj.interframe_gap.set(min_byte_count=20),
+                port_obj.loopback.set(mode=enums.LoopbackMode.NONE),
+                port_obj.max_header_length.set(max_header_length=512),
+            )
+            for port_obj in port_objs
+        ])
+
+        # the modifiers are used if every port has enough of them
+        capabilities = [r async for r in utils.apply_iter(*[port_obj.capabilities.get() for port_obj in port_objs])]
+        use_modifiers = all(c.max_modifiers >= DHCP_MODIFIERS for c in capabilities)
+        plans = plan_client_streams(template, clients, _mac_base, xid_base, clients_per_stream, use_modifiers)
+        logging.info(f"{clients} clients in {len(plans)} streams {'with' if use_modifiers else 'without'} modifiers")
+
+        _t0 = time.perf_counter()
+        await configure_client_streams(port_objs, plans, template, client_pps, min(c.max_streams_per_port for c in capabilities))
+        logging.info(f"Configured {len(plans)} streams on {len(port_objs)} ports in {(time.perf_counter()-_t0)*1000:.1f} ms")
+
+        #################################################
+        #                  Release                      #
+        #################################################
+        # Release the ports
+        await mgmt.release_ports(ports=port_objs)
+
+
+async def main():
+    stop_event = asyncio.Event()
+    try:
+        await dhcp_stream_factory(
+            chassis=CHASSIS_IP,
+            username=USERNAME,
+            port_strs=TX_PORTS,
+            clients=CLIENTS,
+            clients_per_stream=CLIENTS_PER_STREAM,
+            mac_base=CLIENT_MAC_BASE,
+            xid_base=XID_BASE,
+            client_pps=CLIENT_PPS,
+        )
+    except KeyboardInterrupt:
+        stop_event.set()
+
+if __name__ == "__main__":
+    asyncio.run(main())
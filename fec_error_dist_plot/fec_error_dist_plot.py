@@ -26,7 +26,6 @@ import math
 
 import matplotlib.pyplot as plt
 import numpy as np
-from collections import deque
 
 #---------------------------
 # GLOBAL PARAMS
@@ -43,6 +42,108 @@ FEC_MODE = enums.FECMode.ON # either RS FEC KR or KP. Determined by the port aut
 # FEC_MODE = enums.FECMode.FC_FEC
 # FEC_MODE = enums.FECMode.RS_FEC_INT
         
+#---------------------------
+# FecErrorDistAccumulator
+#---------------------------
+class FecErrorDistAccumulator:
+    """Per-port Pre-FEC symbol error histograms kept in one NumPy array (ports x bins).
+
+    Bin j counts codewords with j symbol errors, the last bin counts codewords with more errors than the FEC can correct.
+    """
+
+    def __init__(self, port_count: int, bin_count: int) -> None:
+        self.counts = np.zeros((port_count, bin_count), dtype=np.int64)
+        self.overflow_bin = bin_count - 1
+        self.max_correctable = bin_count - 2
+
+    def add(self, port_index: int, stats: list[int]) -> None:
+        self.counts[port_index] += np.asarray(stats[:self.counts.shape[1]], dtype=np.int64)
+
+    def log10(self) -> np.ndarray:
+        """log10 of all bins, 0 for empty bins."""
+        return np.log10(self.counts, out=np.zeros(self.counts.shape, dtype=np.float64), where=self.counts > 0)
+
+    def margin(self) -> tuple[np.ndarray, np.ndarray]:
+        """FEC margin metrics for all ports.
+
+        :return: a tuple of two arrays:
+            * symbol error margin, i.e. the number of correctable symbols minus the highest observed symbol error count (-1 if there are uncorrectable codewords),
+            * extrapolated log10 count of uncorrectable codewords, from a straight-line fit of log10(count) against symbol errors
+              over the non-empty bins with at least one symbol error (NaN if fewer than two such bins).
+        """
+        _tail = self.counts[:, 1:self.overflow_bin]
+        _x = np.arange(1, self.overflow_bin, dtype=np.float64)
+        _nonzero = _tail > 0
+        _highest = np.where(_nonzero.any(axis=1), self.max_correctable - np.argmax(_nonzero[:, ::-1], axis=1), 0)
+        _symbol_margin = np.where(self.counts[:, -1] > 0, -1, self.max_correctable - _highest)
+
+        # least squares on masked bins, solved for all ports at once
+        _w = _nonzero.astype(np.float64)
+        _y = np.log10(_tail, out=np.zeros(_tail.shape, dtype=np.float64), where=_nonzero)
+        _n = _w.sum(axis=1)
+        _sx = (_w * _x).sum(axis=1)
+        _sy = (_w * _y).sum(axis=1)
+        _sxx = (_w * _x * _x).sum(axis=1)
+        _sxy = (_w * _x * _y).sum(axis=1)
+        _den = _n * _sxx - _sx * _sx
+        _valid = (_n >= 2) & (_den != 0)
+        _den = np.where(_valid, _den, 1.0)
+        _slope = (_n * _sxy - _sx * _sy) / _den
+        _intercept = (_sy - _slope * _sx) / np.where(_valid, _n, 1.0)
+        _uncorrectable_log10 = np.where(_valid, _intercept + _slope * self.overflow_bin, np.nan)
+        return _symbol_margin, _uncorrectable_log10
+
+#---------------------------
+# query_fec_status
+#---------------------------
+async def query_fec_status(port_objs: list) -> list[tuple]:
+    """Query FEC totals and symbol error distribution of all ports in one batch."""
+    _tokens = []
+    for p in port_objs:
+        _tokens.append(p.layer1.pcs_fec.fec_symbol_status.total_status.get())
+        _tokens.append(p.layer1.pcs_fec.fec_symbol_status.fec_status.get())
+    _resp = await utils.apply(*_tokens)
+    return [(_resp[2*i], _resp[2*i+1]) for i in range(len(port_objs))]
+
+#---------------------------
+# FecDistRenderer
+#---------------------------
+class FecDistRenderer:
+    """Bar charts of the log10 distributions, created once. Each refresh only touches the bars and labels whose value changed."""
+
+    def __init__(self, axes: list, bin_count: int) -> None:
+        _n = bin_count - 1
+        x_axis = [str(x) for x in range(_n)]
+        x_axis.append(f"> {_n-1}")
+        color_array = ['y']*(_n-1)
+        color_array.insert(0, 'g')
+        color_array.append('r')
+        self.axes = axes
+        self.bars = []
+        self.labels = []
+        self.texts = []
+        self.heights = np.full((len(axes), bin_count), np.nan)
+        for ax in axes:
+            _bars = ax.bar(x=x_axis, height=[0]*bin_count, color=color_array)
+            self.bars.append(_bars)
+            self.labels.append(ax.bar_label(container=_bars, fmt='%.1f'))
+            self.texts.append(ax.text(0.6, 0.9, "", fontsize="small", transform=ax.transAxes))
+
+    def update(self, heights: np.ndarray, texts: list[str]) -> None:
+        _changed = heights != self.heights
+        for i in np.flatnonzero(_changed.any(axis=1)):
+            for j in np.flatnonzero(_changed[i]):
+                self.bars[i][j].set_height(heights[i, j])
+                self.labels[i][j].set_text(f"{heights[i, j]:.1f}")
+                self.labels[i][j].xy = (self.labels[i][j].xy[0], heights[i, j])
+            _top = heights[i].max()
+            if _top >= self.axes[i].get_ylim()[1]:
+                self.axes[i].set_ylim(0, _top + 1)
+        self.heights = heights.copy()
+        for _text, _s in zip(self.texts, texts):
+            if _text.get_text() != _s:
+                _text.set_text(_s)
+
 #---------------------------
 # pre_fec_error_dist_plot
 #---------------------------
@@ -121,67 +222,48 @@ async def pre_fec_error_dist_plot(
 
         # set FEC mode on
         logging.info(f"Set FEC Mode = {fec_mode.name}")
-        for p in port_objs:
-            await p.layer1.pcs_fec.fec_mode.set(mode=fec_mode) # type: ignore
+        await utils.apply(*[p.layer1.pcs_fec.fec_mode.set(mode=fec_mode) for p in port_objs]) # type: ignore
 
         # clear FEC counter
         logging.info(f"Clear FEC counter")
-        for p in port_objs:
-            await p.layer1.pcs_fec.clear.set() # type: ignore
+        await utils.apply(*[p.layer1.pcs_fec.clear.set() for p in port_objs]) # type: ignore
 
         # query FEC Totals and Pre-FEC Error Distribution
         plot_count = math.ceil(plotting_duration/plotting_interval)
-        pre_fec_error_dist_data = [[0]*17]*port_cnt
-        print(len(pre_fec_subplots))
+        accumulator = None
+        renderer = None
         for _ in range(plot_count):
             logging.info(f"PRE-FEC ERROR DISTRIBUTION")
-            for i in range(port_cnt):
+            _status = await query_fec_status(port_objs)
+
+            if accumulator is None:
+                _bin_count = _status[0][1].data_count - 1
+                accumulator = FecErrorDistAccumulator(port_count=port_cnt, bin_count=_bin_count)
+                renderer = FecDistRenderer(axes=pre_fec_subplots, bin_count=_bin_count)
+
+            ber_texts = []
+            for i, (_total_status, _fec_status) in enumerate(_status):
                 port_obj = port_objs[i]
+                accumulator.add(i, _fec_status.stats)
+                n = accumulator.overflow_bin
                 logging.info(f"Port {port_obj.kind.module_id}/{port_obj.kind.port_id}")
-                _total_status, _fec_status = await utils.apply(
-                    port_obj.layer1.pcs_fec.fec_symbol_status.total_status.get(), # type: ignore
-                    port_obj.layer1.pcs_fec.fec_symbol_status.fec_status.get() # type: ignore
-                )
-                n = _fec_status.data_count - 2
                 for j in range(n):
                     logging.info(f"  FEC Blocks (Symbol Errors = {j}): {_fec_status.stats[j]}")
                 logging.info(f"  FEC Blocks (Symbol Errors > {n-1}): {_fec_status.stats[n]}")
-                
-                x_axis = [str(x) for x in range(n)]
-                x_axis.append(f"> {n-1}")
-                color_array = ['y']*(n-1)
-                color_array.insert(0, 'g')
-                color_array.append('r')
-
-                pre_fec_error_dist_data[i] = [x + y for x, y in zip(pre_fec_error_dist_data[i], _fec_status.stats[0:n+1])]
-                pre_fec_ber_str = ""
                 if _total_status.total_pre_fec_ber == 0:
-                    pre_fec_ber_str = f"Pre-FEC BER = 0"
+                    ber_texts.append(f"Pre-FEC BER = 0")
                 else:
-                    pre_fec_ber_str = f"Pre-FEC BER = {abs(1/_total_status.total_pre_fec_ber)}"
-
-                pre_fec_subplots[i].cla()
-                pre_fec_subplots[i].relim()
-                pre_fec_subplots[i].autoscale_view()
-                pre_fec_subplots[i].set(xlabel=f"Symbol Errors", ylabel=f"FEC Codewords ({module_str}/{i})")
-                pre_fec_error_dist_data_log10 = []
-                for x in pre_fec_error_dist_data[i]:
-                    if x > 0:
-                        pre_fec_error_dist_data_log10.append(np.log10(x))
-                    else:
-                        pre_fec_error_dist_data_log10.append(0)
-                # print(pre_fec_error_dist_data_log10)
-                tmp = pre_fec_subplots[i].bar(x=x_axis, height=pre_fec_error_dist_data_log10, color=color_array,)
-                pre_fec_subplots[i].bar_label(container=tmp, fmt='%.1f')
-                x0, xmax = pre_fec_subplots[i].get_xbound()
-                y0, ymax = pre_fec_subplots[i].get_ybound()
-
-                pre_fec_subplots[i].text((x0+xmax)*0.7, (y0+ymax)*0.9, pre_fec_ber_str, fontsize="small")
-
-            plt.show()
+                    ber_texts.append(f"Pre-FEC BER = {abs(1/_total_status.total_pre_fec_ber)}")
+
+            symbol_margin, uncorrectable_log10 = accumulator.margin()
+            for i in range(port_cnt):
+                logging.info(f"Port {module_str}/{i} FEC margin: {symbol_margin[i]} symbols, extrapolated uncorrectable codewords (log10): {uncorrectable_log10[i]:.2f}")
+
+            renderer.update(accumulator.log10(), ber_texts) # type: ignore
+            fig.canvas.draw_idle()
+
             logging.info(f"Clear FEC counter")
-            for p in port_objs:
-                await p.layer1.pcs_fec.clear.set() # type: ignore
+            await utils.apply(*[p.layer1.pcs_fec.clear.set() for p in port_objs]) # type: ignore
             plt.pause(plotting_interval)
             
 
@@ -0,0 +1,216 @@
+################################################################
+#
+#                   Multi-Chassis Synchronized Traffic Start
+#
+# What this script example does:
+# 1. Connect to all chassis concurrently
+# 2. Reserve all ports on all chassis in parallel
+# 3. Estimate the clock offset and the round-trip time of every
+#    chassis from several C_TIME samples (NTP-style)
+# 4. Choose a common start instant with enough setup margin and
+#    the C_TRAFFICSYNC timestamp of every chassis for it
+# 5. Arm C_TRAFFICSYNC on all chassis and report the predicted
+#    start skew between the chassis
+#
+# C_TIME has a resolution of one second. The offset is narrowed
+# below that by placing the samples on the predicted second
+# boundary of the chassis and bisecting on the returned value.
+#
+################################################################
+
+import asyncio
+
+from xoa_driver import testers
+from xoa_driver import modules
+from xoa_driver import enums
+from xoa_driver.hlfuncs import mgmt
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+import logging
+import math
+import time
+from typing import Awaitable, Callable
+
+#---------------------------
+# GLOBAL PARAMS
+#---------------------------
+CHASSIS_PORTS = {
+    "10.165.136.70": ["3/2", "3/3"],
+    "10.165.136.71": ["0/0", "0/1"],
+}
+USERNAME = "gps_tod"
+CLOCK_SAMPLES = 8       # C_TIME samples per chassis, each sample halves the offset uncertainty
+SETUP_MARGIN = 2.0      # seconds between arming C_TRAFFICSYNC and the start
+
+#---------------------------
+# ClockEstimate
+#---------------------------
+@dataclass
+class ClockEstimate:
+    """Offset of a chassis clock relative to the local monotonic clock, chassis_time = local_time + offset.
+
+    The offset is known to lie in [offset_lo, offset_hi).
+    """
+    offset_lo: float = -math.inf
+    offset_hi: float = math.inf
+    rtt: float = math.inf
+    samples: int = 0
+
+    @property
+    def offset(self) -> float:
+        return (self.offset_lo + self.offset_hi) / 2
+
+    @property
+    def uncertainty(self) -> float:
+        return (self.offset_hi - self.offset_lo) / 2
+
+    def update(self, sent_at: float, received_at: float, local_time: int) -> None:
+        # the chassis read its clock at some instant in [sent_at, received_at]
+        # and C_TIME truncates to the second, so its clock was in [local_time, local_time + 1) then
+        lo = local_time - received_at
+        hi = local_time + 1 - sent_at
+        if lo >= self.offset_hi or hi <= self.offset_lo:
+            # the chassis clock stepped or drifted out of the estimate, start over from this sample
+            self.offset_lo, self.offset_hi = lo, hi
+        else:
+            self.offset_lo, self.offset_hi = max(lo, self.offset_lo), min(hi, self.offset_hi)
+        self.rtt = min(self.rtt, received_at - sent_at)
+        self.samples += 1
+
+
+async def estimate_clock(
+    tester: testers.L23Tester,
+    samples: int = CLOCK_SAMPLES,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], Awaitable] = asyncio.sleep,
+) -> ClockEstimate:
+    """Estimate the clock offset and the round-trip time of a chassis from several C_TIME samples."""
+    estimate = ClockEstimate()
+    for _ in range(samples):
+        if estimate.samples:
+            # send the next query so that it reaches the chassis when its clock crosses
+            # the second boundary predicted by the current offset, the returned second
+            # then tells on which side of the midpoint the real offset is
+            now = clock()
+            boundary = math.ceil(now + estimate.rtt / 2 + estimate.offset)
+            await sleep(max(0.0, boundary - estimate.offset - estimate.rtt / 2 - now))
+        sent_at = clock()
+        resp = await tester.time.get()
+        estimate.update(sent_at, clock(), resp.local_time)
+    return estimate
+
+#---------------------------
+# plan_start
+#---------------------------
+@dataclass
+class StartPlan:
+    timestamps: dict[str, int]      # C_TRAFFICSYNC timestamp of each chassis
+    local_start: dict[str, float]   # predicted start of each chassis on the local clock
+    skew: float                     # predicted spread of the start instants
+    worst_skew: float               # spread including the offset uncertainties
+
+
+def plan_start(estimates: dict[str, ClockEstimate], not_before: float) -> StartPlan:
+    """Choose the C_TRAFFICSYNC timestamps that start the chassis closest together, not before a local time.
+
+    Traffic starts on the whole second of each chassis clock, so chassis whose clocks are not
+    aligned to the second cannot start at exactly the same instant. The local start instant
+    is chosen among the phases of the chassis clocks to minimize the spread.
+    """
+    def plan(target: float) -> StartPlan:
+        timestamps = {c: math.ceil(target + e.offset - 1e-9) for c, e in estimates.items()}
+        local_start = {c: timestamps[c] - e.offset for c, e in estimates.items()}
+        earliest = {c: timestamps[c] - e.offset_hi for c, e in estimates.items()}
+        latest = {c: timestamps[c] - e.offset_lo for c, e in estimates.items()}
+        return StartPlan(
+            timestamps=timestamps,
+            local_start=local_start,
+            skew=max(local_start.values()) - min(local_start.values()),
+            worst_skew=max(latest.values()) - min(earliest.values()),
+        )
+
+    # a chassis starts exactly at the target when the target falls on its second boundary
+    candidates = [not_before] + [
+        not_before + (math.ceil(not_before + e.offset) - (not_before + e.offset)) for e in estimates.values()
+    ]
+    return min((plan(target) for target in candidates), key=lambda p: (p.skew, max(p.local_start.values())))
+
+#---------------------------
+# gps_tod_sync
+#---------------------------
+async def gps_tod_sync(chassis_ports: dict[str, list[str]], username: str, samples: int, setup_margin: float):
+    # configure basic logger
+    logging.basicConfig(
+        format="%(asctime)s  %(message)s",
+        level=logging.DEBUG,
+        handlers=[
+            logging.FileHandler(filename="gps_tod.log", mode="a"),
+            logging.StreamHandler()]
+        )
+
+    async with AsyncExitStack() as stack:
+        # establish connections to all chassis concurrently
+        tester_objs = dict(zip(chassis_ports, await asyncio.gather(*[
+            stack.enter_async_context(testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False))
+            for chassis in chassis_ports
+        ])))
+        logging.info(f"===================================")
+        for chassis in chassis_ports:
+            logging.info(f"{'Connect to chassis:':<20}{chassis}")
+        logging.info(f"{'Username:':<20}{username}")
+
+        # access the ports and collect the module port pairs of each chassis
+        module_ports = {}
+        port_objs = []
+        for chassis, port_strs in chassis_ports.items():
+            module_ports[chassis] = []
+            for port_str in port_strs:
+                mid = int(port_str.split("/")[0])
+                pid = int(port_str.split("/")[1])
+                module_obj = tester_objs[chassis].modules.obtain(mid)
+                if isinstance(module_obj, modules.E100ChimeraModule):
+                    return None # commands which used in this example are not supported by Chimera Module
+                port_objs.append(module_obj.ports.obtain(pid))
+                module_ports[chassis].extend([mid, pid])
+
+        # forcibly reserve and reset all ports in parallel
+        await asyncio.gather(*[mgmt.reserve_ports(ports=[port_obj], reset=True) for port_obj in port_objs])
+
+        # estimate the clocks of all chassis concurrently
+        estimates = dict(zip(chassis_ports, await asyncio.gather(*[estimate_clock(tester_objs[chassis], samples) for chassis in chassis_ports])))
+        for chassis, estimate in estimates.items():
+            logging.info(f"{chassis:<20}offset {estimate.offset:.3f} s +/- {estimate.uncertainty * 1000:.1f} ms, RTT {estimate.rtt * 1000:.1f} ms")
+
+        # choose the common start, leaving time to arm the slowest chassis
+        not_before = time.monotonic() + setup_margin + max(e.rtt for e in estimates.values())
+        start = plan_start(estimates, not_before)
+        for chassis, timestamp in start.timestamps.items():
+            logging.info(f"{chassis:<20}C_TRAFFICSYNC {timestamp}, starts in {start.local_start[chassis] - time.monotonic():.3f} s")
+        logging.info(f"{'Predicted skew:':<20}{start.skew * 1000:.1f} ms (worst case {start.worst_skew * 1000:.1f} ms)")
+
+        # arm all chassis concurrently
+        await asyncio.gather(*[
+            tester_objs[chassis].traffic_sync.set(on_off=enums.OnOff.ON, timestamp=start.timestamps[chassis], module_ports=module_ports[chassis])
+            for chassis in chassis_ports
+        ])
+        armed_at = time.monotonic()
+        for chassis, estimate in estimates.items():
+            if armed_at + estimate.offset_hi >= start.timestamps[chassis]:
+                logging.warning(f"{chassis:<20}armed after its start time, increase SETUP_MARGIN")
+
+
+async def main():
+    stop_event = asyncio.Event()
+    try:
+        await gps_tod_sync(
+            chassis_ports=CHASSIS_PORTS,
+            username=USERNAME,
+            samples=CLOCK_SAMPLES,
+            setup_margin=SETUP_MARGIN,
+        )
+    except KeyboardInterrupt:
+        stop_event.set()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
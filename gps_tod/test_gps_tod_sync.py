@@ -0,0 +1,100 @@
+import asyncio
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from gps_tod_sync import ClockEstimate, estimate_clock, plan_start
+
+
+class FakeTime:
+    """Local monotonic clock of the test, advanced by the fake chassis round trips and by sleep()."""
+
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class FakeChassis:
+    """A chassis whose clock runs at offset + (1 + drift) * local time and answers C_TIME after half the RTT."""
+
+    def __init__(self, local: FakeTime, offset: float, drift: float = 0.0, rtt: float = 0.004) -> None:
+        self.local = local
+        self.offset = offset
+        self.drift = drift
+        self.rtt = rtt
+        self.time = SimpleNamespace(get=self._get_time)
+
+    def chassis_time(self, local_time: float) -> float:
+        return self.offset + (1 + self.drift) * local_time
+
+    async def _get_time(self) -> SimpleNamespace:
+        self.local.now += self.rtt / 2
+        local_time = math.floor(self.chassis_time(self.local.now))
+        self.local.now += self.rtt / 2
+        return SimpleNamespace(local_time=local_time)
+
+    def true_offset(self) -> float:
+        return self.chassis_time(self.local.now) - self.local.now
+
+
+def estimate(chassis: FakeChassis, samples: int) -> ClockEstimate:
+    return asyncio.run(estimate_clock(chassis, samples, clock=chassis.local, sleep=chassis.local.sleep))
+
+
+@pytest.mark.parametrize("offset", [1700000000.0, 1700000000.123, 1700000000.5, 1700000000.999])
+def test_estimate_brackets_the_offset_and_narrows_with_samples(offset):
+    local = FakeTime()
+    chassis = FakeChassis(local, offset)
+    result = estimate(chassis, 8)
+    assert result.offset_lo <= offset < result.offset_hi
+    assert result.uncertainty <= 0.01 + chassis.rtt
+    assert result.rtt == pytest.approx(chassis.rtt)
+    assert result.samples == 8
+
+
+@pytest.mark.parametrize("drift", [-50e-6, 50e-6])
+def test_estimate_follows_a_drifting_clock(drift):
+    local = FakeTime()
+    chassis = FakeChassis(local, 1700000000.3, drift=drift)
+    result = estimate(chassis, 8)
+    elapsed = local.now - 100.0
+    assert result.offset_lo - abs(drift) * elapsed <= chassis.true_offset() < result.offset_hi + abs(drift) * elapsed
+    assert result.uncertainty <= 0.01 + chassis.rtt + abs(drift) * elapsed
+
+
+def test_start_plan_of_drifting_chassis():
+    local = FakeTime()
+    fleet = {
+        "a": FakeChassis(local, 1700000000.25, drift=20e-6, rtt=0.002),
+        "b": FakeChassis(local, 1700000000.75, drift=-30e-6, rtt=0.010),
+        "c": FakeChassis(local, 1699990000.25, rtt=0.006),
+    }
+    estimates = {name: estimate(chassis, 8) for name, chassis in fleet.items()}
+    not_before = local.now + 2.0
+    plan = plan_start(estimates, not_before)
+
+    # local instant each chassis really starts, when its clock reaches the C_TRAFFICSYNC timestamp
+    real_start = {name: (plan.timestamps[name] - chassis.offset) / (1 + chassis.drift) for name, chassis in fleet.items()}
+    assert min(real_start.values()) >= not_before - max(e.uncertainty for e in estimates.values())
+    real_skew = max(real_start.values()) - min(real_start.values())
+    assert real_skew <= plan.worst_skew + 1e-3
+    # a and c share the phase of their seconds, b is half a second apart from both
+    assert plan.skew == pytest.approx(0.5, abs=0.05)
+    assert real_start["a"] == pytest.approx(real_start["c"], abs=0.05)
+
+
+def test_start_plan_of_aligned_chassis_has_no_skew():
+    estimates = {
+        "a": ClockEstimate(offset_lo=1000.2, offset_hi=1000.21, rtt=0.002, samples=8),
+        "b": ClockEstimate(offset_lo=5000.2, offset_hi=5000.21, rtt=0.002, samples=8),
+    }
+    plan = plan_start(estimates, not_before=10.0)
+    assert plan.skew == pytest.approx(0.0, abs=1e-9)
+    assert plan.worst_skew == pytest.approx(0.01, abs=1e-6)
+    assert all(start >= 10.0 for start in plan.local_start.values())
@@ -0,0 +1,319 @@
+################################################################
+#
+#                   STREAM FACTORY
+#
+# This script shows you how to build many UDP and TCP streams on
+# many ports using the header builder in xoa_driver.hlfuncs
+#
+# What this script example does:
+# 1. Describe each stream as a (port, flow spec) item
+# 2. Build the header of each flow spec once. Flow specs that only
+#    differ in MAC addresses, IP addresses or L4 ports are patched
+#    from a header template of the same shape, updating the IPv4
+#    header checksum incrementally (RFC 1624)
+# 3. Create and configure all streams concurrently, with at most
+#    MAX_CONCURRENCY streams in flight
+#
+################################################################
+import asyncio
+from xoa_driver import testers
+from xoa_driver import modules
+from xoa_driver import utils
+from xoa_driver import enums
+from ipaddress import IPv4Address
+from xoa_driver.misc import Hex
+from xoa_driver.hlfuncs import mgmt, headers
+import logging
+import struct
+import time
+from typing import Any, NamedTuple
+
+#---------------------------
+# Global parameters
+#---------------------------
+
+CHASSIS_IP = "10.10.10.10"      # Chassis IP address or hostname
+USERNAME = "XOA"                # Username
+PORTS = ["0/0", "0/1"]
+
+FRAME_SIZE_BYTES = 1000         # Frame size on wire including the FCS.
+FLOWS_PER_PORT = 100
+STREAM_RATE_PPM = 10000
+MAX_CONCURRENCY = 32            # Streams created and configured at the same time
+
+# Set to True to log how many headers per second are built with and without the cache.
+RUN_BENCHMARK = False
+BENCHMARK_FLOWS = 10_000
+
+#------------------------------
+# FlowSpec
+#------------------------------
+class FlowSpec(NamedTuple):
+    proto: str                  # "udp" or "tcp"
+    src_mac: str
+    dst_mac: str
+    src_ip: str
+    dst_ip: str
+    src_port: int
+    dst_port: int
+    frame_size: int = FRAME_SIZE_BYTES
+    dscp: int = 0
+    ttl: int = 255
+
+    @property
+    def shape(self) -> tuple:
+        """The fields that are not patched into a header template."""
+        return (self.proto, self.frame_size, self.dscp, self.ttl)
+
+#------------------------------
+# HeaderCache
+#------------------------------
+ETH_LENGTH = 14
+IPV4_LENGTH = 20
+FCS_LENGTH = 4
+IPV4_CHECKSUM = ETH_LENGTH + 10
+IPV4_SRC = ETH_LENGTH + 12
+L4_PORTS = ETH_LENGTH + IPV4_LENGTH
+
+
+def ipv4_checksum(header: bytes) -> int:
+    """Internet checksum (RFC 1071) of an IPv4 header with a zero checksum field."""
+    total = sum(struct.unpack("!10H", header))
+    total = (total & 0xFFFF) + (total >> 16)
+    total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def update_checksum(checksum: int, old_words: tuple[int, ...], new_words: tuple[int, ...]) -> int:
+    """Checksum after replacing 16-bit words, HC' = ~(~HC + ~m + m') (RFC 1624, eqn. 3)."""
+    total = ~checksum & 0xFFFF
+    for old, new in zip(old_words, new_words):
+        total += (~old & 0xFFFF) + new
+    total = (total & 0xFFFF) + (total >> 16)
+    total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def build_header(spec: FlowSpec) -> bytes:
+    """Ethernet/IPv4/UDP or TCP header of a flow spec, built from the header objects."""
+    eth = headers.Ethernet()
+    eth.src_mac = spec.src_mac
+    eth.dst_mac = spec.dst_mac
+    eth.ethertype = headers.EtherType.IPv4
+
+    ipv4 = headers.IPV4()
+    ipv4.src = spec.src_ip
+    ipv4.dst = spec.dst_ip
+    ipv4.dscp = spec.dscp
+    ipv4.ttl = spec.ttl
+    ipv4.total_length = spec.frame_size - ETH_LENGTH - FCS_LENGTH
+
+    if spec.proto == "udp":
+        ipv4.proto = headers.IPProtocol.UDP
+        l4 = headers.UDP()
+        l4.length = ipv4.total_length - IPV4_LENGTH
+    elif spec.proto == "tcp":
+        ipv4.proto = headers.IPProtocol.TCP
+        l4 = headers.TCP()
+    else:
+        raise ValueError(f"Unknown protocol {spec.proto}")
+    l4.src_port = spec.src_port
+    l4.dst_port = spec.dst_port
+
+    header = bytearray.fromhex(str(eth) + str(ipv4) + str(l4))
+    header[IPV4_CHECKSUM:IPV4_CHECKSUM + 2] = ipv4_checksum(bytes(header[ETH_LENGTH:ETH_LENGTH + IPV4_LENGTH])).to_bytes(2, "big")
+    return bytes(header)
+
+
+class HeaderCache:
+    """Serialized headers by flow spec.
+
+    A flow spec seen for the first time is patched from the template of its shape, which is
+    built once with all addresses and ports zero.
+    """
+
+    def __init__(self) -> None:
+        self.headers: dict[FlowSpec, Hex] = {}
+        self.templates: dict[tuple, bytes] = {}
+        self.hits = 0
+        self.patched = 0
+
+    def get(self, spec: FlowSpec) -> Hex:
+        header = self.headers.get(spec)
+        if header is not None:
+            self.hits += 1
+            return header
+        header = self.headers[spec] = Hex(self.patch(spec).hex().upper())
+        return header
+
+    def patch(self, spec: FlowSpec) -> bytes:
+        template = self.templates.get(spec.shape)
+        if template is None:
+            template = self.templates[spec.shape] = build_header(
+                spec._replace(src_mac="000000000000", dst_mac="000000000000", src_ip="0.0.0.0", dst_ip="0.0.0.0", src_port=0, dst_port=0)
+            )
+        self.patched += 1
+        header = bytearray(template)
+        header[0:6] = bytes.fromhex(spec.dst_mac.replace(".", "").replace(":", "").replace("-", ""))
+        header[6:12] = bytes.fromhex(spec.src_mac.replace(".", "").replace(":", "").replace("-", ""))
+        addresses = IPv4Address(spec.src_ip).packed + IPv4Address(spec.dst_ip).packed
+        checksum = update_checksum(
+            int.from_bytes(template[IPV4_CHECKSUM:IPV4_CHECKSUM + 2], "big"),
+            struct.unpack("!4H", template[IPV4_SRC:IPV4_SRC + 8]),
+            struct.unpack("!4H", addresses),
+        )
+        header[IPV4_SRC:IPV4_SRC + 8] = addresses
+        header[IPV4_CHECKSUM:IPV4_CHECKSUM + 2] = checksum.to_bytes(2, "big")
+        header[L4_PORTS:L4_PORTS + 4] = struct.pack("!HH", spec.src_port, spec.dst_port)
+        return bytes(header)
+
+#------------------------------
+# configure_streams
+#------------------------------
+SEGMENTS = {
+    "udp": [enums.ProtocolOption.ETHERNET, enums.ProtocolOption.IP, enums.ProtocolOption.UDP],
+    "tcp": [enums.ProtocolOption.ETHERNET, enums.ProtocolOption.IP, enums.ProtocolOption.TCPCHECK],
+}
+
+
+async def configure_streams(items: list[tuple[Any, FlowSpec]], cache: HeaderCache, max_concurrency: int, rate_ppm: int) -> list[Any]:
+    """Create and configure a stream for each (port, flow spec) item, at most ``max_concurrency`` at a time.
+
+    The test payload ID of a stream is the position of its item, i.e. the number of items of the ports
+    before it plus its index on its port, so the IDs are unique across the ports. The stream index restarts
+    at 0 on every port and cannot be used for it.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def configure(port_obj: Any, spec: FlowSpec, tpld_id: int) -> Any:
+        async with semaphore:
+            stream = await port_obj.streams.create()
+            await utils.apply(
+                stream.enable.set_on(),
+                stream.comment.set(f"Stream {spec.proto.upper()} {spec.src_ip}:{spec.src_port} > {spec.dst_ip}:{spec.dst_port}"),
+                stream.rate.fraction.set(stream_rate_ppm=rate_ppm),
+                stream.packet.header.protocol.set(segments=SEGMENTS[spec.proto]),
+                stream.packet.header.data.set(hex_data=cache.get(spec)),
+                stream.packet.length.set(length_type=enums.LengthType.FIXED, min_val=spec.frame_size, max_val=spec.frame_size),
+                stream.payload.content.set(payload_type=enums.PayloadType.PATTERN, hex_data=Hex("AABBCCDD")),
+                stream.tpld_id.set(test_payload_identifier=tpld_id),
+                stream.insert_packets_checksum.set_on(),
+            )
+            return stream
+
+    return await asyncio.gather(*[configure(port_obj, spec, tpld_id) for tpld_id, (port_obj, spec) in enumerate(items)])
+
+#------------------------------
+# benchmark_header_builder
+#------------------------------
+def make_flows(count: int, proto: str, port_index: int = 0) -> list[FlowSpec]:
+    """Flows from consecutive source addresses and ports."""
+    return [
+        FlowSpec(
+            proto=proto,
+            src_mac=f"aaaaaaaa{port_index:02X}{i % 256:02X}",
+            dst_mac=f"bbbbbbbb{port_index:02X}{i % 256:02X}",
+            src_ip=str(IPv4Address("1.1.0.0") + (port_index << 16) + i),
+            dst_ip=str(IPv4Address("2.2.0.0") + (port_index << 16) + i),
+            src_port=4791 + i % 1000,
+            dst_port=80 if proto == "tcp" else 4791,
+        )
+        for i in range(count)
+    ]
+
+
+def benchmark_header_builder(count: int) -> None:
+    flows = make_flows(count, "udp") + make_flows(count, "tcp")
+    _t0 = time.perf_counter()
+    for spec in flows:
+        Hex(build_header(spec).hex().upper())
+    _t1 = time.perf_counter()
+    cache = HeaderCache()
+    for spec in flows:
+        cache.get(spec)
+    _t2 = time.perf_counter()
+    for spec in flows:
+        cache.get(spec)
+    _t3 = time.perf_counter()
+    logging.info(
+        f"{len(flows)} headers per second: header objects {len(flows)/(_t1-_t0):,.0f}, "
+        f"patched templates {len(flows)/(_t2-_t1):,.0f}, cached {len(flows)/(_t3-_t2):,.0f}"
+    )
+
+#------------------------------
+# stream_factory
+#------------------------------
+async def stream_factory(chassis: str, username: str, port_strs: list[str], flows_per_port: int, max_concurrency: int, rate_ppm: int) -> None:
+    # configure basic logger
+    logging.basicConfig(
+        format="%(asctime)s  %(message)s",
+        level=logging.DEBUG,
+        handlers=[
+            logging.FileHandler(filename="test.log", mode="a"),
+            logging.StreamHandler()]
+        )
+    if RUN_BENCHMARK:
+        benchmark_header_builder(BENCHMARK_FLOWS)
+
+    # create tester instance and establish connection
+    async with testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False) as tester:
+        logging.info(f"===================================")
+        logging.info(f"{'Connect to chassis:':<20}{chassis}")
+        logging.info(f"{'Username:':<20}{username}")
+
+        port_objs = []
+        for port_str in port_strs:
+            _mid = int(port_str.split("/")[0])
+            _pid = int(port_str.split("/")[1])
+            module_obj = tester.modules.obtain(_mid)
+            if isinstance(module_obj, modules.E100ChimeraModule):
+                logging.info(f"Module {_mid} is a Chimera module, skip port {port_str}")
+                continue
+            port_objs.append(module_obj.ports.obtain(_pid))
+
+        # reserve and reset the ports in parallel
+        await asyncio.gather(*[mgmt.reserve_ports(ports=[port_obj], reset=True) for port_obj in port_objs])
+        await asyncio.gather(*[
+            utils.apply(
+                port_obj.tx_config.enable.set_on(),
+                port_obj.max_header_length.set(max_header_length=128),
+                port_obj.tpld_mode.set_normal(),
+                port_obj.payload_mode.set_normal(),
+                port_obj.tx_config.mode.set_sequential(),
+            )
+            for port_obj in port_objs
+        ])
+
+        # half UDP and half TCP flows on each port
+        items = [
+            (port_obj, spec)
+            for i, port_obj in enumerate(port_objs)
+            for spec in make_flows(flows_per_port // 2, "udp", i) + make_flows(flows_per_port - flows_per_port // 2, "tcp", i)
+        ]
+        cache = HeaderCache()
+        _t0 = time.perf_counter()
+        await configure_streams(items, cache, max_concurrency, rate_ppm)
+        _elapsed = time.perf_counter() - _t0
+        logging.info(f"Configured {len(items)} streams in {_elapsed*1000:.1f} ms ({len(items)/_elapsed:,.0f} streams/s), {len(cache.templates)} header templates")
+
+        # release the ports
+        await mgmt.release_ports(ports=port_objs)
+
+
+async def main():
+    stop_event = asyncio.Event()
+    try:
+        await stream_factory(
+            chassis=CHASSIS_IP,
+            username=USERNAME,
+            port_strs=PORTS,
+            flows_per_port=FLOWS_PER_PORT,
+            max_concurrency=MAX_CONCURRENCY,
+            rate_ppm=STREAM_RATE_PPM,
+        )
+    except KeyboardInterrupt:
+        stop_event.set()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
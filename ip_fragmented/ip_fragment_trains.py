@@ -0,0 +1,393 @@
+################################################################
+#
+#                   IP FRAGMENT TRAINS
+#
+# This script shows you how to emulate trains of IPv4 or IPv6
+# fragments on many ports, and how to check offline what the
+# modifiers of the streams produce.
+#
+# What this script example does:
+# 1. Compute the streams and modifiers of each fragment train
+#    from the IP payload size and the number of fragments
+# 2. Expand the modifiers into the exact frames with a NumPy
+#    simulator and verify the fragment offsets, MF flags,
+#    lengths and identifications of the trains, before
+#    touching the tester
+# 3. Create and configure the streams of all trains on all
+#    ports in one pipelined batch
+#
+# A modifier on the MF bit can only alternate between two values
+# for the same number of packets each, so it cannot follow the
+# fragment offset of a train of more than two fragments. Each
+# train is therefore split in two streams:
+# - body: the first N-1 fragments, MF set in the header, an INC
+#   modifier on the fragment offset
+# - tail: the last fragment, MF clear, the fixed last offset and
+#   the remaining payload bytes
+# Both streams count the IP identification up once per train, so
+# the fragments of a train carry the same identification.
+#
+################################################################
+import asyncio
+from xoa_driver import testers
+from xoa_driver import modules
+from xoa_driver import utils
+from xoa_driver import enums
+from ipaddress import IPv4Address, IPv6Address
+from xoa_driver.misc import Hex
+from xoa_driver.hlfuncs import mgmt
+from dataclasses import dataclass
+import logging
+import struct
+from typing import Any, NamedTuple
+
+import numpy as np
+
+#---------------------------
+# Global parameters
+#---------------------------
+
+CHASSIS_IP = "10.165.136.70"    # Chassis IP address or hostname
+USERNAME = "XOA"                # Username
+PORTS = ["3/1", "3/2"]
+
+SIMULATED_TRAINS = 3            # Number of trains of each stream pair to verify before configuring the ports
+
+#------------------------------
+# fragment train specification
+#------------------------------
+ETH_HEADER_LENGTH = 14
+FCS_LENGTH = 4
+IPV4_HEADER_LENGTH = 20
+IPV6_HEADER_LENGTH = 40
+IPV6_FRAGMENT_HEADER_LENGTH = 8
+MAX_FRAGMENT_OFFSET = 0x1FFF    # in units of 8 bytes
+IPV4_MF = 0x2000
+IPV6_M = 0x0001
+NO_NEXT_HEADER = 59
+IPV6_FRAGMENT = 44
+PAYLOAD_PATTERN = bytes.fromhex("AABBCCDD")
+
+# byte positions of the modified 16-bit fields from the start of the packet
+IPV4_ID_POSITION = ETH_HEADER_LENGTH + 4
+IPV4_OFFSET_POSITION = ETH_HEADER_LENGTH + 6
+IPV6_OFFSET_POSITION = ETH_HEADER_LENGTH + IPV6_HEADER_LENGTH + 2
+IPV6_ID_POSITION = ETH_HEADER_LENGTH + IPV6_HEADER_LENGTH + 6      # lower 16 bits of the 32-bit identification
+
+
+@dataclass
+class FragmentTrain:
+    payload_size: int           # IP data bytes of the unfragmented packet
+    fragment_count: int
+    trains_per_sec: int
+    version: int = 4
+    src_mac: str = "aaaa.aaaa.0005"
+    dst_mac: str = "bbbb.bbbb.0005"
+    src_ip: str = "1.1.1.5"
+    dst_ip: str = "2.2.2.5"
+
+    @property
+    def fragment_size(self) -> int:
+        """Data bytes of every fragment but the last, a multiple of 8."""
+        if self.fragment_count <= 1:
+            return self.payload_size
+        size = -(-self.payload_size // self.fragment_count)
+        return -(-size // 8) * 8
+
+    @property
+    def last_fragment_size(self) -> int:
+        return self.payload_size - (self.fragment_count - 1) * self.fragment_size
+
+
+TRAINS = {
+    "3/1": [
+        FragmentTrain(payload_size=72*20, fragment_count=20, trains_per_sec=100),
+        FragmentTrain(payload_size=3000, fragment_count=3, trains_per_sec=100, version=6, src_ip="2001:db8::5", dst_ip="2001:db8::6"),
+    ],
+    "3/2": [
+        FragmentTrain(payload_size=1000, fragment_count=7, trains_per_sec=50, src_ip="1.1.1.6", dst_ip="2.2.2.6"),
+    ],
+}
+
+
+class ModifierSpec(NamedTuple):
+    position: int
+    mask: int                   # 32 bits, the upper 16 bits select the bits of a 16-bit modifier
+    action: enums.ModifierAction
+    repetition: int
+    min_val: int
+    step: int
+    max_val: int
+
+
+class FragmentStream(NamedTuple):
+    name: str
+    header: bytes
+    segments: list[enums.ProtocolOption]
+    frame_size: int             # including FCS
+    rate_pps: int
+    fragments_per_train: int
+    modifiers: list[ModifierSpec]
+
+
+def _mac(mac: str) -> bytes:
+    return bytes.fromhex(mac.replace(".", "").replace(":", "").replace("-", ""))
+
+
+def _header(train: FragmentTrain, data_size: int, offset: int, more_fragments: bool) -> bytes:
+    """Ethernet and IP headers of a fragment, identification 0."""
+    if train.version == 4:
+        eth = struct.pack("!6s6sH", _mac(train.dst_mac), _mac(train.src_mac), 0x0800)
+        flags_offset = (IPV4_MF if more_fragments else 0) | offset // 8
+        ip = struct.pack(
+            "!BBHHHBBH4s4s", 0x45, 0, IPV4_HEADER_LENGTH + data_size, 0, flags_offset, 255, 255, 0,
+            IPv4Address(train.src_ip).packed, IPv4Address(train.dst_ip).packed,
+        )
+        return eth + ip
+    eth = struct.pack("!6s6sH", _mac(train.dst_mac), _mac(train.src_mac), 0x86DD)
+    ip = struct.pack(
+        "!IHBB16s16s", 6 << 28, IPV6_FRAGMENT_HEADER_LENGTH + data_size, IPV6_FRAGMENT, 255,
+        IPv6Address(train.src_ip).packed, IPv6Address(train.dst_ip).packed,
+    )
+    fragment = struct.pack("!BBHI", NO_NEXT_HEADER, 0, offset | (IPV6_M if more_fragments else 0), 0)
+    return eth + ip + fragment
+
+
+def plan_fragment_streams(train: FragmentTrain) -> list[FragmentStream]:
+    """The streams and modifiers that send a train of fragments."""
+    n = train.fragment_count
+    size, last_size = train.fragment_size, train.last_fragment_size
+    if n < 1 or last_size <= 0:
+        raise ValueError(f"{train.payload_size} bytes cannot be split in {n} fragments of a multiple of 8 bytes")
+    if (n - 1) * size // 8 > MAX_FRAGMENT_OFFSET:
+        raise ValueError(f"The fragment offset of {train.payload_size} bytes exceeds the maximum")
+
+    if train.version == 4:
+        segments = [enums.ProtocolOption.ETHERNET, enums.ProtocolOption.IP]
+        overhead = ETH_HEADER_LENGTH + IPV4_HEADER_LENGTH + FCS_LENGTH
+        offset_position, offset_mask, id_position = IPV4_OFFSET_POSITION, 0x1FFF0000, IPV4_ID_POSITION
+    elif train.version == 6:
+        segments = [enums.ProtocolOption.ETHERNET, enums.ProtocolOption.IPV6, enums.ProtocolOption.RAW_8]
+        overhead = ETH_HEADER_LENGTH + IPV6_HEADER_LENGTH + IPV6_FRAGMENT_HEADER_LENGTH + FCS_LENGTH
+        offset_position, offset_mask, id_position = IPV6_OFFSET_POSITION, 0xFFF80000, IPV6_ID_POSITION
+    else:
+        raise ValueError(f"Unknown IP version {train.version}")
+
+    streams = []
+    if n > 1:
+        streams.append(FragmentStream(
+            name="body",
+            header=_header(train, size, 0, more_fragments=True),
+            segments=segments,
+            frame_size=size + overhead,
+            rate_pps=train.trains_per_sec * (n - 1),
+            fragments_per_train=n - 1,
+            modifiers=[
+                ModifierSpec(offset_position, offset_mask, enums.ModifierAction.INC, 1, 0, size // 8, (n - 2) * size // 8),
+                ModifierSpec(id_position, 0xFFFF0000, enums.ModifierAction.INC, n - 1, 0, 1, 0xFFFF),
+            ],
+        ))
+    streams.append(FragmentStream(
+        name="tail",
+        header=_header(train, last_size, (n - 1) * size, more_fragments=False),
+        segments=segments,
+        frame_size=last_size + overhead,
+        rate_pps=train.trains_per_sec,
+        fragments_per_train=1,
+        modifiers=[ModifierSpec(id_position, 0xFFFF0000, enums.ModifierAction.INC, 1, 0, 1, 0xFFFF)],
+    ))
+    return streams
+
+#------------------------------
+# simulator
+#------------------------------
+def simulate_stream(stream: FragmentStream, packet_count: int) -> np.ndarray:
+    """The first packets of a stream without FCS, packets x bytes, as the port would send them.
+
+    The modifier values are placed at the lowest bits of their mask, and the port fills in the
+    IPv4 header checksum.
+    """
+    header = np.frombuffer(stream.header + bytes(4), dtype=np.uint8)
+    packets = np.tile(header, (packet_count, 1))
+    for m in stream.modifiers:
+        value_count = (m.max_val - m.min_val) // m.step + 1
+        index = (np.arange(packet_count, dtype=np.int64) // m.repetition) % value_count
+        values = m.min_val + index * m.step if m.action == enums.ModifierAction.INC else m.max_val - index * m.step
+        shift = (m.mask & -m.mask).bit_length() - 1
+        word = packets[:, m.position:m.position + 4].astype(np.uint32)
+        word = (word[:, 0] << 24) | (word[:, 1] << 16) | (word[:, 2] << 8) | word[:, 3]
+        word = (word & np.uint32(~m.mask & 0xFFFFFFFF)) | ((values.astype(np.uint32) << np.uint32(shift)) & np.uint32(m.mask))
+        for i in range(4):
+            packets[:, m.position + i] = (word >> np.uint32(24 - 8 * i)) & 0xFF
+    packets = packets[:, :len(stream.header)]
+
+    if stream.segments[1] == enums.ProtocolOption.IP:
+        ip = packets[:, ETH_HEADER_LENGTH:ETH_HEADER_LENGTH + IPV4_HEADER_LENGTH].astype(np.uint32)
+        total = ((ip[:, 0::2] << 8) | ip[:, 1::2]).sum(axis=1) - ((ip[:, 10] << 8) | ip[:, 11])
+        total = (total & 0xFFFF) + (total >> 16)
+        total = (total & 0xFFFF) + (total >> 16)
+        checksum = ~total & 0xFFFF
+        packets[:, ETH_HEADER_LENGTH + 10] = checksum >> 8
+        packets[:, ETH_HEADER_LENGTH + 11] = checksum & 0xFF
+
+    payload_size = stream.frame_size - FCS_LENGTH - len(stream.header)
+    payload = np.frombuffer((PAYLOAD_PATTERN * (payload_size // len(PAYLOAD_PATTERN) + 1))[:payload_size], dtype=np.uint8)
+    return np.hstack([packets, np.tile(payload, (packet_count, 1))])
+
+
+def simulate_trains(streams: list[FragmentStream], train_count: int) -> list[list[bytes]]:
+    """The frames of the first trains, assuming the streams keep the rate ratio of a train."""
+    packets = {s.name: simulate_stream(s, train_count * s.fragments_per_train) for s in streams}
+    return [
+        [bytes(p) for s in streams for p in packets[s.name][k * s.fragments_per_train:(k + 1) * s.fragments_per_train]]
+        for k in range(train_count)
+    ]
+
+
+def verify_trains(train: FragmentTrain, frames: list[list[bytes]]) -> list[str]:
+    """Errors of the simulated trains: identification, offsets, MF flags and lengths of the fragments."""
+    errors = []
+    for k, fragments in enumerate(frames):
+        if train.version == 4:
+            fields = [struct.unpack_from("!HHH", f, ETH_HEADER_LENGTH + 2) for f in fragments]
+            ids = [identification for _, identification, _ in fields]
+            sizes = [total_length - IPV4_HEADER_LENGTH for total_length, _, _ in fields]
+            offsets = [(flags_offset & MAX_FRAGMENT_OFFSET) * 8 for _, _, flags_offset in fields]
+            more = [bool(flags_offset & IPV4_MF) for _, _, flags_offset in fields]
+        else:
+            sizes = [struct.unpack_from("!H", f, ETH_HEADER_LENGTH + 4)[0] - IPV6_FRAGMENT_HEADER_LENGTH for f in fragments]
+            fields = [struct.unpack_from("!HI", f, IPV6_OFFSET_POSITION) for f in fragments]
+            ids = [identification for _, identification in fields]
+            offsets = [offset_m & 0xFFF8 for offset_m, _ in fields]
+            more = [bool(offset_m & IPV6_M) for offset_m, _ in fields]
+        header_length = len(fragments[0]) - sizes[0] if fragments else 0
+
+        if len(fragments) != train.fragment_count:
+            errors.append(f"train {k}: {len(fragments)} fragments instead of {train.fragment_count}")
+        if len(set(ids)) != 1:
+            errors.append(f"train {k}: identifications {sorted(set(ids))}")
+        order = sorted(range(len(fragments)), key=offsets.__getitem__)
+        expected_offset = 0
+        for position, i in enumerate(order):
+            if offsets[i] != expected_offset:
+                errors.append(f"train {k}: fragment at offset {offsets[i]} instead of {expected_offset}")
+            if more[i] != (position < len(order) - 1):
+                errors.append(f"train {k}: MF {int(more[i])} on the fragment at offset {offsets[i]}")
+            if len(fragments[i]) - header_length != sizes[i]:
+                errors.append(f"train {k}: {len(fragments[i]) - header_length} data bytes in a fragment of IP length {sizes[i]}")
+            expected_offset = offsets[i] + sizes[i]
+        if expected_offset != train.payload_size:
+            errors.append(f"train {k}: {expected_offset} payload bytes instead of {train.payload_size}")
+    return errors
+
+#------------------------------
+# program_fragment_streams
+#------------------------------
+async def program_fragment_streams(port_objs: dict[str, Any], plans: dict[str, list[list[FragmentStream]]]) -> None:
+    """Create the streams of all trains on all ports and configure them in one batch."""
+    async def create(port_obj: Any, count: int) -> list[Any]:
+        return [await port_obj.streams.create() for _ in range(count)]
+
+    # creating a stream and adding modifiers need the replies, the rest is pipelined
+    stream_objs = await asyncio.gather(*[
+        create(port_objs[port_str], sum(len(p) for p in port_plans)) for port_str, port_plans in plans.items()
+    ])
+    pairs = [
+        (stream_obj, stream)
+        for port_streams, port_plans in zip(stream_objs, plans.values())
+        for stream_obj, stream in zip(port_streams, [s for p in port_plans for s in p])
+    ]
+    await asyncio.gather(*[stream_obj.packet.header.modifiers.configure(len(stream.modifiers)) for stream_obj, stream in pairs])
+
+    tokens = []
+    for stream_obj, stream in pairs:
+        tokens += [
+            stream_obj.enable.set_on(),
+            stream_obj.comment.set(f"IP Fragment {stream.name}"),
+            stream_obj.rate.pps.set(stream_rate_pps=stream.rate_pps),
+            stream_obj.packet.header.protocol.set(segments=stream.segments),
+            stream_obj.packet.header.data.set(hex_data=Hex(stream.header.hex().upper())),
+            stream_obj.packet.length.set(length_type=enums.LengthType.FIXED, min_val=stream.frame_size, max_val=stream.frame_size),
+            stream_obj.payload.content.set(payload_type=enums.PayloadType.PATTERN, hex_data=Hex(PAYLOAD_PATTERN.hex().upper())),
+            stream_obj.tpld_id.set(test_payload_identifier=-1),
+        ]
+        for i, m in enumerate(stream.modifiers):
+            modifier = stream_obj.packet.header.modifiers.obtain(i)
+            tokens += [
+                modifier.specification.set(position=m.position, mask=Hex(f"{m.mask:08X}"), action=m.action, repetition=m.repetition),
+                modifier.range.set(min_val=m.min_val, step=m.step, max_val=m.max_val),
+            ]
+    async for _ in utils.apply_iter(*tokens):
+        pass
+
+#------------------------------
+# ip_fragment_trains
+#------------------------------
+async def ip_fragment_trains(chassis: str, username: str, trains: dict[str, list[FragmentTrain]], simulated_trains: int) -> None:
+    # configure basic logger
+    logging.basicConfig(
+        format="%(asctime)s  %(message)s",
+        level=logging.DEBUG,
+        handlers=[
+            logging.FileHandler(filename="test.log", mode="a"),
+            logging.StreamHandler()]
+        )
+
+    # plan and verify all trains before connecting
+    plans = {port_str: [plan_fragment_streams(t) for t in port_trains] for port_str, port_trains in trains.items()}
+    for port_str, port_trains in trains.items():
+        for train, streams in zip(port_trains, plans[port_str]):
+            errors = verify_trains(train, simulate_trains(streams, simulated_trains))
+            for error in errors:
+                logging.error(f"{port_str} IPv{train.version} {train.payload_size} bytes: {error}")
+            if errors:
+                return
+            logging.info(f"{port_str} IPv{train.version} {train.payload_size} bytes in {train.fragment_count} fragments: {train.fragment_size} bytes + last {train.last_fragment_size} bytes")
+
+    # create tester instance and establish connection
+    async with testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False) as tester:
+        logging.info(f"===================================")
+        logging.info(f"{'Connect to chassis:':<20}{chassis}")
+        logging.info(f"{'Username:':<20}{username}")
+
+        port_objs = {}
+        for port_str in trains:
+            _mid = int(port_str.split("/")[0])
+            _pid = int(port_str.split("/")[1])
+            module_obj = tester.modules.obtain(_mid)
+            if isinstance(module_obj, modules.E100ChimeraModule):
+                logging.info(f"Module {_mid} is a Chimera module, skip port {port_str}")
+                continue
+            port_objs[port_str] = module_obj.ports.obtain(_pid)
+        plans = {port_str: plans[port_str] for port_str in port_objs}
+
+        # reserve and reset the ports in parallel
+        await asyncio.gather(*[mgmt.reserve_ports(ports=[port_obj], reset=True) for port_obj in port_objs.values()])
+
+        await asyncio.gather(*[
+            utils.apply(
+                port_obj.tx_config.enable.set_on(),
+                port_obj.max_header_length.set(max_header_length=128),
+                port_obj.tpld_mode.set_normal(),
+                port_obj.payload_mode.set_normal(),
+            )
+            for port_obj in port_objs.values()
+        ])
+        await program_fragment_streams(port_objs, plans)
+        logging.info(f"Configured {sum(len(s) for p in plans.values() for s in p)} streams on {len(port_objs)} ports")
+
+async def main():
+    stop_event = asyncio.Event()
+    try:
+        await ip_fragment_trains(
+            chassis=CHASSIS_IP,
+            username=USERNAME,
+            trains={port_str: TRAINS.get(port_str, []) for port_str in PORTS},
+            simulated_trains=SIMULATED_TRAINS,
+        )
+    except KeyboardInterrupt:
+        stop_event.set()
+
+
+if __name__=="__main__":
+    asyncio.run(main())
@@ -139,6 +139,8 @@ async def ip_fragmentation(chassis: str, username: str, port_str: str) -> None:
         )
 
         # use modifier to simulate IP fragmentation
+        # NOTE: the MF modifier repeats 1 and 0 for IP_FRAGMENTS-1 packets each, so MF only follows the
+        # fragment offset in the first train. See ip_fragment_trains.py for trains that stay correct.
         # create 2 modifiers
         await ip_stream.packet.header.modifiers.configure(2)
 
@@ -0,0 +1,86 @@
+import struct
+
+import pytest
+
+from ip_fragment_trains import (
+    ETH_HEADER_LENGTH,
+    IPV4_ID_POSITION,
+    IPV4_OFFSET_POSITION,
+    IPV6_ID_POSITION,
+    IPV6_OFFSET_POSITION,
+    FragmentTrain,
+    _header,
+    plan_fragment_streams,
+    simulate_trains,
+    verify_trains,
+)
+
+IPV6 = dict(version=6, src_ip="2001:db8::5", dst_ip="2001:db8::6")
+
+
+def word(data: bytes, position: int) -> int:
+    return struct.unpack_from("!H", data, position)[0]
+
+
+def test_ipv4_field_positions():
+    header = _header(FragmentTrain(payload_size=800, fragment_count=4, trains_per_sec=1), 200, 600, more_fragments=True)
+    assert word(header, ETH_HEADER_LENGTH - 2) == 0x0800
+    assert IPV4_ID_POSITION == ETH_HEADER_LENGTH + 4
+    assert IPV4_OFFSET_POSITION == ETH_HEADER_LENGTH + 6
+    assert word(header, IPV4_OFFSET_POSITION) == 0x2000 | 600 // 8
+    assert word(header, ETH_HEADER_LENGTH + 2) == 20 + 200
+
+
+def test_ipv6_field_positions():
+    header = _header(FragmentTrain(payload_size=800, fragment_count=4, trains_per_sec=1, **IPV6), 200, 600, more_fragments=True)
+    assert word(header, ETH_HEADER_LENGTH - 2) == 0x86DD
+    assert len(header) == ETH_HEADER_LENGTH + 40 + 8
+    assert header[ETH_HEADER_LENGTH + 6] == 44      # next header of the IPv6 header is the fragment header
+    assert IPV6_OFFSET_POSITION == ETH_HEADER_LENGTH + 40 + 2
+    assert word(header, IPV6_OFFSET_POSITION) == 600 | 0x0001
+    # the modifier counts the lower 16 bits of the 32-bit identification
+    assert IPV6_ID_POSITION == IPV6_OFFSET_POSITION + 4
+    assert struct.unpack_from("!I", header, IPV6_OFFSET_POSITION + 2)[0] == word(header, IPV6_ID_POSITION)
+
+
+@pytest.mark.parametrize("train, size, last_size", [
+    (FragmentTrain(payload_size=1000, fragment_count=7, trains_per_sec=1), 144, 136),
+    (FragmentTrain(payload_size=72 * 20, fragment_count=20, trains_per_sec=1), 72, 72),
+    (FragmentTrain(payload_size=3000, fragment_count=3, trains_per_sec=1, **IPV6), 1000, 1000),
+    (FragmentTrain(payload_size=1001, fragment_count=2, trains_per_sec=1, **IPV6), 504, 497),
+    (FragmentTrain(payload_size=100, fragment_count=1, trains_per_sec=1), 100, 100),
+])
+def test_simulated_fragment_offsets(train, size, last_size):
+    assert (train.fragment_size, train.last_fragment_size) == (size, last_size)
+    trains = simulate_trains(plan_fragment_streams(train), 3)
+    assert verify_trains(train, trains) == []
+
+    offset_position, mf = (IPV4_OFFSET_POSITION, 0x2000) if train.version == 4 else (IPV6_OFFSET_POSITION, 0x0001)
+    id_position = IPV4_ID_POSITION if train.version == 4 else IPV6_ID_POSITION
+    for k, fragments in enumerate(trains):
+        fields = [word(f, offset_position) for f in fragments]
+        if train.version == 4:
+            offsets = [(v & 0x1FFF) * 8 for v in fields]
+        else:
+            offsets = [v & 0xFFF8 for v in fields]
+        assert offsets == [i * size for i in range(train.fragment_count)]
+        assert [bool(v & mf) for v in fields] == [True] * (train.fragment_count - 1) + [False]
+        assert {word(f, id_position) for f in fragments} == {k}
+
+
+def test_verify_trains_reports_a_wrong_offset():
+    train = FragmentTrain(payload_size=1000, fragment_count=7, trains_per_sec=1)
+    trains = simulate_trains(plan_fragment_streams(train), 1)
+    fragment = bytearray(trains[0][2])
+    struct.pack_into("!H", fragment, IPV4_OFFSET_POSITION, 0x2000 | 144 * 3 // 8)
+    trains[0][2] = bytes(fragment)
+    assert verify_trains(train, trains)
+
+
+@pytest.mark.parametrize("train", [
+    FragmentTrain(payload_size=16, fragment_count=3, trains_per_sec=1),
+    FragmentTrain(payload_size=3 * 32768, fragment_count=3, trains_per_sec=1),  # last offset 65536
+])
+def test_impossible_trains_are_rejected(train):
+    with pytest.raises(ValueError):
+        plan_fragment_streams(train)
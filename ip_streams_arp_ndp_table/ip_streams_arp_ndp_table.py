@@ -21,7 +21,10 @@ from xoa_driver.hlfuncs import mgmt, headers
 from xoa_driver.misc import ArpEntry, NdpEntry, Hex
 import ipaddress
 from binascii import hexlify
+from functools import lru_cache
+from typing import Any
 import logging
+import time
 
 #---------------------------
 # GLOBAL PARAMS
@@ -46,45 +49,130 @@ TX_PKT_LIMIT = 1000
 L3_PROTO = "ipv4" # or "ipv6"
 L4_PROTO = "tcp" # or "udp"
 
+#---------------------------
+# ARP/NDP TABLE LIMITS
+#---------------------------
+# Largest number of entries sent in one ARP/NDP RX table set. The port
+# capabilities do not report the size of the tables, so set these to the
+# table size of your port. A table that does not fit raises a ValueError,
+# because a table set replaces the whole table and a partial table would
+# leave addresses without replies.
+ARP_TABLE_MAX_ENTRIES = 131_072
+NDP_TABLE_MAX_ENTRIES = 131_072
+
+# Set to True to log how long it takes to build the tables for different sizes.
+RUN_TABLE_BENCHMARK = False
+BENCHMARK_PAIRS = [1500, 100_000]
+
+#---------------------------
+# build_mac_list
+#---------------------------
+@lru_cache(maxsize=32)
+def build_mac_list(mac_base: str, count: int) -> tuple[str, ...]:
+    """Generate ``count`` consecutive MAC addresses (12 hex digits) starting from ``mac_base`` using integer arithmetic."""
+    _base = int(mac_base.replace(".", "").replace(":", "").replace("-", ""), 16)
+    return tuple(f"{_mac:012X}" for _mac in range(_base, _base + count))
+
+#---------------------------
+# build_address_table
+#---------------------------
+@lru_cache(maxsize=32)
+def build_address_table(ip_base: str, mac_base: str, count: int) -> tuple[tuple[int, str], ...]:
+    """Generate ``count`` (ip, mac) pairs as integers and hex strings.
+
+    Tables are cached by (bases, count) so repeated runs with the same parameters are built only once.
+    """
+    _ip_base = int(ipaddress.ip_address(ip_base))
+    _macs = build_mac_list(mac_base, count)
+    return tuple(zip(range(_ip_base, _ip_base + count), _macs))
+
 #---------------------------
 # prepare_arp_table
 #---------------------------
 def prepare_arp_table(ip_pairs: int, mac_base: str, ip_base: str, prefix: int) -> list[ArpEntry]:
-    arp_list=[]
-    mac_list = []
-    for i in range(ip_pairs):
-        mac = "{:012X}".format(int(mac_base.replace(".", ""), 16) + i)
-        mac_string = ''.join(mac[j]+mac[j+1] for j in range(0, len(mac), 2))
-        mac_list.append(mac_string)
-    for i in range(ip_pairs):
-        temp = ArpEntry(
-            ipv4_address=ipaddress.IPv4Address(ip_base) + i,
-            prefix=prefix,
-            patched_mac=enums.OnOff.OFF,
-            mac_address=mac_list[i]
-            )
-        arp_list.append(temp)
-    return arp_list
+    if ip_pairs > ARP_TABLE_MAX_ENTRIES:
+        raise ValueError(f"ARP table of {ip_pairs} entries exceeds ARP_TABLE_MAX_ENTRIES ({ARP_TABLE_MAX_ENTRIES})")
+    _ipv4 = ipaddress.IPv4Address
+    _off = enums.OnOff.OFF
+    return [
+        ArpEntry(ipv4_address=_ipv4(_ip), prefix=prefix, patched_mac=_off, mac_address=Hex(_mac))
+        for _ip, _mac in build_address_table(ip_base, mac_base, ip_pairs)
+    ]
 
 #---------------------------
 # prepare_ndp_table
 #---------------------------
 def prepare_ndp_table(ip_pairs: int, mac_base: str, ip_base: str, prefix: int) -> list[NdpEntry]:
-    ndp_list=[]
-    mac_list = []
-    for i in range(ip_pairs):
-        mac = "{:012X}".format(int(mac_base.replace(".", ""), 16) + i)
-        mac_string = ''.join(mac[j]+mac[j+1] for j in range(0, len(mac), 2))
-        mac_list.append(mac_string)
-    for i in range(ip_pairs):
-        temp = NdpEntry(
-            ipv6_address=ipaddress.IPv6Address(ip_base) + i,
-            prefix=prefix,
-            patched_mac=enums.OnOff.OFF,
-            mac_address=mac_list[i]
-            )
-        ndp_list.append(temp)
-    return ndp_list
+    if ip_pairs > NDP_TABLE_MAX_ENTRIES:
+        raise ValueError(f"NDP table of {ip_pairs} entries exceeds NDP_TABLE_MAX_ENTRIES ({NDP_TABLE_MAX_ENTRIES})")
+    _ipv6 = ipaddress.IPv6Address
+    _off = enums.OnOff.OFF
+    return [
+        NdpEntry(ipv6_address=_ipv6(_ip), prefix=prefix, patched_mac=_off, mac_address=Hex(_mac))
+        for _ip, _mac in build_address_table(ip_base, mac_base, ip_pairs)
+    ]
+
+#---------------------------
+# benchmark_table_builder
+#---------------------------
+def benchmark_table_builder(pair_counts: list[int], mac_base: str, ipv4_base: str, ipv6_base: str) -> None:
+    for _count in pair_counts:
+        build_address_table.cache_clear()
+        build_mac_list.cache_clear()
+        _t0 = time.perf_counter()
+        _arp_list = prepare_arp_table(ip_pairs=_count, mac_base=mac_base, ip_base=ipv4_base, prefix=24)
+        _t1 = time.perf_counter()
+        _ndp_list = prepare_ndp_table(ip_pairs=_count, mac_base=mac_base, ip_base=ipv6_base, prefix=24)
+        _t2 = time.perf_counter()
+        prepare_arp_table(ip_pairs=_count, mac_base=mac_base, ip_base=ipv4_base, prefix=24)
+        _t3 = time.perf_counter()
+        logging.info(f"{_count:>8} pairs: ARP {(_t1-_t0)*1000:8.1f} ms, NDP {(_t2-_t1)*1000:8.1f} ms, ARP cached {(_t3-_t2)*1000:8.1f} ms ({len(_arp_list)}/{len(_ndp_list)} entries)")
+
+#---------------------------
+# upload_address_tables
+#---------------------------
+async def upload_address_tables(tables: list[tuple[ports.GenericL23Port, list[ArpEntry], list[NdpEntry]]]) -> None:
+    """Send the ARP and NDP tables of all ports in one pipelined batch.
+
+    A table set replaces the whole table on the port, so a port table cannot be split across several set commands.
+    Instead all ports' tables are sent back-to-back without waiting for the individual replies.
+    """
+    _tokens = []
+    for _port, _arp_list, _ndp_list in tables:
+        _tokens.append(_port.arp_rx_table.set(_arp_list))
+        _tokens.append(_port.ndp_rx_table.set(_ndp_list))
+    _t0 = time.perf_counter()
+    await utils.apply(*_tokens)
+    logging.info(f"Uploaded {sum(len(a) + len(n) for _, a, n in tables)} ARP/NDP entries to {len(tables)} ports in {(time.perf_counter()-_t0)*1000:.1f} ms")
+
+#---------------------------
+# configure_stream_modifiers
+#---------------------------
+async def configure_stream_modifiers(stream: Any, stream_pair: int) -> None:
+    """Configure the six modifiers on MAC, IP and L4 port fields in one batch.
+
+    * 0: DMAC lowest two bytes (pos=4), range from 0 to stream_pair-1
+    * 1: SMAC lowest two bytes (pos=10), range from 0 to stream_pair-1
+    * 2: SRC IP lowest two bytes (pos=28), range from 2 to 2+stream_pair-1
+    * 3: DST IP lowest two bytes (pos=32), range from 2 to 2+stream_pair-1
+    * 4: L4 SRC PORT (pos=34), range from 4000 to 4000+stream_pair-1
+    * 5: L4 DST PORT (pos=36), range from 4000 to 4000+stream_pair-1
+    """
+    _modifier_ranges = [
+        (4, 0),
+        (10, 0),
+        (28, 2),
+        (32, 2),
+        (34, 4000),
+        (36, 4000),
+    ]
+    await stream.packet.header.modifiers.configure(len(_modifier_ranges))
+    _tokens = []
+    for _idx, (_pos, _min) in enumerate(_modifier_ranges):
+        _modifier = stream.packet.header.modifiers.obtain(_idx)
+        _tokens.append(_modifier.specification.set(position=_pos, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1))
+        _tokens.append(_modifier.range.set(min_val=_min, step=1, max_val=_min+stream_pair-1))
+    await utils.apply(*_tokens)
 
 #---------------------------
 # ip_streams_arp_ndp_table
@@ -100,6 +188,12 @@ async def ip_streams_arp_ndp_table(chassis: str, username: str, port_str1: str,
         )
     
     logging.info(f"Making {stream_pair} stream pairs")
+    # build the ARP/NDP tables before connecting, a table that does not fit raises a ValueError
+    _arp_list_a = prepare_arp_table(ip_pairs=stream_pair, mac_base=mac_base1, ip_base=ipv4_base1, prefix=24)
+    _ndp_list_a = prepare_ndp_table(ip_pairs=stream_pair, mac_base=mac_base1, ip_base=ipv6_base1, prefix=24)
+    _arp_list_b = prepare_arp_table(ip_pairs=stream_pair, mac_base=mac_base2, ip_base=ipv4_base2, prefix=24)
+    # the NDP entries of Port B use the MAC addresses of Port B, like its ARP entries
+    _ndp_list_b = prepare_ndp_table(ip_pairs=stream_pair, mac_base=mac_base2, ip_base=ipv6_base2, prefix=24)
     # create tester instance and establish connection
     tester = await testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False) 
 
@@ -142,6 +236,14 @@ async def ip_streams_arp_ndp_table(chassis: str, username: str, port_str1: str,
         logging.info(f"Port B cannot support 6 modifiers (max modifier count is {resp_b.max_modifiers}). End")
         return None
     
+    #-------------------------
+    # ARP/NDP tables A and B
+    # ------------------------
+    await upload_address_tables([
+        (port_obj_a, _arp_list_a, _ndp_list_a),
+        (port_obj_b, _arp_list_b, _ndp_list_b),
+    ])
+
     #-------------------
     # Configure Port A
     # ------------------
@@ -157,14 +259,6 @@ async def ip_streams_arp_ndp_table(chassis: str, username: str, port_str1: str,
         port_obj_a.net_config.ipv4.arp_reply.set_on(),
         port_obj_a.net_config.ipv4.ping_reply.set_on(),
     )
-    # set ARP table for Port A
-    _arp_list_a = prepare_arp_table(ip_pairs=stream_pair, mac_base=mac_base1, ip_base=ipv4_base1, prefix=24)
-    await port_obj_a.arp_rx_table.set(_arp_list_a)
-
-    # set NDP table for Port A
-    _ndp_list_a = prepare_ndp_table(ip_pairs=stream_pair, mac_base=mac_base1, ip_base=ipv6_base1, prefix=24)
-    await port_obj_a.ndp_rx_table.set(_ndp_list_a)
-    
     # Create streams on the port and configure the streams
     logging.info(f"Configure streams A to B")
     stream_a = await port_obj_a.streams.create()
@@ -229,42 +323,8 @@ async def ip_streams_arp_ndp_table(chassis: str, username: str, port_str1: str,
         stream_a.packet.header.data.set(hex_data=Hex(_data)),
     )
         
-    # Configure a modifier on the stream
-    await stream_a.packet.header.modifiers.configure(6)
-
-    # Modifier on DMAC lowest two bytes (pos=4), range from 0 to IP_STREAM_CNT-1 in step of 1
-    # e.g. BB:BB:BB:BB:00:00, BB:BB:BB:BB:00:01 ...
-    modifier_dmac = stream_a.packet.header.modifiers.obtain(0)
-    await modifier_dmac.specification.set(position=4, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1)
-    await modifier_dmac.range.set(min_val=0, step=1, max_val=stream_pair-1)
-
-    # Modifier on SMAC lowest two bytes (pos=10), range from 0 to IP_STREAM_CNT-1 in step of 1
-    # e.g. AA:AA:AA:AA:00:00, AA:AA:AA:AA:00:01 ...
-    modifier_dmac = stream_a.packet.header.modifiers.obtain(1)
-    await modifier_dmac.specification.set(position=10, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1)
-    await modifier_dmac.range.set(min_val=0, step=1, max_val=stream_pair-1)
-
-    # Modifier on SRC IP lowest two bytes (pos=28), range from 2 to 2+IP_STREAM_CNT-1 in step of 1
-    # e.g. 10.0.0.2, 10.0.0.3 ...
-    modifier_dmac = stream_a.packet.header.modifiers.obtain(2)
-    await modifier_dmac.specification.set(position=28, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1)
-    await modifier_dmac.range.set(min_val=2, step=1, max_val=2+stream_pair-1)
-
-    # Modifier on DST IP lowest two bytes (pos=32), range from 2 to 2+IP_STREAM_CNT-1 in step of 1
-    # e.g. 10.1.0.2, 10.1.0.3 ...
-    modifier_dmac = stream_a.packet.header.modifiers.obtain(3)
-    await modifier_dmac.specification.set(position=32, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1)
-    await modifier_dmac.range.set(min_val=2, step=1, max_val=2+stream_pair-1)
-
-    # Modifier on TCP SRC PORT (pos=34), range from 4000 to 4000+IP_STREAM_CNT-1 in step of 1
-    modifier_dmac = stream_a.packet.header.modifiers.obtain(4)
-    await modifier_dmac.specification.set(position=34, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1)
-    await modifier_dmac.range.set(min_val=4000, step=1, max_val=4000+stream_pair-1)
-
-    # Modifier on TCP DST PORT (pos=36), range from 4000 to 4000+IP_STREAM_CNT-1 in step of 1
-    modifier_dmac = stream_a.packet.header.modifiers.obtain(5)
-    await modifier_dmac.specification.set(position=36, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1)
-    await modifier_dmac.range.set(min_val=4000, step=1, max_val=4000+stream_pair-1)
+    # Configure the six modifiers on the stream in one batch
+    await configure_stream_modifiers(stream_a, stream_pair)
 
     #-------------------
     # Configure Port B
@@ -280,14 +340,6 @@ async def ip_streams_arp_ndp_table(chassis: str, username: str, port_str1: str,
         port_obj_b.net_config.ipv4.arp_reply.set_on(),
         port_obj_b.net_config.ipv4.ping_reply.set_on()
     )
-    # set ARP table for Port B
-    _arp_list_b = prepare_arp_table(ip_pairs=stream_pair, mac_base=mac_base2, ip_base=ipv4_base2, prefix=24)
-    await port_obj_b.arp_rx_table.set(_arp_list_b)
-
-    # set NDP table for Port B
-    _ndp_list_b = prepare_ndp_table(ip_pairs=stream_pair, mac_base=mac_base1, ip_base=ipv6_base2, prefix=24)
-    await port_obj_b.ndp_rx_table.set(_ndp_list_b)
-    
     # Create streams on the port and configure the streams
     logging.info(f"Configure streams B to A")
     stream_b = await port_obj_b.streams.create()
@@ -352,47 +404,15 @@ async def ip_streams_arp_ndp_table(chassis: str, username: str, port_str1: str,
         stream_b.packet.header.data.set(hex_data=Hex(_data)),
     )
 
-    # Configure a modifier on the stream
-    await stream_b.packet.header.modifiers.configure(6)
-
-    # Modifier on DMAC lowest two bytes (pos=4), range from 0 to IP_STREAM_CNT-1 in step of 1
-    # e.g. AA:AA:AA:AA:00:00, AA:AA:AA:AA:00:01 ...
-    modifier_dmac = stream_b.packet.header.modifiers.obtain(0)
-    await modifier_dmac.specification.set(position=4, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1)
-    await modifier_dmac.range.set(min_val=0, step=1, max_val=stream_pair-1)
-
-    # Modifier on SMAC lowest two bytes (pos=10), range from 0 to IP_STREAM_CNT-1 in step of 1
-    # e.g. BB:BB:BB:BB:00:00, BB:BB:BB:BB:00:01 ...
-    modifier_dmac = stream_b.packet.header.modifiers.obtain(1)
-    await modifier_dmac.specification.set(position=10, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1)
-    await modifier_dmac.range.set(min_val=0, step=1, max_val=stream_pair-1)
-
-    # Modifier on SRC IP lowest two bytes (pos=28), range from 2 to 2+IP_STREAM_CNT-1 in step of 1
-    # e.g. 110.1.0.2, 10.1.0.3 ...
-    modifier_dmac = stream_b.packet.header.modifiers.obtain(2)
-    await modifier_dmac.specification.set(position=28, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1)
-    await modifier_dmac.range.set(min_val=2, step=1, max_val=2+stream_pair-1)
-
-    # Modifier on DST IP lowest two bytes (pos=32), range from 2 to 2+IP_STREAM_CNT-1 in step of 1
-    # e.g. 10.0.0.2, 10.0.0.3 ...
-    modifier_dmac = stream_b.packet.header.modifiers.obtain(3)
-    await modifier_dmac.specification.set(position=32, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1)
-    await modifier_dmac.range.set(min_val=2, step=1, max_val=2+stream_pair-1)
-
-    # Modifier on TCP SRC PORT (pos=34), range from 4000 to 4000+IP_STREAM_CNT-1 in step of 1
-    modifier_dmac = stream_b.packet.header.modifiers.obtain(4)
-    await modifier_dmac.specification.set(position=34, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1)
-    await modifier_dmac.range.set(min_val=4000, step=1, max_val=4000+stream_pair-1)
-
-    # Modifier on TCP DST PORT (pos=36), range from 4000 to 4000+IP_STREAM_CNT-1 in step of 1
-    modifier_dmac = stream_b.packet.header.modifiers.obtain(5)
-    await modifier_dmac.specification.set(position=36, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1)
-    await modifier_dmac.range.set(min_val=4000, step=1, max_val=4000+stream_pair-1)
+    # Configure the six modifiers on the stream in one batch
+    await configure_stream_modifiers(stream_b, stream_pair)
 
     logging.info(f"Done")
     
 async def main():
     stop_event =asyncio.Event()
+    if RUN_TABLE_BENCHMARK:
+        benchmark_table_builder(pair_counts=BENCHMARK_PAIRS, mac_base=PORT_A_MAC_BASE, ipv4_base=PORT_A_IPV4_BASE, ipv6_base=PORT_A_IPV6_BASE)
     try:
         await ip_streams_arp_ndp_table(
             chassis=CHASSIS_IP,
@@ -404,8 +424,8 @@ async def main():
             mac_base2=PORT_B_MAC_BASE,
             ipv4_base1=PORT_A_IPV4_BASE,
             ipv4_base2=PORT_B_IPV4_BASE,
-            ipv6_base1=PORT_A_IPV4_BASE,
-            ipv6_base2=PORT_B_IPV4_BASE,
+            ipv6_base1=PORT_A_IPV6_BASE,
+            ipv6_base2=PORT_B_IPV6_BASE,
             pps = STREAM_PPS,
             frame_size=FRAME_SIZE_BYTES,
             limit=TX_PKT_LIMIT,
@@ -129,34 +129,33 @@ async def l1_bit_rate(chassis: str, username: str, tx_port_str: str, rx_port_str
         #     TX & RX Port Traffic Rate Statistics      #
         #################################################
 
-        # get TX port IFG_min
-        resp = await tx_port.interframe_gap.get()
-        tx_ifg = resp.min_byte_count
+        # get the IFG_min, the stream packet size, the nominal speeds and the speed reductions in one batch
+        # (see l1_bit_rate_analyzer.py for many ports)
+        tx_ifg_resp, rx_ifg_resp, length_resp, tx_speed_resp, tx_reduction_resp, rx_speed_resp, rx_reduction_resp = await utils.apply(
+            tx_port.interframe_gap.get(),
+            rx_port.interframe_gap.get(),
+            stream.packet.length.get(),
+            tx_port.speed.current.get(),
+            tx_port.speed.reduction.get(),
+            rx_port.speed.current.get(),
+            rx_port.speed.reduction.get(),
+        )
+        tx_ifg = tx_ifg_resp.min_byte_count
         logging.info(f"{tx_port_str} TX port inter-frame gap: {tx_ifg} bytes")
-
-        # get RX port IFG_min
-        resp = await rx_port.interframe_gap.get()
-        rx_ifg = resp.min_byte_count
+        rx_ifg = rx_ifg_resp.min_byte_count
         logging.info(f"{rx_port_str} RX port inter-frame gap: {rx_ifg} bytes")
-
-        # get stream packet size
-        resp = await stream.packet.length.get()
-        tx_frame_size = resp.min_val
+        tx_frame_size = length_resp.min_val
         logging.info(f"{tx_port_str} TX port frame size: {tx_frame_size} bytes")
 
         # calculate the TX effective port speed from nominal speed and reduction ppm
-        resp = await tx_port.speed.current.get()
-        tx_port_nominal_speed_Mbps = resp.port_speed
-        resp = await tx_port.speed.reduction.get()
-        tx_port_speed_reduction_ppm = resp.ppm
+        tx_port_nominal_speed_Mbps = tx_speed_resp.port_speed
+        tx_port_speed_reduction_ppm = tx_reduction_resp.ppm
         tx_port_effective_speed = tx_port_nominal_speed_Mbps*(1 - tx_port_speed_reduction_ppm/1_000_000)*1_000_000
         logging.info(f"{tx_port_str} TX port effective speed: {tx_port_effective_speed/1_000_000_000} Gbps")
 
         # calculate the RX effective port speed from nominal speed and reduction ppm
-        resp = await rx_port.speed.current.get()
-        rx_port_nominal_speed_Mbps = resp.port_speed
-        resp = await rx_port.speed.reduction.get()
-        rx_port_speed_reduction_ppm = resp.ppm
+        rx_port_nominal_speed_Mbps = rx_speed_resp.port_speed
+        rx_port_speed_reduction_ppm = rx_reduction_resp.ppm
         rx_port_effective_speed = rx_port_nominal_speed_Mbps*(1 - rx_port_speed_reduction_ppm/1_000_000)*1_000_000
         logging.info(f"{rx_port_str} RX port effective speed: {rx_port_effective_speed/1_000_000_000} Gbps")
 
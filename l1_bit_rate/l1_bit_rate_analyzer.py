@@ -0,0 +1,233 @@
+################################################################
+#
+#                   L1 BIT RATE ANALYZER
+#
+# What this script example does:
+# 1. Connect to a tester
+# 2. Reserve many ports
+# 3. Read the static parameters of all ports once in one batch:
+#    inter-frame gap, nominal speed and speed reduction
+# 4. Every second, read the TX and RX traffic statistics of all
+#    ports in one batch and append them to a ring buffer
+# 5. Calculate L1 and L2 bits per second and the utilization of
+#    the effective port speed over ports x samples at once, with
+#    rolling mean, min, max and percentiles
+# 6. Flag the ports whose L1 rate deviates from the expected
+#    share of the effective port speed
+# 7. Release the ports
+#
+# The traffic is configured and started by something else, e.g.
+# l1_bit_rate.py or the test that is running on the ports.
+#
+# L1 bits per second are calculated on both TX and RX sides as
+# ``l1_bit_per_sec = l2_fps * interframe_gap * 8 + l2_bit_per_sec``,
+# which is the same as ``l2_fps * (interframe_gap + frame_size) * 8``
+# but also holds for streams of mixed frame sizes.
+#
+################################################################
+
+import asyncio
+
+from xoa_driver import testers
+from xoa_driver import modules
+from xoa_driver import utils
+from xoa_driver.hlfuncs import mgmt
+import logging
+import time
+from typing import Any, Optional
+
+import numpy as np
+
+#---------------------------
+# GLOBAL PARAMS
+#---------------------------
+CHASSIS_IP = "10.165.136.70"
+USERNAME = "XOA"
+PORTS = ["0/4", "0/5", "0/6", "0/7"]
+DURATION = 60                   # Analysis duration in seconds
+CAPACITY = 300                  # Number of samples kept per port
+REPORT_INTERVAL = 10            # Number of samples between reports
+EXPECTED_TX_UTILIZATION = {     # Expected TX L1 rate as a fraction of the effective port speed
+    "0/4": 1.0,
+    "0/6": 0.5,
+}
+EXPECTED_RX_UTILIZATION = {     # Expected RX L1 rate as a fraction of the effective port speed
+    "0/5": 1.0,
+    "0/7": 0.5,
+}
+TOLERANCE = 0.01                # Allowed deviation from the expected utilization
+PERCENTILES = (5, 50, 95)
+
+DIRECTIONS = ("tx", "rx")
+
+#---------------------------
+# BitRateAnalyzer
+#---------------------------
+class BitRateAnalyzer:
+    """L1/L2 bit rate statistics of N ports, sampled in one batch and kept in a ring buffer of ``capacity`` samples."""
+
+    def __init__(self, port_objs: dict[str, Any], capacity: int) -> None:
+        self.port_objs = port_objs
+        self.names = list(port_objs)
+        self.capacity = capacity
+        self.count = 0
+        self._next = 0
+        self.ifg = np.zeros(len(self.names))                # bytes
+        self.effective_speed = np.zeros(len(self.names))    # bits per second
+        self.time = np.full(capacity, np.nan)
+        self.l2_bps = {d: np.full((capacity, len(self.names)), np.nan) for d in DIRECTIONS}
+        self.fps = {d: np.full((capacity, len(self.names)), np.nan) for d in DIRECTIONS}
+
+    async def load_parameters(self) -> None:
+        """Read the inter-frame gap and the effective speed of all ports, which do not change during the analysis."""
+        tokens = []
+        for port in self.port_objs.values():
+            tokens += [port.interframe_gap.get(), port.speed.current.get(), port.speed.reduction.get()]
+        responses = [r async for r in utils.apply_iter(*tokens)]
+        ifg, speed, reduction = (np.array([getattr(r, field) for r in responses[i::3]], dtype=float)
+                                 for i, field in enumerate(("min_byte_count", "port_speed", "ppm")))
+        self.ifg = ifg
+        self.effective_speed = speed * (1 - reduction / 1_000_000) * 1_000_000
+
+    async def sample(self, t: Optional[float] = None) -> None:
+        """Read the TX and RX statistics of the last second of all ports in one batch."""
+        tokens = []
+        for port in self.port_objs.values():
+            tokens += [port.statistics.tx.total.get(), port.statistics.rx.total.get()]
+        responses = [r async for r in utils.apply_iter(*tokens)]
+        i = self._next
+        self.time[i] = time.monotonic() if t is None else t
+        for offset, d in enumerate(DIRECTIONS):
+            self.l2_bps[d][i] = [r.bit_count_last_sec for r in responses[offset::2]]
+            self.fps[d][i] = [r.packet_count_last_sec for r in responses[offset::2]]
+        self._next = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def _series(self, values: np.ndarray, last: Optional[int]) -> np.ndarray:
+        last = self.count if last is None else min(last, self.count)
+        return values[(self._next - last + np.arange(last)) % self.capacity]
+
+    def series(self, name: str, direction: str, last: Optional[int] = None) -> np.ndarray:
+        """The last samples of ``l2_bps``, ``l1_bps``, ``fps`` or ``utilization`` of all ports, oldest first, samples x ports."""
+        l2_bps = self._series(self.l2_bps[direction], last)
+        fps = self._series(self.fps[direction], last)
+        if name == "l2_bps":
+            return l2_bps
+        if name == "fps":
+            return fps
+        l1_bps = l2_bps + fps * self.ifg * 8
+        if name == "l1_bps":
+            return l1_bps
+        if name == "utilization":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return l1_bps / self.effective_speed
+        raise ValueError(f"Unknown series {name}")
+
+    def summary(self, name: str, direction: str, last: Optional[int] = None, percentiles: tuple[int, ...] = PERCENTILES) -> dict[str, np.ndarray]:
+        """Rolling mean, min, max and percentiles of a series per port."""
+        values = self.series(name, direction, last)
+        with np.errstate(invalid="ignore"):
+            result = {
+                "mean": np.nanmean(values, axis=0),
+                "min": np.nanmin(values, axis=0),
+                "max": np.nanmax(values, axis=0),
+            }
+            for p, v in zip(percentiles, np.nanpercentile(values, percentiles, axis=0)):
+                result[f"p{p}"] = v
+        return result
+
+    def deviations(self, direction: str, expected: dict[str, float], tolerance: float, last: Optional[int] = None) -> list[tuple[str, float, float]]:
+        """(port, measured, expected) of the ports whose mean utilization deviates from the expected one by more than the tolerance."""
+        names = [n for n in expected if n in self.names]
+        index = [self.names.index(n) for n in names]
+        measured = self.summary("utilization", direction, last, percentiles=())["mean"][index]
+        wanted = np.array([expected[n] for n in names])
+        flagged = np.flatnonzero(~(np.abs(measured - wanted) <= tolerance))
+        return [(names[i], float(measured[i]), float(wanted[i])) for i in flagged]
+
+#---------------------------
+# l1_bit_rate_analyzer
+#---------------------------
+async def l1_bit_rate_analyzer(chassis: str, username: str, port_strs: list[str], duration: float, capacity: int, report_interval: int, expected_tx: dict[str, float], expected_rx: dict[str, float], tolerance: float):
+    # configure basic logger
+    logging.basicConfig(
+        format="%(asctime)s  %(message)s",
+        level=logging.DEBUG,
+        handlers=[
+            logging.FileHandler(filename="test.log", mode="a"),
+            logging.StreamHandler()]
+        )
+
+    # Establish connection to a Valkyrie tester using Python context manager
+    # The connection will be automatically terminated when it is out of the block
+    async with testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False) as tester:
+        logging.info(f"===================================")
+        logging.info(f"{'Connect to chassis:':<20}{chassis}")
+        logging.info(f"{'Username:':<20}{username}")
+
+        port_objs = {}
+        for port_str in port_strs:
+            _mid = int(port_str.split("/")[0])
+            _pid = int(port_str.split("/")[1])
+            module_obj = tester.modules.obtain(_mid)
+            if isinstance(module_obj, modules.E100ChimeraModule):
+                logging.info(f"Module {_mid} is a Chimera module, skip port {port_str}")
+                continue
+            port_objs[port_str] = module_obj.ports.obtain(_pid)
+
+        # reserve the ports without resetting them, the traffic is already configured
+        await mgmt.reserve_ports(ports=list(port_objs.values()))
+
+        analyzer = BitRateAnalyzer(port_objs, capacity)
+        await analyzer.load_parameters()
+        for name, ifg, speed in zip(analyzer.names, analyzer.ifg, analyzer.effective_speed):
+            logging.info(f"{name} inter-frame gap: {ifg:.0f} bytes, effective speed: {speed/1_000_000_000} Gbps")
+
+        start = time.monotonic()
+        tick = 0
+        while time.monotonic() - start < duration:
+            tick += 1
+            await analyzer.sample()
+
+            if tick % report_interval == 0:
+                for d in DIRECTIONS:
+                    l1 = analyzer.summary("l1_bps", d)
+                    l2 = analyzer.summary("l2_bps", d)
+                    util = analyzer.summary("utilization", d)
+                    for i, name in enumerate(analyzer.names):
+                        logging.info(
+                            f"{name} {d.upper()} L1 {l1['mean'][i]/1e9:.4f} Gbps "
+                            f"(min {l1['min'][i]/1e9:.4f} / max {l1['max'][i]/1e9:.4f}), "
+                            f"L2 {l2['mean'][i]/1e9:.4f} Gbps, "
+                            f"utilization {util['mean'][i]*100:.2f}% "
+                            f"(" + " / ".join(f"p{p} {util[f'p{p}'][i]*100:.2f}%" for p in PERCENTILES) + ")"
+                        )
+                for d, expected in (("tx", expected_tx), ("rx", expected_rx)):
+                    for name, measured, wanted in analyzer.deviations(d, expected, tolerance, last=report_interval):
+                        logging.warning(f"{name} {d.upper()} utilization {measured*100:.2f}% deviates from the expected {wanted*100:.2f}%")
+
+            await asyncio.sleep(max(0.0, start + tick - time.monotonic()))
+
+        # Release the ports
+        await mgmt.release_ports(ports=list(port_objs.values()))
+
+async def main():
+    stop_event = asyncio.Event()
+    try:
+        await l1_bit_rate_analyzer(
+            chassis=CHASSIS_IP,
+            username=USERNAME,
+            port_strs=PORTS,
+            duration=DURATION,
+            capacity=CAPACITY,
+            report_interval=REPORT_INTERVAL,
+            expected_tx=EXPECTED_TX_UTILIZATION,
+            expected_rx=EXPECTED_RX_UTILIZATION,
+            tolerance=TOLERANCE,
+        )
+    except KeyboardInterrupt:
+        stop_event.set()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -9,6 +9,12 @@
 # 4. Read the traffic stats of a filter
 # 5. Plot the number of packets from the filter
 #
+# The counter is sampled in its own thread, so the plot refresh
+# does not delay the samples. Set HEADLESS to only record them.
+#
+# DURATION is the sampling time in seconds. It used to be the
+# number of samples, i.e. DURATION * PLOTTING_INTERVAL seconds.
+#
 ################################################################
 
 import asyncio
@@ -21,9 +27,10 @@ from xoa_driver import utils
 from xoa_driver.hlfuncs import mgmt
 from xoa_driver.misc import Hex
 import logging
+import threading
+from typing import Optional
 
-import matplotlib.pyplot as plt
-from collections import deque
+from sampling import SampleRingBuffer, SampleRecorder, LivePlotRenderer, sample_at_fixed_rate, start_acquisition_thread
 
 #---------------------------
 # GLOBAL PARAMS
@@ -31,15 +38,67 @@ from collections import deque
 CHASSIS_IP = "10.165.136.60"
 USERNAME = "xoa"
 PORT = "6/0"
-DURATION = 120
+DURATION = 120              # Sampling time in seconds
 FILTER_IDX = 0
 WINDOW_SIZE = 10
-PLOTTING_INTERVAL = 1.0
+PLOTTING_INTERVAL = 1.0     # Counter sampling interval in seconds
+FRAME_INTERVAL = 0.5        # Plot refresh interval in seconds, independent of the sampling interval
+HEADLESS = False            # If True, no plot is shown and the samples are only recorded to RECORD_FILE
+RECORD_FILE = "live_plot_samples.csv" # Set to "" to not record samples when plotting, required when HEADLESS
+
+#---------------------------
+# acquire_filter_counter
+#---------------------------
+async def acquire_filter_counter(chassis: str, username: str, port_str: str, filter_idx: int, duration: int, plot_interval: float, buffer: SampleRingBuffer, ready: threading.Event, stop: threading.Event, labels: dict, recorder: Optional[SampleRecorder]):
+    # Establish connection to a Valkyrie tester using Python context manager
+    # The connection will be automatically terminated when it is out of the block
+    try:
+        async with testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False) as tester:
+            logging.info(f"===================================")
+            logging.info(f"{'Connect to chassis:':<20}{chassis}")
+            logging.info(f"{'Username:':<20}{username}")
+
+            # Access module on the tester
+            _mid = int(port_str.split("/")[0])
+            _pid = int(port_str.split("/")[1])
+            module_obj = tester.modules.obtain(_mid)
+
+            if isinstance(module_obj, modules.E100ChimeraModule) or isinstance(module_obj, modules.Z10OdinModule):
+                logging.info(f"Module {_mid} must not be Chimera or Odin")
+                return None
+
+
+            # Get the port on module as TX port
+            port_obj = module_obj.ports.obtain(_pid)
+
+            # Forcibly reserve the port and reset it.
+            await mgmt.release_modules(modules=[module_obj], should_release_ports=False)
+            await mgmt.reserve_ports(ports=[port_obj], reset=True)
+
+            # Sync the filters from chassis to script
+            await asyncio.sleep(1)
+            await port_obj.filters.server_sync()
+            # Get filter's description
+            filter0 = port_obj.filters.obtain(filter_idx)
+            resp = await filter0.comment.get()
+            labels["title"] = resp.comment
+            ready.set()
+
+            async def read_counters() -> list[float]:
+                # Read the filtered traffic stats - packet count since cleared
+                resp = await port_obj.statistics.rx.obtain_filter_statistics(filter=filter_idx).get()
+                return [resp.packet_count_since_cleared]
+
+            await port_obj.statistics.rx.clear.set()
+            skipped = await sample_at_fixed_rate(read_counters=read_counters, buffer=buffer, interval=plot_interval, duration=duration, stop_event=stop, recorder=recorder)
+            logging.info(f"Sampling done, {buffer.total} samples, {skipped} skipped ticks")
+    finally:
+        ready.set()
 
 #---------------------------
 # live_plot
 #---------------------------
-async def live_plot(chassis: str, username: str, port_str: str, filter_idx: int, duration: int, win_size: int, plot_interval: float):
+def live_plot(chassis: str, username: str, port_str: str, filter_idx: int, duration: int, win_size: int, plot_interval: float, frame_interval: float, headless: bool, record_file: str):
     # configure basic logger
     logging.basicConfig(
         format="%(asctime)s  %(message)s",
@@ -49,80 +108,57 @@ async def live_plot(chassis: str, username: str, port_str: str, filter_idx: int,
             logging.StreamHandler()]
         )
 
-    # Establish connection to a Valkyrie tester using Python context manager
-    # The connection will be automatically terminated when it is out of the block
-    async with testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False) as tester:
-        logging.info(f"===================================")
-        logging.info(f"{'Connect to chassis:':<20}{chassis}")
-        logging.info(f"{'Username:':<20}{username}")
-
-        # Access module on the tester
-        _mid = int(port_str.split("/")[0])
-        _pid = int(port_str.split("/")[1])
-        module_obj = tester.modules.obtain(_mid)
-
-        if isinstance(module_obj, modules.E100ChimeraModule) or isinstance(module_obj, modules.Z10OdinModule):
-            logging.info(f"Module {_mid} must not be Chimera or Odin")
-            return None
+    if headless and not record_file:
+        raise ValueError("HEADLESS needs a RECORD_FILE to record the samples to")
 
+    buffer = SampleRingBuffer(series_count=1, capacity=win_size)
+    recorder = SampleRecorder(filename=record_file, series_names=["packet_count_since_cleared"]) if headless or record_file else None
+    ready = threading.Event()
+    stop = threading.Event()
+    labels = {"title": ""}
 
-        # Get the port on module as TX port
-        port_obj = module_obj.ports.obtain(_pid)
-
-        # Forcibly reserve the port and reset it.
-        await mgmt.release_modules(modules=[module_obj], should_release_ports=False)
-        await mgmt.reserve_ports(ports=[port_obj], reset=True)
-
-        # Sync the filters from chassis to script
-        await asyncio.sleep(1)
-        await port_obj.filters.server_sync()
-        # Get filter's description
-        filter0 = port_obj.filters.obtain(filter_idx)
-        resp = await filter0.comment.get()
-        figure_title = resp.comment
+    acquisition = start_acquisition_thread(lambda: acquire_filter_counter(
+        chassis=chassis, username=username, port_str=port_str, filter_idx=filter_idx, duration=duration, plot_interval=plot_interval,
+        buffer=buffer, ready=ready, stop=stop, labels=labels, recorder=recorder))
+    try:
+        if headless:
+            acquisition.join()
+            return
+        ready.wait()
+        if not acquisition.is_alive():
+            return
 
         # live plotting
-        x = 0
-        y = 0
-        plt.ion()
-        # fig = plt.figure(facecolor='white', layout='constrained')
+        import matplotlib.pyplot as plt
         fig, ax = plt.subplots()
-        fig.suptitle(f"Filter {filter_idx}: {figure_title}")
-        
-        data = deque([(x, y)], maxlen=win_size)
-        line, = plt.step(*zip(*data), c='black')
-        plt.xlabel(f"Time Interval ({plot_interval}s)")
-        plt.ylabel("packet_count_since_cleared")
-        await port_obj.statistics.rx.clear.set()
-        for i in range(duration):
-            x = i
-            # Read the filtered traffic stats - packet count since cleared
-            resp = await port_obj.statistics.rx.obtain_filter_statistics(filter=filter_idx).get()
-            y = resp.packet_count_since_cleared
-            data.append((x, y)) # type: ignore
-            ax.relim()
-            ax.autoscale_view()
-            line.set_data(*zip(*data))
-            plt.show()
-            plt.pause(plot_interval)
-        # plt.show()
-
-
-async def main():
-    stop_event = asyncio.Event()
+        fig.suptitle(f"Filter {filter_idx}: {labels['title']}")
+        line, = ax.step([], [], c='black')
+        ax.set(xlabel="Time (s)", ylabel="packet_count_since_cleared")
+        LivePlotRenderer(fig=fig, lines=[(line, 0)], buffer=buffer, frame_interval=frame_interval).run(acquisition)
+    finally:
+        stop.set()
+        acquisition.join()
+        if recorder is not None:
+            recorder.close()
+
+
+def main():
     try:
-        await live_plot(
+        live_plot(
             chassis=CHASSIS_IP,
             username=USERNAME,
             port_str=PORT,
             filter_idx=FILTER_IDX,
             duration=DURATION,
             win_size=WINDOW_SIZE,
-            plot_interval=PLOTTING_INTERVAL
+            plot_interval=PLOTTING_INTERVAL,
+            frame_interval=FRAME_INTERVAL,
+            headless=HEADLESS,
+            record_file=RECORD_FILE,
             )
     except KeyboardInterrupt:
-        stop_event.set()
+        pass
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
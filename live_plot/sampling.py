@@ -0,0 +1,187 @@
+################################################################
+#
+#                   SAMPLING AND RENDERING HELPERS
+#
+# Counter acquisition and plotting are decoupled:
+# 1. An asyncio task samples the counters at a fixed monotonic
+#    cadence into a preallocated NumPy ring buffer. It runs in
+#    its own thread so a slow redraw never delays a sample.
+# 2. A renderer in the main thread reads the ring buffer at its
+#    own frame rate and updates the existing line artists with
+#    set_data() and blitting.
+# 3. In headless mode no renderer is created and the samples are
+#    recorded to a CSV file instead.
+#
+################################################################
+
+import asyncio
+import csv
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+import numpy as np
+
+#---------------------------
+# SampleRingBuffer
+#---------------------------
+class SampleRingBuffer:
+    """Fixed-size ring buffer of timestamped samples, one column per series.
+
+    The storage is allocated once. ``append`` is called from the acquisition thread and ``snapshot`` from the renderer, both under a lock.
+    """
+
+    def __init__(self, series_count: int, capacity: int) -> None:
+        self.capacity = capacity
+        self.series_count = series_count
+        self._t = np.zeros(capacity, dtype=np.float64)
+        self._y = np.zeros((capacity, series_count), dtype=np.float64)
+        self._next = 0
+        self._count = 0
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def append(self, t: float, values: list[float]) -> None:
+        with self._lock:
+            self._t[self._next] = t
+            self._y[self._next, :] = values
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self._total += 1
+
+    @property
+    def total(self) -> int:
+        """Number of samples appended since creation, used by the renderer to detect new data."""
+        return self._total
+
+    def snapshot(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return copies of the buffered timestamps and values in chronological order."""
+        with self._lock:
+            if self._count < self.capacity:
+                return self._t[:self._count].copy(), self._y[:self._count].copy()
+            return np.roll(self._t, -self._next), np.roll(self._y, -self._next, axis=0)
+
+#---------------------------
+# SampleRecorder
+#---------------------------
+class SampleRecorder:
+    """Append samples to a CSV file. Used in headless mode or next to the renderer."""
+
+    def __init__(self, filename: str, series_names: list[str], flush_every: int = 10) -> None:
+        self._file = open(filename, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(["time"] + series_names)
+        self._flush_every = flush_every
+        self._pending = 0
+
+    def record(self, t: float, values: list[float]) -> None:
+        self._writer.writerow([f"{t:.6f}"] + values)
+        self._pending += 1
+        if self._pending >= self._flush_every:
+            self._file.flush()
+            self._pending = 0
+
+    def close(self) -> None:
+        self._file.close()
+
+#---------------------------
+# sample_at_fixed_rate
+#---------------------------
+async def sample_at_fixed_rate(
+        read_counters: Callable[[], Awaitable[list[float]]],
+        buffer: SampleRingBuffer,
+        interval: float,
+        duration: float,
+        stop_event: threading.Event,
+        recorder: Optional[SampleRecorder] = None) -> int:
+    """Call ``read_counters`` every ``interval`` seconds on a monotonic schedule.
+
+    The deadline of sample k is ``start + k*interval``, so the time axis does not drift when a query is slow.
+    If a query overruns one or more deadlines, those ticks are skipped rather than sent in a burst.
+
+    :return: the number of skipped ticks.
+    """
+    _start = time.monotonic()
+    _tick = 0
+    _skipped = 0
+    while not stop_event.is_set():
+        _deadline = _start + _tick * interval
+        if _deadline - _start > duration:
+            break
+        _now = time.monotonic()
+        if _deadline > _now:
+            await asyncio.sleep(_deadline - _now)
+        _t = time.monotonic() - _start
+        _values = await read_counters()
+        buffer.append(_t, _values)
+        if recorder is not None:
+            recorder.record(_t, _values)
+        _next_tick = int((time.monotonic() - _start) / interval) + 1
+        _skipped += max(0, _next_tick - _tick - 1)
+        _tick = max(_tick + 1, _next_tick)
+    return _skipped
+
+#---------------------------
+# start_acquisition_thread
+#---------------------------
+def start_acquisition_thread(coro: Callable[[], Awaitable[Any]]) -> threading.Thread:
+    """Run ``coro`` in its own event loop in a daemon thread so the main thread is free for the renderer."""
+    _thread = threading.Thread(target=lambda: asyncio.run(coro()), daemon=True)
+    _thread.start()
+    return _thread
+
+#---------------------------
+# LivePlotRenderer
+#---------------------------
+class LivePlotRenderer:
+    """Redraw existing line artists from a ring buffer at a fixed frame rate.
+
+    ``lines`` maps each artist to the column of the buffer it shows. Only the lines are redrawn with blitting.
+    The full figure is redrawn only when a line leaves the current axis limits.
+    """
+
+    def __init__(self, fig: Any, lines: list[tuple[Any, int]], buffer: SampleRingBuffer, frame_interval: float) -> None:
+        self.fig = fig
+        self.lines = lines
+        self.buffer = buffer
+        self.frame_interval = frame_interval
+        self._last_total = -1
+
+    def _rescale_if_needed(self, t: np.ndarray, y: np.ndarray) -> bool:
+        _changed = False
+        for _line, _col in self.lines:
+            _ax = _line.axes
+            _x0, _x1 = _ax.get_xlim()
+            _y0, _y1 = _ax.get_ylim()
+            _ymin, _ymax = float(y[:, _col].min()), float(y[:, _col].max())
+            if t[0] < _x0 or t[-1] > _x1 or _ymin < _y0 or _ymax > _y1:
+                _span = max(t[-1] - t[0], 1.0)
+                _ax.set_xlim(t[0], t[0] + _span * 1.1)
+                _pad = max((_ymax - _ymin) * 0.1, 1.0)
+                _ax.set_ylim(_ymin - _pad, _ymax + _pad)
+                _changed = True
+        return _changed
+
+    def _update(self, _frame: int) -> list[Any]:
+        if self.buffer.total == self._last_total:
+            return [_line for _line, _ in self.lines]
+        self._last_total = self.buffer.total
+        _t, _y = self.buffer.snapshot()
+        if len(_t) == 0:
+            return [_line for _line, _ in self.lines]
+        for _line, _col in self.lines:
+            _line.set_data(_t, _y[:, _col])
+        if self._rescale_if_needed(_t, _y):
+            self.fig.canvas.draw_idle()
+        return [_line for _line, _ in self.lines]
+
+    def run(self, acquisition_thread: threading.Thread) -> None:
+        """Animate until the figure is closed or the acquisition thread ends."""
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
+
+        _anim = FuncAnimation(self.fig, self._update, interval=self.frame_interval*1000, blit=True, cache_frame_data=False)
+        plt.show(block=False)
+        while acquisition_thread.is_alive() and plt.fignum_exists(self.fig.number):
+            plt.pause(self.frame_interval)
+        del _anim
@@ -0,0 +1,261 @@
+################################################################
+#
+#                   PRBS BER SOAK TEST
+#
+# What this script example does:
+# 1. Connect to a tester
+# 2. Reserve many ports. Must be Freya, Thor or Loki
+# 3. Reset the ports
+# 4. Set PRBS on all serdes of all ports in one batch per port
+# 5. Poll the PRBS status of all lanes of a port in one batch
+#    every second and accumulate bits and errors per lane
+# 6. Compute per-lane BER with confidence bounds
+# 7. Append a compact binary record per lane every interval,
+#    suitable for multi-day runs
+#
+# Each port's RX is expected to receive the PRBS sent by another
+# port in the list (or its own TX via a loopback).
+#
+################################################################
+
+import asyncio
+
+from xoa_driver import testers
+from xoa_driver import modules
+from xoa_driver import enums
+from xoa_driver import utils
+from xoa_driver.hlfuncs import mgmt
+import logging
+import math
+import time
+from statistics import NormalDist
+from typing import Any
+
+import numpy as np
+
+#---------------------------
+# GLOBAL PARAMS
+#---------------------------
+CHASSIS_IP = "10.165.136.60"
+USERNAME = "XOA"
+PORTS = ["3/0", "3/1", "6/0", "6/1"]
+DURATION = 3*24*3600            # Soak duration in seconds
+POLL_INTERVAL = 1.0             # PRBS status polling interval in seconds
+RECORD_INTERVAL = 60            # Number of polls aggregated into one record
+CONFIDENCE_LEVEL = 0.99         # Confidence level of the two-sided BER interval
+RECORD_FILE = "prbs_soak.bin"
+
+#---------------------------
+# RECORD FORMAT
+#---------------------------
+# One record per lane per interval. Load with load_soak_records().
+SOAK_RECORD_DTYPE = np.dtype([
+    ("time", "<f8"),            # seconds since start of soak
+    ("port", "<u2"),            # index into PORTS
+    ("lane", "<u1"),            # serdes index
+    ("lock", "<u1"),            # 1 if PRBS was locked in all polls of the interval
+    ("bits", "<u8"),            # bits received in the interval
+    ("errors", "<u8"),          # bit errors in the interval
+])
+
+def load_soak_records(filename: str) -> np.ndarray:
+    return np.fromfile(filename, dtype=SOAK_RECORD_DTYPE)
+
+#---------------------------
+# ber_bounds
+#---------------------------
+def ber_bounds(bits: np.ndarray, errors: np.ndarray, confidence: float) -> tuple[np.ndarray, np.ndarray]:
+    """Lower and upper BER bounds of the two-sided interval at ``confidence`` for each lane, using a Poisson model of the error count.
+
+    Each bound leaves (1-CL)/2 outside. With no errors the interval is exact, [0, -ln((1-CL)/2)/N], which is 5.3/N at 99%.
+    Otherwise the Wilson-Hilferty approximation of the Poisson interval is used.
+    """
+    _alpha = 1.0 - confidence
+    _z = NormalDist().inv_cdf(1.0 - _alpha/2.0)
+    _k = errors.astype(np.float64)
+    _n = np.maximum(bits.astype(np.float64), 1.0)
+    _k1 = _k + 1.0
+    _upper = _k1 * (1.0 - 1.0/(9.0*_k1) + _z/(3.0*np.sqrt(_k1)))**3 / _n
+    _upper = np.where(_k == 0, -math.log(_alpha/2.0) / _n, _upper)
+    _ks = np.maximum(_k, 1.0)
+    _lower = np.where(_k == 0, 0.0, _ks * np.maximum(1.0 - 1.0/(9.0*_ks) - _z/(3.0*np.sqrt(_ks)), 0.0)**3 / _n)
+    return _lower, _upper
+
+#---------------------------
+# PrbsSoakAccumulator
+#---------------------------
+class PrbsSoakAccumulator:
+    """Accumulate PRBS counters of all lanes of all ports in 64-bit arrays.
+
+    The ports run in accumulative statistics mode. Each poll gives the running totals, and the accumulator keeps the
+    previous totals to compute the delta. A total lower than the previous one means the counters were cleared, and the
+    new total is then taken as the delta.
+    """
+
+    def __init__(self, lane_counts: list[int]) -> None:
+        self.lane_counts = lane_counts
+        _max_lanes = max(lane_counts)
+        _shape = (len(lane_counts), _max_lanes)
+        self._last_bits = np.zeros(_shape, dtype=np.uint64)
+        self._last_errors = np.zeros(_shape, dtype=np.uint64)
+        self.total_bits = np.zeros(_shape, dtype=np.uint64)
+        self.total_errors = np.zeros(_shape, dtype=np.uint64)
+        self.interval_bits = np.zeros(_shape, dtype=np.uint64)
+        self.interval_errors = np.zeros(_shape, dtype=np.uint64)
+        self.interval_lock = np.ones(_shape, dtype=np.uint8)
+        self.valid = np.zeros(_shape, dtype=bool)
+        for _port, _count in enumerate(lane_counts):
+            self.valid[_port, :_count] = True
+
+    def update(self, port_index: int, bits: np.ndarray, errors: np.ndarray, locked: np.ndarray) -> None:
+        _n = len(bits)
+        _d_bits = np.where(bits >= self._last_bits[port_index, :_n], bits - self._last_bits[port_index, :_n], bits)
+        _d_errors = np.where(errors >= self._last_errors[port_index, :_n], errors - self._last_errors[port_index, :_n], errors)
+        self._last_bits[port_index, :_n] = bits
+        self._last_errors[port_index, :_n] = errors
+        self.total_bits[port_index, :_n] += _d_bits
+        self.total_errors[port_index, :_n] += _d_errors
+        self.interval_bits[port_index, :_n] += _d_bits
+        self.interval_errors[port_index, :_n] += _d_errors
+        self.interval_lock[port_index, :_n] &= locked
+
+    def ber(self) -> np.ndarray:
+        return self.total_errors / np.maximum(self.total_bits, 1)
+
+    def flush_interval(self, t: float) -> np.ndarray:
+        """Return the records of the finished interval and reset the interval counters."""
+        _ports, _lanes = np.nonzero(self.valid)
+        _records = np.empty(len(_ports), dtype=SOAK_RECORD_DTYPE)
+        _records["time"] = t
+        _records["port"] = _ports
+        _records["lane"] = _lanes
+        _records["lock"] = self.interval_lock[_ports, _lanes]
+        _records["bits"] = self.interval_bits[_ports, _lanes]
+        _records["errors"] = self.interval_errors[_ports, _lanes]
+        self.interval_bits[:] = 0
+        self.interval_errors[:] = 0
+        self.interval_lock[:] = 1
+        return _records
+
+#---------------------------
+# configure_prbs
+#---------------------------
+async def configure_prbs(port: Any, serdes_count: int, on_off: enums.PRBSOnOff) -> None:
+    """Configure PRBS and switch it on/off on all serdes of a port in one batch."""
+    _tokens = [
+        port.layer1.prbs_config.set(
+            prbs_inserted_type=enums.PRBSInsertedType.PHY_LINE,
+            polynomial=enums.PRBSPolynomial.PRBS13,
+            invert=enums.PRBSInvertState.INVERTED,
+            statistics_mode=enums.PRBSStatisticsMode.ACCUMULATIVE),
+    ]
+    _tokens += [
+        port.layer1.serdes[i].prbs.control.set(prbs_seed=0, prbs_on_off=on_off, error_on_off=enums.ErrorOnOff.ERRORSOFF)
+        for i in range(serdes_count)
+    ]
+    await utils.apply(*_tokens)
+
+#---------------------------
+# poll_prbs_status
+#---------------------------
+async def poll_prbs_status(port: Any, serdes_count: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Read the PRBS status of all serdes of a port in one batch."""
+    _resp = await utils.apply(*[port.layer1.serdes[i].prbs.status.get() for i in range(serdes_count)])
+    _bits = np.fromiter((r.byte_count*8 for r in _resp), dtype=np.uint64, count=serdes_count)
+    _errors = np.fromiter((r.error_count for r in _resp), dtype=np.uint64, count=serdes_count)
+    _locked = np.fromiter((r.lock == enums.PRBSLockStatus.PRBSON for r in _resp), dtype=np.uint8, count=serdes_count)
+    return _bits, _errors, _locked
+
+#---------------------------
+# prbs_ber_soak
+#---------------------------
+async def prbs_ber_soak(chassis: str, username: str, port_strs: list[str], duration: int, poll_interval: float, record_interval: int, confidence: float, record_file: str):
+    # configure basic logger
+    logging.basicConfig(
+        format="%(asctime)s  %(message)s",
+        level=logging.DEBUG,
+        handlers=[
+            logging.FileHandler(filename="prbs_soak.log", mode="a"),
+            logging.StreamHandler()]
+        )
+
+    # Establish connection to a Valkyrie tester using Python context manager
+    # The connection will be automatically terminated when it is out of the block
+    async with testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False) as tester:
+
+        # Get the port objects
+        port_objs = []
+        for port_str in port_strs:
+            _mid = int(port_str.split("/")[0])
+            _pid = int(port_str.split("/")[1])
+            module_obj = tester.modules.obtain(_mid)
+            if not isinstance(module_obj, (modules.Z800FreyaModule, modules.Z400ThorModule)):
+                logging.info(f"Module {_mid} is not Freya or Thor or Loki module")
+                return None
+            port_objs.append(module_obj.ports.obtain(_pid))
+
+        # Forcibly reserve the ports and reset them.
+        await mgmt.reserve_ports(ports=port_objs, reset=True)
+        await asyncio.sleep(5)
+
+        # Check how many serdes are there
+        _capabilities = await asyncio.gather(*[p.capabilities.get() for p in port_objs])
+        serdes_counts = [c.serdes_count for c in _capabilities]
+        for port_str, count in zip(port_strs, serdes_counts):
+            logging.info(f"Port {port_str} Serdes Count: {count}")
+
+        # Enable PRBS on all serdes of all ports
+        await asyncio.gather(*[configure_prbs(p, n, enums.PRBSOnOff.PRBSON) for p, n in zip(port_objs, serdes_counts)])
+        await asyncio.sleep(2.0)
+
+        # clear counters on all ports
+        await asyncio.gather(*[p.layer1.pcs.clear.set() for p in port_objs])
+
+        accumulator = PrbsSoakAccumulator(lane_counts=serdes_counts)
+        _start = time.monotonic()
+        _tick = 0
+        try:
+            with open(record_file, "ab") as f:
+                while time.monotonic() - _start < duration:
+                    _tick += 1
+                    _deadline = _start + _tick*poll_interval
+                    await asyncio.sleep(max(0.0, _deadline - time.monotonic()))
+
+                    _results = await asyncio.gather(*[poll_prbs_status(p, n) for p, n in zip(port_objs, serdes_counts)])
+                    for _idx, (_bits, _errors, _locked) in enumerate(_results):
+                        accumulator.update(_idx, _bits, _errors, _locked)
+
+                    if _tick % record_interval == 0:
+                        accumulator.flush_interval(time.monotonic() - _start).tofile(f)
+                        f.flush()
+                        _lower, _upper = ber_bounds(accumulator.total_bits, accumulator.total_errors, confidence)
+                        _ber = accumulator.ber()
+                        for _idx, port_str in enumerate(port_strs):
+                            for _lane in range(serdes_counts[_idx]):
+                                logging.info(f"Port {port_str} Serdes {_lane}: Bits={accumulator.total_bits[_idx, _lane]}, Errors={accumulator.total_errors[_idx, _lane]}, BER={_ber[_idx, _lane]:.3e}, {confidence*100:g}% CI=[{_lower[_idx, _lane]:.3e}, {_upper[_idx, _lane]:.3e}]")
+        finally:
+            # Stop PRBS on all serdes of all ports
+            await asyncio.gather(*[configure_prbs(p, n, enums.PRBSOnOff.PRBSOFF) for p, n in zip(port_objs, serdes_counts)])
+
+            # Release the ports
+            await mgmt.release_ports(ports=port_objs)
+
+async def main():
+    stop_event = asyncio.Event()
+    try:
+        await prbs_ber_soak(
+            chassis=CHASSIS_IP,
+            username=USERNAME,
+            port_strs=PORTS,
+            duration=DURATION,
+            poll_interval=POLL_INTERVAL,
+            record_interval=RECORD_INTERVAL,
+            confidence=CONFIDENCE_LEVEL,
+            record_file=RECORD_FILE,
+        )
+    except KeyboardInterrupt:
+        stop_event.set()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
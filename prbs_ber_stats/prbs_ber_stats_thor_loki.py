@@ -98,14 +98,11 @@ async def prbs_ber_stats(chassis: str, username: str, port_str1: str, port_str2:
             invert=enums.PRBSInvertState.INVERTED,
             statistics_mode=enums.PRBSStatisticsMode.PERSECOND)
 
-        # Enable PRBS on all serdes on the Tx port
+        # Enable PRBS on all serdes on the Tx port in one batch
+        _list = []
         for i in range(_serdes_count1):
-            await port_obj1.layer1.serdes[i].prbs.control.set(prbs_seed=0, prbs_on_off=enums.PRBSOnOff.PRBSON, error_on_off=enums.ErrorOnOff.ERRORSOFF)
-
-        # _list = []
-        # for i in range(_serdes_count1):
-        #     _list.append(port_obj1.serdes[i].prbs.tx_config.set(prbs_seed=0, prbs_on_off=enums.PRBSOnOff.PRBSON, error_on_off=enums.ErrorOnOff.ERRORSOFF))
-        # await utils.apply(*_list)
+            _list.append(port_obj1.layer1.serdes[i].prbs.control.set(prbs_seed=0, prbs_on_off=enums.PRBSOnOff.PRBSON, error_on_off=enums.ErrorOnOff.ERRORSOFF))
+        await utils.apply(*_list)
 
         await asyncio.sleep(2.0)
 
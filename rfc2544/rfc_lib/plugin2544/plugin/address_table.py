@@ -0,0 +1,120 @@
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+import numpy as np
+from .common import gen_macaddress
+from .data_model import AddressCollection
+from ..utils import exceptions
+from ..utils.field import MacAddress
+
+if TYPE_CHECKING:
+    from .structure import PortStruct
+    from ..model.m_test_config import MultiStreamConfig
+
+TX = 0
+RX = 1
+# gen_macaddress fills the last three bytes of the MAC address with the offset
+MAX_MAC_OFFSET = 0xFFFFFF
+
+
+class StreamOffsetTable:
+    """
+    Logical address offsets of the streams between each pair of ports, built in one pass.
+    Row k of a pair holds the tx and rx offset of stream k. The reversed pair shares the same array with the columns swapped.
+    """
+
+    def __init__(
+        self, tx_ports: List["PortStruct"], multi_stream_config: "MultiStreamConfig"
+    ) -> None:
+        self._pair_index: Dict[Tuple[str, str], int] = {}
+        for port_struct in tx_ports:
+            port_name = port_struct.port_identity.name
+            for peer_struct in port_struct.properties.peers:
+                peer_name = peer_struct.port_identity.name
+                if not (
+                    (port_name, peer_name) in self._pair_index
+                    or (peer_name, port_name) in self._pair_index
+                ):
+                    self._pair_index[(port_name, peer_name)] = len(self._pair_index)
+
+        offset = multi_stream_config.multi_stream_address_offset
+        inc = multi_stream_config.multi_stream_address_increment
+        stream_count = multi_stream_config.per_port_stream_count
+        tx_offsets = offset + 2 * inc * np.arange(
+            len(self._pair_index) * stream_count, dtype=np.int64
+        ).reshape(len(self._pair_index), stream_count)
+        self._offsets = np.stack((tx_offsets, tx_offsets + inc), axis=-1)
+        self._views: Dict[Tuple[str, str], Optional[np.ndarray]] = {}
+        self._address_tables: Dict[Tuple[str, str, str], "StreamAddressTable"] = {}
+
+    def get(self, port_name: str, peer_name: str) -> Optional[np.ndarray]:
+        """ offsets of the streams from port to peer, None if the ports are not paired """
+        key = (port_name, peer_name)
+        if key not in self._views:
+            if key in self._pair_index:
+                self._views[key] = self._offsets[self._pair_index[key]]
+            elif (peer_name, port_name) in self._pair_index:
+                self._views[key] = self._offsets[self._pair_index[(peer_name, port_name)], :, ::-1]
+            else:
+                self._views[key] = None
+        return self._views[key]
+
+    def address_table(
+        self, port_struct: "PortStruct", peer_struct: "PortStruct", mac_base_address: str
+    ) -> "StreamAddressTable":
+        key = (port_struct.port_identity.name, peer_struct.port_identity.name, mac_base_address)
+        if key not in self._address_tables:
+            offsets = self.get(key[0], key[1])
+            if offsets is None:
+                raise exceptions.OffsetNotExist()
+            self._address_tables[key] = StreamAddressTable(
+                port_struct, peer_struct, mac_base_address, offsets
+            )
+        return self._address_tables[key]
+
+
+class StreamAddressTable:
+    """ SMAC, DMAC, source IP and destination IP of all streams from a port to a peer, as integer arrays """
+
+    def __init__(
+        self,
+        port_struct: "PortStruct",
+        peer_struct: "PortStruct",
+        mac_base_address: str,
+        offsets: np.ndarray,
+    ) -> None:
+        self.stream_count = len(offsets)
+        mac_base = int(gen_macaddress(mac_base_address, 0).to_hexstring(), 16)
+        if self.stream_count and offsets.max() > MAX_MAC_OFFSET:
+            raise exceptions.MacAddressNotValid(f"{mac_base_address}:{int(offsets.max()):x}")
+        self._smac = np.uint64(mac_base) | offsets[:, TX].astype(np.uint64)
+        self._dmac = np.uint64(mac_base) | offsets[:, RX].astype(np.uint64)
+
+        src_ip = port_struct.port_conf.ip_address
+        dst_ip = peer_struct.port_conf.ip_address
+        self._cls_src = self._cls_dst = None
+        self._src_addr = self._dst_addr = None
+        if src_ip is not None and dst_ip is not None:
+            self._cls_src = src_ip.address.__class__
+            self._cls_dst = dst_ip.address.__class__
+            self._src_addr = self._network_addresses(src_ip.network, offsets[:, TX])
+            self._dst_addr = self._network_addresses(dst_ip.network, offsets[:, RX])
+
+    @staticmethod
+    def _network_addresses(network, offsets: np.ndarray) -> np.ndarray:
+        if len(offsets) and offsets.max() >= network.num_addresses:
+            raise IndexError("address out of range")
+        if network.version == 4:
+            return np.uint64(int(network.network_address)) + offsets.astype(np.uint64)
+        # IPv6 addresses do not fit in a machine integer
+        return int(network.network_address) + offsets.astype(object)
+
+    def __len__(self) -> int:
+        return self.stream_count
+
+    def address_collection(self, index: int, arp_mac: MacAddress) -> "AddressCollection":
+        return AddressCollection(
+            arp_mac=arp_mac,
+            smac=MacAddress(f"{int(self._smac[index]):012X}"),
+            dmac=MacAddress(f"{int(self._dmac[index]):012X}"),
+            src_addr=self._cls_src(int(self._src_addr[index])) if self._cls_src else None,
+            dst_addr=self._cls_dst(int(self._dst_addr[index])) if self._cls_dst else None,
+        )
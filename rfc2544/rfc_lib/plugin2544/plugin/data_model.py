@@ -1,5 +1,4 @@
 from dataclasses import dataclass, field
-from pydantic import BaseModel
 from typing import Optional, Union, Tuple, TYPE_CHECKING
 import time
 from ..utils.constants import PortProtocolVersion
@@ -23,14 +22,6 @@ class RXTableData:
     dmac: MacAddress
 
 
-class StreamOffset(BaseModel):
-    tx_offset: int
-    rx_offset: int
-
-    def reverse(self) -> "StreamOffset":
-        return StreamOffset(tx_offset=self.rx_offset, rx_offset=self.tx_offset)
-
-
 @dataclass
 class AddressCollection:
     smac: MacAddress = MacAddress()
@@ -48,6 +39,29 @@ class AddressCollection:
             return self.src_addr, self.dst_addr
         return self.smac, self.dmac
 
+@dataclass
+class StreamSetupTiming:
+    """ seconds spent in each phase of configuring the streams of one port """
+    port_name: str
+    stream_count: int = 0
+    token_count: int = 0
+    create: float = 0.0
+    allocate_modifiers: float = 0.0
+    build_tokens: float = 0.0
+    apply: float = 0.0
+
+    @property
+    def total(self) -> float:
+        return self.create + self.allocate_modifiers + self.build_tokens + self.apply
+
+    def __str__(self) -> str:
+        return (
+            f"{self.port_name}: {self.stream_count} streams, {self.token_count} commands in {self.total:.3f}s "
+            f"(create {self.create:.3f}s, modifiers {self.allocate_modifiers:.3f}s, "
+            f"build {self.build_tokens:.3f}s, apply {self.apply:.3f}s)"
+        )
+
+
 @dataclass
 class Progress:
     total: int
@@ -0,0 +1,204 @@
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from ..model.m_protocol_segment import ModifierActionOption, ProtocolSegmentProfileConfig
+from ..utils import protocol_segments as ps
+from ..utils.field import IPv4Address, IPv6Address, MacAddress
+from .data_model import AddressCollection
+
+
+class _SegmentInfo:
+    def __init__(self, start: int, length: int, checksum_offset: Optional[int]) -> None:
+        self.start = start
+        self.end = start + length
+        self.checksum_offset = checksum_offset
+
+
+class _AddressSlot:
+    """ byte offset of an address field that is filled in per stream """
+
+    def __init__(self, offset: int, segment: "_SegmentInfo") -> None:
+        self.offset = offset
+        self.segment = segment
+
+
+class HeaderTemplate:
+    """
+    Packet header of a protocol segment profile, built once.
+    The offsets of the MAC and IP address fields are recorded so a stream header is made by
+    patching its addresses into a copy of the template, instead of copying and preparing the whole profile.
+    """
+
+    def __init__(self, profile: ProtocolSegmentProfileConfig) -> None:
+        self.is_compiled = False
+        self._template = bytearray()
+        self._eth_dst: Optional[_AddressSlot] = None
+        self._eth_src: Optional[_AddressSlot] = None
+        self._ipv4: List[Tuple[Optional[_AddressSlot], Optional[_AddressSlot]]] = []
+        self._ipv6: List[Tuple[Optional[_AddressSlot], Optional[_AddressSlot]]] = []
+        self._compile(profile)
+
+    @staticmethod
+    def _can_compile(profile: ProtocolSegmentProfileConfig) -> bool:
+        for segment in profile.segments:
+            if segment.bit_length % 8:
+                return False
+            for value_range in segment.value_ranges:
+                # random value ranges give each stream its own value
+                if value_range.action == ModifierActionOption.RANDOM:
+                    return False
+        return True
+
+    def _compile(self, profile: ProtocolSegmentProfileConfig) -> None:
+        if not self._can_compile(profile):
+            return
+        self._template = profile.copy(deep=True).prepare()
+        byte_start = 0
+        for index, segment in enumerate(profile.segments):
+            info = _SegmentInfo(byte_start, segment.bit_length // 8, segment.checksum_offset)
+            field_offsets = {}
+            bit_pos = 0
+            for f in segment.fields:
+                field_offsets[f.name] = (bit_pos, f)
+                bit_pos += f.bit_length
+
+            def slot(name: str, bit_length: int) -> Optional[_AddressSlot]:
+                if name not in field_offsets:
+                    return None
+                pos, f = field_offsets[name]
+                # a field with a value range keeps the value the template rendered for it
+                if pos % 8 or f.bit_length != bit_length or not f.is_all_zero or f.value_range:
+                    return None
+                return _AddressSlot(info.start + pos // 8, info)
+
+            if segment.type.is_ethernet and index == 0:
+                self._eth_dst = slot(ps.ETHERNET_ADDRESS_DST, 48)
+                self._eth_src = slot(ps.ETHERNET_ADDRESS_SRC, 48)
+            if segment.type.is_ipv4:
+                self._ipv4.append((slot(ps.IPV4_ADDRESS_SRC, 32), slot(ps.IPV4_ADDRESS_DST, 32)))
+            if segment.type.is_ipv6:
+                self._ipv6.append((slot(ps.IPV6_ADDRESS_SRC, 128), slot(ps.IPV6_ADDRESS_DST, 128)))
+            byte_start = info.end
+        self.is_compiled = True
+
+    @staticmethod
+    def _update_checksum(header: bytearray, segment: "_SegmentInfo") -> None:
+        """ same 16-bit one's complement checksum as ProtocolSegment.prepare, over the segment only """
+        offset = segment.start + segment.checksum_offset    # type: ignore
+        header[offset] = header[offset + 1] = 0
+        checksum = 0
+        for i in range(segment.start, segment.end, 2):
+            checksum += (header[i] << 8) + header[i + 1]
+            if checksum > 0xFFFF:
+                checksum = (1 + checksum) & 0xFFFF
+        header[offset] = 0xFF - (checksum >> 8)
+        header[offset + 1] = 0xFF - (checksum & 0xFF)
+
+    def build(self, addr_coll: AddressCollection) -> bytearray:
+        """ stream header with the addresses of addr_coll, same result as patching a profile copy with setup_segment_* """
+        header = bytearray(self._template)
+        patched = set()
+
+        def patch(slot: Optional[_AddressSlot], value: bytes) -> None:
+            if slot is None:
+                return
+            header[slot.offset:slot.offset + len(value)] = value
+            if slot.segment.checksum_offset:
+                patched.add(slot.segment)
+
+        arp_mac = addr_coll.arp_mac
+        dst_mac = addr_coll.dmac if not arp_mac or arp_mac.is_empty else arp_mac
+        if not dst_mac.is_empty:
+            patch(self._eth_dst, dst_mac.to_bytearray())
+        if not addr_coll.smac.is_empty:
+            patch(self._eth_src, addr_coll.smac.to_bytearray())
+
+        src_addr, dst_addr = addr_coll.src_addr, addr_coll.dst_addr
+        if isinstance(src_addr, IPv4Address) and isinstance(dst_addr, IPv4Address):
+            for src_slot, dst_slot in self._ipv4:
+                patch(src_slot, src_addr.packed)
+                patch(dst_slot, dst_addr.packed)
+        if isinstance(src_addr, IPv6Address) and isinstance(dst_addr, IPv6Address):
+            for src_slot, dst_slot in self._ipv6:
+                patch(src_slot, src_addr.packed)
+                patch(dst_slot, dst_addr.packed)
+
+        for segment in patched:
+            self._update_checksum(header, segment)
+        return header
+
+
+def prepare_header(profile: ProtocolSegmentProfileConfig, addr_coll: AddressCollection) -> bytearray:
+    """ packet header from a copy of the profile with the addresses of addr_coll, used when the profile cannot be compiled into a template """
+    # Insert all configured header segments in order
+    profile = profile.copy(deep=True)
+    for index, segment in enumerate(profile.segments):
+        if segment.type.is_ethernet and index == 0:
+            ps.setup_segment_ethernet(
+                segment,
+                addr_coll.smac,
+                addr_coll.dmac,
+                addr_coll.arp_mac,
+            )
+        if (
+            segment.type.is_ipv4
+            and isinstance(addr_coll.src_addr, IPv4Address)
+            and isinstance(addr_coll.dst_addr, IPv4Address)
+        ):
+            ps.setup_segment_ipv4(
+                segment,
+                addr_coll.src_addr,
+                addr_coll.dst_addr,
+            )
+        if (
+            segment.type.is_ipv6
+            and isinstance(addr_coll.src_addr, IPv6Address)
+            and isinstance(addr_coll.dst_addr, IPv6Address)
+        ):
+            ps.setup_segment_ipv6(
+                segment,
+                addr_coll.src_addr,
+                addr_coll.dst_addr,
+            )
+
+    return profile.prepare()
+
+
+def benchmark_header_template(config: Dict[str, Any], count: int, seed: int = 0) -> None:
+    """
+    build the headers of count streams with random addresses for every protocol segment profile of an RFC2544 xoa config,
+    with the template and with prepare_header, check that both give the same bytes and log the time each takes
+    no port is needed, the headers are built as StreamStruct.build_packet_header builds them before sending
+    """
+    rng = random.Random(seed)
+    for profile_data in config["config"]["protocol_segments"]:
+        profile = ProtocolSegmentProfileConfig(**profile_data)
+        is_ipv6 = profile.protocol_version.is_ipv6
+        addr_colls = []
+        for _ in range(count):
+            ip_class, ip_bits = (IPv6Address, 128) if is_ipv6 else (IPv4Address, 32)
+            addr_colls.append(AddressCollection(
+                smac=MacAddress(f"{rng.getrandbits(48):012X}"),
+                dmac=MacAddress(f"{rng.getrandbits(48):012X}"),
+                src_addr=ip_class(rng.getrandbits(ip_bits)),
+                dst_addr=ip_class(rng.getrandbits(ip_bits)),
+            ))
+
+        start = time.perf_counter()
+        template = HeaderTemplate(profile)
+        if not template.is_compiled:
+            logger.info(f"profile {profile.id}: not compiled, every stream uses prepare_header")
+            continue
+        built = [template.build(addr_coll) for addr_coll in addr_colls]
+        template_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        prepared = [prepare_header(profile, addr_coll) for addr_coll in addr_colls]
+        prepare_time = time.perf_counter() - start
+
+        mismatches = sum(a != b for a, b in zip(built, prepared))
+        logger.info(
+            f"profile {profile.id}: {count} headers, template {template_time:.3f}s, prepare_header {prepare_time:.3f}s "
+            f"({prepare_time / template_time:.1f}x), {mismatches} mismatches"
+        )
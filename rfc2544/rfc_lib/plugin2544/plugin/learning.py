@@ -1,14 +1,20 @@
-import math
+import time
 import asyncio
+from functools import partial
 from xoa_driver import utils
 from xoa_driver.misc import Hex
-from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple, Union
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple, Union
 from .data_model import ArpRefreshData
 from .setup_source_port_rates import setup_source_port_rates
 from ..utils import exceptions, constants as const
-from ..utils.scheduler import schedule
+from ..utils.scheduler import TimerStatistics, TimerWheel, schedule_timer_wheel
 from ..utils.field import IPv4Address, IPv6Address
-from ..utils.packet import ARPPacket, MacAddress, NDPPacket
+from ..utils.packet import (
+    ARPPacketTemplate,
+    LearningPacketTemplate,
+    MacAddress,
+    NDPPacketTemplate,
+)
 from loguru import logger
 
 if TYPE_CHECKING:
@@ -83,12 +89,11 @@ def get_address_list(
     return source_ip_list
 
 
-async def get_address_learning_packet(
+def get_learning_packet_template(
     port_struct: "PortStruct",
-    arp_refresh_data: ArpRefreshData,
     use_gateway=False,
-) -> List[str]:  # GetAddressLearningPacket
-    """ARP REFRESH STEP 2: generate learning packet according to address_refresh_data_set"""
+) -> "LearningPacketTemplate":
+    """ARP/NDP learning packet of the port, the sender MAC and IP of each address are stamped into it"""
     dmac = MacAddress("FFFFFFFFFFFF")
     if not port_struct.port_conf.ip_address:
         raise exceptions.IPAddressMissing()
@@ -98,6 +103,35 @@ async def get_address_learning_packet(
         gwmac = port_struct.port_conf.ip_gateway_mac_address
         if not gwmac.is_empty:
             dmac = gwmac
+    smac = port_struct.properties.native_mac_address
+    if port_struct.protocol_version.is_ipv4:
+        destination_ip = sender_ip if gateway.is_empty else gateway
+        return ARPPacketTemplate(
+            smac=smac,
+            source_ip=IPv4Address(sender_ip),
+            destination_ip=IPv4Address(destination_ip),
+            dmac=dmac,
+        )
+    return NDPPacketTemplate(
+        smac=smac,
+        source_ip=IPv6Address(sender_ip),
+        destination_ip=IPv6Address(get_link_local_uci_ipv6address(dmac)),
+        dmac=dmac,
+    )
+
+
+async def get_address_learning_packet(
+    port_struct: "PortStruct",
+    arp_refresh_data: ArpRefreshData,
+    use_gateway=False,
+    template: Optional["LearningPacketTemplate"] = None,
+) -> List[str]:  # GetAddressLearningPacket
+    """ARP REFRESH STEP 2: generate learning packet according to address_refresh_data_set"""
+    if not port_struct.port_conf.ip_address:
+        raise exceptions.IPAddressMissing()
+    if template is None:
+        template = get_learning_packet_template(port_struct, use_gateway)
+    sender_ip = port_struct.port_conf.ip_address.address
     smac = (
         port_struct.properties.native_mac_address
         if not arp_refresh_data.source_mac or arp_refresh_data.source_mac.is_empty
@@ -108,28 +142,11 @@ async def get_address_learning_packet(
         if not arp_refresh_data.source_ip or arp_refresh_data.source_ip.is_empty
         else arp_refresh_data.source_ip
     )
-    source_ip_list = get_address_list(source_ip, arp_refresh_data.addr_range)
-    packet_list = []
-    for source_ip in source_ip_list:
-        if port_struct.protocol_version.is_ipv4:
-            destination_ip = sender_ip if gateway.is_empty else gateway
-            packet = ARPPacket(
-                smac=smac,
-                source_ip=IPv4Address(source_ip),
-                destination_ip=IPv4Address(destination_ip),
-                dmac=dmac,
-            ).make_arp_packet()
-
-        else:
-            destination_ip = get_link_local_uci_ipv6address(dmac)
-            packet = NDPPacket(
-                smac=smac,
-                source_ip=IPv6Address(source_ip),
-                destination_ip=IPv6Address(destination_ip),
-                dmac=dmac,
-            ).make_ndp_packet()
-        packet_list.append(packet)
-    return packet_list
+    address_cls = IPv4Address if port_struct.protocol_version.is_ipv4 else IPv6Address
+    return [
+        template.make_packet(smac, address_cls(source_ip))
+        for source_ip in get_address_list(source_ip, arp_refresh_data.addr_range)
+    ]
 
 
 async def setup_address_refresh(
@@ -138,11 +155,19 @@ async def setup_address_refresh(
     address_refresh_tokens: List[Tuple["misc.Token", bool]] = []
     for port_struct in resources.port_structs:
         arp_data_set = port_struct.properties.address_refresh_data_set
+        template = (
+            get_learning_packet_template(
+                port_struct, resources.test_conf.use_gateway_mac_as_dmac
+            )
+            if arp_data_set
+            else None
+        )
         for arp_data in arp_data_set:
             packet_list = await get_address_learning_packet(
                 port_struct,
                 arp_data,
                 resources.test_conf.use_gateway_mac_as_dmac,
+                template,
             )
             for packet in packet_list:
                 address_refresh_tokens.append(
@@ -155,6 +180,22 @@ async def setup_address_refresh(
     return address_refresh_tokens
 
 
+async def send_learning_tokens(tokens: List["misc.Token"]) -> None:
+    """
+    send tx_single_pkt commands in one batch per tester connection, all connections concurrently
+    utils.apply_iter writes the whole batch to the connection of its first command, so commands to different testers are not mixed
+    """
+    groups: Dict[int, List["misc.Token"]] = {}
+    for token in tokens:
+        groups.setdefault(id(token.connection), []).append(token)
+
+    async def send_group(group: List["misc.Token"]) -> None:
+        async for _ in utils.apply_iter(*group):
+            pass
+
+    await asyncio.gather(*[send_group(group) for group in groups.values()])
+
+
 async def setup_address_arp_refresh(
     resources: "ResourceManager",
 ) -> "AddressRefreshHandler":  # SetupAddressArpRefresh
@@ -166,44 +207,20 @@ async def setup_address_arp_refresh(
 
 
 class AddressRefreshHandler:
-    """set packet interval and return batch"""
+    """spread the refresh packets evenly over the refresh period and return them slot by slot"""
 
     def __init__(
         self,
         address_refresh_tokens: List[Tuple["misc.Token", bool]],
         refresh_period: float,
     ) -> None:
-        self.index = 0
-        self.refresh_burst_size = 1
         self.tokens: List["misc.Token"] = []
         self.address_refresh_tokens = address_refresh_tokens
         self.interval = 0.0  # unit: second
-        self.refresh_period = refresh_period
+        self.refresh_period = refresh_period    # unit: millisecond
         self.state = const.TestState.L3_LEARNING
-
-    def get_batch(self) -> List["misc.Token"]:
-        packet_list = []
-        if self.index >= len(self.tokens):
-            self.index = 0
-        for _ in range(self.refresh_burst_size):
-            if self.index < len(self.tokens):
-                packet_list.append(self.tokens[self.index])
-                self.index += 1
-        return packet_list
-
-    def _calc_refresh_time_interval(
-        self, refresh_tokens: List["misc.Token"]
-    ) -> None:  # CalcRefreshTimerInternal
-        total_refresh_count = len(refresh_tokens)
-        if total_refresh_count > 0:
-            self.refresh_burst_size = 1
-            interval = math.floor(self.refresh_period / total_refresh_count)
-            if interval < const.MIN_REFRESH_TIMER_INTERNAL:
-                self.refresh_burst_size = math.ceil(
-                    const.MIN_REFRESH_TIMER_INTERNAL / interval
-                )
-                interval = const.MIN_REFRESH_TIMER_INTERNAL
-            self.interval = interval / 1000.0  # ms -> second
+        self.wheel = TimerWheel([], 1.0, 1.0)
+        self.statistics = TimerStatistics()
 
     def set_current_state(self, state: "const.TestState") -> "AddressRefreshHandler":
         """
@@ -222,31 +239,48 @@ class AddressRefreshHandler:
                 for refresh_token in self.address_refresh_tokens
                 if refresh_token[1]
             ]
-        self._calc_refresh_time_interval(self.tokens)
+        self.wheel = TimerWheel(
+            self.tokens,
+            self.refresh_period / 1000.0,   # ms -> second
+            const.MIN_REFRESH_TIMER_INTERNAL / 1000.0,
+        )
+        self.interval = self.wheel.tick
+        self.statistics = TimerStatistics()
         return self
 
 
 async def generate_l3_learning_packets(
-    _count: int,
+    tokens: List["misc.Token"],
     resources: "ResourceManager",
-    address_refresh_handler: "AddressRefreshHandler",
+    statistics: TimerStatistics,
+    interval: float,
 ) -> bool:
-    tokens = address_refresh_handler.get_batch()
-    await utils.apply(*tokens)
-
-    return not resources.test_running()
+    await send_learning_tokens(tokens)
+    if resources.test_running():
+        return False
+    logger.debug(
+        f"Address refresh: {statistics.ticks} ticks of {interval:.3f}s, "
+        f"{statistics.missed_deadlines} missed deadlines, "
+        f"jitter avg {statistics.average_jitter * 1000:.1f}ms max {statistics.max_jitter * 1000:.1f}ms"
+    )
+    return True
 
 
 async def send_l3_learning_packets(
     resources: "ResourceManager",
     address_refresh_handler: "AddressRefreshHandler",
 ) -> None:
-    await schedule(
-        address_refresh_handler.interval,
-        "s",
-        generate_l3_learning_packets,
-        resources,
-        address_refresh_handler,
+    # the job keeps the wheel and statistics of the state it was scheduled in,
+    # set_current_state replaces those of the handler for the next job
+    await schedule_timer_wheel(
+        address_refresh_handler.wheel,
+        partial(
+            generate_l3_learning_packets,
+            resources=resources,
+            statistics=address_refresh_handler.statistics,
+            interval=address_refresh_handler.interval,
+        ),
+        address_refresh_handler.statistics,
     )
 
 
@@ -277,7 +311,7 @@ async def add_L2L3_learning_preamble_steps(
     await resources.start_traffic()
     if address_refresh_handler:
         address_refresh_handler.set_current_state(const.TestState.L3_LEARNING)
-        await asyncio.gather(*address_refresh_handler.tokens)
+        await send_learning_tokens(address_refresh_handler.tokens)
         await schedule_arp_refresh(
             resources, address_refresh_handler, const.TestState.L3_LEARNING
         )
@@ -358,6 +392,10 @@ async def add_mac_learning_steps(
                 )
                 done_struct.append(dest_port_struct.port_identity.name)
                 tasks.append(tokens)
-    for _ in range(mac_learning_frame_count):
-        await asyncio.gather(*tasks)
-        await asyncio.sleep(const.DELAY_LEARNING_MAC)
+    # rounds start DELAY_LEARNING_MAC apart, however long sending a round takes
+    start = time.monotonic()
+    for i in range(mac_learning_frame_count):
+        await send_learning_tokens(tasks)
+        await asyncio.sleep(
+            max(0.0, start + (i + 1) * const.DELAY_LEARNING_MAC - time.monotonic())
+        )
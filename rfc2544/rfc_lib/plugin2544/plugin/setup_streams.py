@@ -1,9 +1,12 @@
 import asyncio
-from typing import Dict, List, Tuple, TYPE_CHECKING
+from typing import Dict, List, Optional, TYPE_CHECKING
+import numpy as np
+from .address_table import StreamOffsetTable
 from .arp_request import set_arp_request
 from .common import TPLDControl
-from .data_model import StreamOffset
-from ..utils import exceptions
+from .data_model import StreamSetupTiming
+from ..utils import exceptions, constants as const
+from loguru import logger
 
 if TYPE_CHECKING:
     from .structure import PortStruct
@@ -12,8 +15,10 @@ if TYPE_CHECKING:
 
 
 async def setup_streams(
-    port_structs: List["PortStruct"], test_conf: "TestConfigData"
-) -> None:
+    port_structs: List["PortStruct"],
+    test_conf: "TestConfigData",
+    max_concurrent_ports: int = const.MAX_CONCURRENT_STREAM_SETUP_PORTS,
+) -> List["StreamSetupTiming"]:
     if not test_conf.is_stream_based:   
         # add modifier on TX ports
         test_port_index_map = {
@@ -37,52 +42,38 @@ async def setup_streams(
         else:
             add_standard_streams(port_structs, test_conf)
 
-    for port_struct in port_structs:
-        await port_struct.configure_streams(test_conf)
+    semaphore = asyncio.Semaphore(max_concurrent_ports)
+
+    async def configure_port_streams(port_struct: "PortStruct") -> "StreamSetupTiming":
+        async with semaphore:
+            timing = await port_struct.configure_streams(test_conf)
         # set should stop on los before start traffic, can monitor sync status when traffic start
         port_struct.set_should_stop_on_los(test_conf.should_stop_on_los)
+        logger.debug(f"Stream setup {timing}")
+        return timing
+
+    return list(
+        await asyncio.gather(
+            *[configure_port_streams(port_struct) for port_struct in port_structs]
+        )
+    )
 
 
 def get_stream_offsets(
-    offset_table: Dict[Tuple[str, str], List["StreamOffset"]],
+    offset_table: "StreamOffsetTable",
     port_index: str,
     peer_index: str,
-) -> List["StreamOffset"]:
+) -> Optional[np.ndarray]:
     """ stream offset is used to generate stream mac addr and ip addr"""
-    if (port_index, peer_index) in offset_table:
-        return offset_table[(port_index, peer_index)]
-    elif (peer_index, port_index) in offset_table:
-        return [
-            stream_offset.reverse()
-            for stream_offset in offset_table[(peer_index, port_index)]
-        ]
-    return []
+    return offset_table.get(port_index, peer_index)
 
 
 def setup_offset_table(
     tx_ports: List["PortStruct"],
     multi_stream_config: "MultiStreamConfig",
-) -> Dict[Tuple[str, str], List["StreamOffset"]]:
+) -> "StreamOffsetTable":
     """ generate a offset table for logical mac address and ip address """
-    offset_table = {}
-    offset = multi_stream_config.multi_stream_address_offset
-    inc = multi_stream_config.multi_stream_address_increment
-    for port_struct in tx_ports:
-        port_name = port_struct.port_identity.name
-        for peer_struct in port_struct.properties.peers:
-            peer_name = peer_struct.port_identity.name
-            if not (
-                (port_name, peer_name) in offset_table
-                or (peer_name, port_name) in offset_table
-            ):
-                offsets = []
-                for _ in range(multi_stream_config.per_port_stream_count):
-                    offsets.append(
-                        StreamOffset(tx_offset=offset, rx_offset=offset + inc)
-                    )
-                    offset += inc * 2
-                offset_table[(port_name, peer_name)] = offsets
-    return offset_table
+    return StreamOffsetTable(tx_ports, multi_stream_config)
 
 
 def add_modifier_based_stream(
@@ -112,12 +103,15 @@ def add_multi_streams(
         for peer_struct in port_struct.properties.peers:
             if test_conf.enable_multi_stream:
                 peer_index = peer_struct.port_identity.name
-                offsets_list = get_stream_offsets(
+                offsets = get_stream_offsets(
                     offset_table, port_struct.port_identity.name, peer_index
                 )
-                if not offsets_list:
+                if offsets is None or not len(offsets):
                     raise exceptions.OffsetNotExist()
-                for offsets in offsets_list:
+                address_table = offset_table.address_table(
+                    port_struct, peer_struct, test_conf.multi_stream_mac_base_address
+                )
+                for address_index in range(len(address_table)):
                     tpldid = tpld_controller.get_tpldid(
                         port_struct.properties.test_port_index,
                         peer_struct.properties.test_port_index,
@@ -131,7 +125,8 @@ def add_multi_streams(
                         stream_id_counter,
                         tpldid,
                         peer_struct.properties.arp_mac_address,
-                        offsets,
+                        address_table,
+                        address_index,
                     )
                     stream_id_counter += 1
 
@@ -6,12 +6,11 @@ from ..model.m_protocol_segment import (
     HWModifier,
     ModifierActionOption,
 )
-from .common import gen_macaddress
 from .data_model import (
     AddressCollection,
     RXTableData,
-    StreamOffset,
 )
+from .header_template import prepare_header
 from .learning import add_address_refresh_entry
 from .statistics import (
     DelayData,
@@ -19,14 +18,14 @@ from .statistics import (
     StreamCounter,
     StreamStatisticData,
 )
-from ..utils.field import MacAddress, IPv4Address, IPv6Address
-from ..utils import constants as const, protocol_segments as ps, exceptions
-from collections import defaultdict
+from ..utils.field import MacAddress
+from ..utils import constants as const, exceptions
 from loguru import logger
 
 if TYPE_CHECKING:
     from .structure import PortStruct
     from .test_config import TestConfigData
+    from .address_table import StreamAddressTable
 
 
 class PTStream:
@@ -96,7 +95,8 @@ class StreamStruct:
         stream_id: int,
         tpldid: int,
         arp_mac: MacAddress = MacAddress(),
-        stream_offset: Optional["StreamOffset"] = None,
+        address_table: Optional["StreamAddressTable"] = None,
+        address_index: int = 0,
     ):
         self._tx_port: "PortStruct" = tx_port
         self._rx_ports: List["PortStruct"] = rx_ports
@@ -106,7 +106,8 @@ class StreamStruct:
         self.__is_stream_based: bool = True
         self._addr_coll: AddressCollection = AddressCollection()
         self._packet_header: bytearray = bytearray()
-        self._stream_offset = stream_offset
+        self._address_table = address_table    # multi stream addresses, row address_index
+        self._address_index = address_index
         self._packet_limit: int = 0
         self._stream_statistic: StreamStatisticData = (
             StreamStatisticData()
@@ -160,23 +161,29 @@ class StreamStruct:
         if self._best_result:
             self._best_result.calculate(self._tx_port, self.rx_port)
 
-    async def configure(self, test_conf: "TestConfigData") -> None:
+    async def create(self, test_conf: "TestConfigData") -> None:
+        """ create the stream on the tx port and resolve its addresses """
         stream = await self._tx_port.create_stream()
         self._stream = stream
-        base_mac = (
-            test_conf.multi_stream_mac_base_address
-            if test_conf.is_stream_based
-            else test_conf.mac_base_address
-        )
         self.__is_stream_based = test_conf.is_stream_based
-        self._addr_coll = get_address_collection(
-            self._tx_port,
-            self.rx_port,
-            base_mac,
-            self._arp_mac,
-            self._stream_offset,
-        )
-        await utils.apply(
+        if self._address_table is not None:
+            self._addr_coll = self._address_table.address_collection(
+                self._address_index, self._arp_mac
+            )
+        else:
+            self._addr_coll = get_address_collection(
+                self._tx_port,
+                self.rx_port,
+                self._arp_mac,
+            )
+
+    async def allocate_modifiers(self) -> None:
+        """ modifier objects only exist after the modifier count is set, so this cannot be part of the batch """
+        await self._stream.packet.header.modifiers.configure(len(self.hw_modifiers))
+
+    def configuration_tokens(self, test_conf: "TestConfigData") -> List:
+        """ all commands configuring a created stream, to be sent in one batch """
+        tokens = [
             self._stream.enable.set(enums.OnOffWithSuppress.ON),
             self._stream.comment.set(f"Stream {self._stream_id} / {self._tpldid}"),
             self._stream.packet.header.protocol.set(
@@ -184,24 +191,21 @@ class StreamStruct:
             ),
             self._stream.payload.content.set(
                 test_conf.payload_type.to_xmp(),
-                misc.Hex(test_conf.payload_pattern), 
+                misc.Hex(test_conf.payload_pattern),
             ),
             self._stream.tpld_id.set(test_payload_identifier=self._tpldid),
             self._stream.insert_packets_checksum.set(enums.OnOff.ON),
-        )
-        await self.set_packet_header()
-        await self.setup_modifier()
-        self.init_rx_tables(
-            test_conf.arp_refresh_enabled,
-            test_conf.use_gateway_mac_as_dmac,
-        )
+            self._stream.packet.header.data.set(self.build_packet_header().hex()),    # type: ignore
+        ]
+        tokens.extend(self.modifier_tokens())
+        return tokens
 
     def init_rx_tables(
         self, arp_refresh_enabled: bool, use_gateway_mac_as_dmac: bool
     ) -> None:
         if not arp_refresh_enabled or not self._tx_port.protocol_version.is_l3:
             return
-        if self._stream_offset and self._addr_coll.dst_addr:
+        if self._address_table is not None and self._addr_coll.dst_addr:
             if self._tx_port.protocol_version.is_ipv4:
                 self.rx_port.properties.arp_trunks.add(
                     RXTableData(self._addr_coll.dst_addr, self._addr_coll.dmac)
@@ -260,60 +264,41 @@ class StreamStruct:
             # aggregate data on tx port statistic based on pt_stream
             self._tx_port.statistic.aggregate_tx_statistic(self._stream_statistic)
 
-    async def set_packet_header(self) -> None:
+    def build_packet_header(self) -> bytearray:
+        template = self._tx_port.header_template
+        if template.is_compiled:
+            self._packet_header = template.build(self._addr_coll)
+        else:
+            self._packet_header = self.prepare_packet_header()
+        return self._packet_header
+
+    def prepare_packet_header(self) -> bytearray:
         """
-        get packet header based on segment
+        build the packet header from a copy of the port profile, used when the profile cannot be compiled into a template
         """
-        # Insert all configured header segments in order
-        profile = self._tx_port.port_conf.profile.copy(deep=True)
-        for index, segment in enumerate(profile.segments):
-            if segment.type.is_ethernet and index == 0:
-                ps.setup_segment_ethernet(
-                    segment,
-                    self._addr_coll.smac,
-                    self._addr_coll.dmac,
-                    self._addr_coll.arp_mac,
-                )
-            if (
-                segment.type.is_ipv4
-                and isinstance(self._addr_coll.src_addr, IPv4Address)
-                and isinstance(self._addr_coll.dst_addr, IPv4Address)
-            ):
-                ps.setup_segment_ipv4(
-                    segment,
-                    self._addr_coll.src_addr,
-                    self._addr_coll.dst_addr,
-                )
-            if (
-                segment.type.is_ipv6
-                and isinstance(self._addr_coll.src_addr, IPv6Address)
-                and isinstance(self._addr_coll.dst_addr, IPv6Address)
-            ):
-                ps.setup_segment_ipv6(
-                    segment,
-                    self._addr_coll.src_addr,
-                    self._addr_coll.dst_addr,
-                )
-
-        self._packet_header = profile.prepare()
-        await self._stream.packet.header.data.set(self._packet_header.hex())    # type: ignore
+        return prepare_header(self._tx_port.port_conf.profile, self._addr_coll)
 
-    async def setup_modifier(self) -> None:
+    def modifier_tokens(self) -> List:
         modifiers = self._stream.packet.header.modifiers
-        await modifiers.configure(len(self.hw_modifiers))
+        tokens = []
         for mid, hw_modifier in enumerate(self.hw_modifiers):
             modifier = modifiers.obtain(mid)
-            await modifier.specification.set(
-                position=hw_modifier.byte_segment_position,
-                mask=misc.Hex(f"{hw_modifier.mask}"),    
-                action=hw_modifier.action.to_xmp(),
-                repetition=hw_modifier.repeat,
+            tokens.append(
+                modifier.specification.set(
+                    position=hw_modifier.byte_segment_position,
+                    mask=misc.Hex(f"{hw_modifier.mask}"),
+                    action=hw_modifier.action.to_xmp(),
+                    repetition=hw_modifier.repeat,
+                )
             )
-            await modifier.range.set(
-                min_val=hw_modifier.start_value,
-                step=hw_modifier.step_value,
-                max_val=hw_modifier.stop_value,
+            tokens.append(
+                modifier.range.set(
+                    min_val=hw_modifier.start_value,
+                    step=hw_modifier.step_value,
+                    max_val=hw_modifier.stop_value,
+                )
             )
+        return tokens
 
     async def set_packet_size(
         self, packet_size_type: enums.LengthType, min_size: int, max_size: int
@@ -333,39 +318,21 @@ class StreamStruct:
 def get_address_collection(
     port_struct: "PortStruct",
     peer_struct: "PortStruct",
-    mac_base_address: str,
     arp_mac: MacAddress,
-    stream_offset: Optional[StreamOffset] = None,
 ) -> "AddressCollection":
-    default_none = defaultdict(None)
     if (
         port_struct.port_conf.ip_address is None
         or peer_struct.port_conf.ip_address is None
     ):
-        src_network = dst_network = default_none
         src_addr = dst_addr = None
-        cls_src = cls_dst = None
     else:
-        src_network = port_struct.port_conf.ip_address.network
-        dst_network = peer_struct.port_conf.ip_address.network
-        cls_src = port_struct.port_conf.ip_address.address.__class__
-        cls_dst = peer_struct.port_conf.ip_address.address.__class__
         # TODO: Need to compare src and dst class?
         src_addr = port_struct.port_conf.ip_address.address
         dst_addr = peer_struct.port_conf.ip_address.dst_addr
-    if stream_offset:
-        return AddressCollection(
-            arp_mac=arp_mac,
-            smac=gen_macaddress(mac_base_address, stream_offset.tx_offset),
-            dmac=gen_macaddress(mac_base_address, stream_offset.rx_offset),
-            src_addr=cls_src(src_network[stream_offset.tx_offset]) if cls_src else None,
-            dst_addr=cls_dst(dst_network[stream_offset.rx_offset]) if cls_dst else None,
-        )
-    else:
-        return AddressCollection(
-            arp_mac=arp_mac,
-            smac=port_struct.properties.native_mac_address,
-            dmac=peer_struct.properties.native_mac_address,
-            src_addr=src_addr,
-            dst_addr=dst_addr,
-        )
+    return AddressCollection(
+        arp_mac=arp_mac,
+        smac=port_struct.properties.native_mac_address,
+        dmac=peer_struct.properties.native_mac_address,
+        src_addr=src_addr,
+        dst_addr=dst_addr,
+    )
@@ -1,13 +1,15 @@
 import asyncio
+import time
 from typing import List, TYPE_CHECKING, Optional, Set, Tuple, Union
 from dataclasses import dataclass, field
 from xoa_driver import ports, enums, misc, utils as driver_utils
 from xoa_driver.misc import Hex
 from .common import gen_macaddress
+from .header_template import HeaderTemplate
 from .data_model import (
     ArpRefreshData,
     RXTableData,
-    StreamOffset,
+    StreamSetupTiming,
 )
 from .statistics import PortStatistic
 from .stream_struct import StreamStruct
@@ -20,6 +22,7 @@ if TYPE_CHECKING:
     from xoa_driver.lli import commands
     from ..utils.interfaces import TestSuitePipe
     from .test_config import TestConfigData
+    from .address_table import StreamAddressTable
     from ..model.m_test_config import FrameSize
     from ..model.m_port_config import PortConfiguration
     from ..model.m_test_type_config import (
@@ -49,6 +52,7 @@ class PortStruct:
         self.lock = asyncio.Lock()
         self._stream_structs: List["StreamStruct"] = []
         self._statistic = PortStatistic()  # reset every second
+        self._header_template: Optional["HeaderTemplate"] = None
         self.stop = False
 
     def set_should_stop_on_los(self, value: bool) -> None:
@@ -402,6 +406,13 @@ class PortStruct:
     def clear_counter(self) -> None:
         self._statistic = PortStatistic()
 
+    @property
+    def header_template(self) -> "HeaderTemplate":
+        """ packet header of the port profile, compiled on first use """
+        if self._header_template is None:
+            self._header_template = HeaderTemplate(self._port_conf.profile)
+        return self._header_template
+
     @property
     def protocol_version(self) -> "const.PortProtocolVersion":
         return const.PortProtocolVersion[self._port_conf.profile.protocol_version.name]
@@ -412,20 +423,53 @@ class PortStruct:
         stream_id: int,
         tpldid: int,
         arp_mac: MacAddress = MacAddress(),
-        stream_offset: Optional["StreamOffset"] = None,
+        address_table: Optional["StreamAddressTable"] = None,
+        address_index: int = 0,
     ):
         stream_struct = StreamStruct(
-            self, rx_ports, stream_id, tpldid, arp_mac, stream_offset
+            self, rx_ports, stream_id, tpldid, arp_mac, address_table, address_index
         )
         self._stream_structs.append(stream_struct)
 
-    async def configure_streams(self, test_conf: "TestConfigData") -> None:
+    async def configure_streams(self, test_conf: "TestConfigData") -> "StreamSetupTiming":
         for header_segment in self._port_conf.profile.segments:
             for field_value_range in header_segment.value_ranges:
                 if field_value_range.restart_for_each_port:
                     field_value_range.reset()
+        self._header_template = None
+        timing = StreamSetupTiming(self.port_identity.name, len(self._stream_structs))
+        start = time.perf_counter()
+        # streams are created one by one so the stream index matches the stream id
+        for stream_struct in self._stream_structs:
+            await stream_struct.create(test_conf)
+        timing.create = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[stream_struct.allocate_modifiers() for stream_struct in self._stream_structs]
+        )
+        timing.allocate_modifiers = time.perf_counter() - start
+
+        start = time.perf_counter()
+        tokens = [
+            token
+            for stream_struct in self._stream_structs
+            for token in stream_struct.configuration_tokens(test_conf)
+        ]
+        timing.token_count = len(tokens)
+        timing.build_tokens = time.perf_counter() - start
+
+        start = time.perf_counter()
+        async for _ in driver_utils.apply_iter(*tokens):
+            pass
+        timing.apply = time.perf_counter() - start
+
         for stream_struct in self._stream_structs:
-            await stream_struct.configure(test_conf)
+            stream_struct.init_rx_tables(
+                test_conf.arp_refresh_enabled,
+                test_conf.use_gateway_mac_as_dmac,
+            )
+        return timing
 
     async def set_streams_packet_size(
         self, packet_size_type: "enums.LengthType", min_size: int, max_size: int
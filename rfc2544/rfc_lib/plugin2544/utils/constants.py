@@ -79,6 +79,9 @@ DELAY_CLEAR_STATISTICS = 1
 INTERVAL_CHECK_LEARNING_TRAFFIC = 0.1
 INTERVAL_SEND_STATISTICS = 1
 
+# number of ports configuring their streams at the same time
+MAX_CONCURRENT_STREAM_SETUP_PORTS = 8
+
 
 class CounterType(CaseInsensitiveEnum):
     JITTER = -1
@@ -174,3 +174,73 @@ class ARPPacket(Packet):
             + self.hexstring
             + padding(44)
         )
+
+
+def update_checksum(checksum: int, old: bytes, new: bytes) -> int:
+    """Update a 16-bit one's complement checksum after ``old`` was replaced by ``new`` (RFC 1624, eqn. 3).
+
+    Both must have the same even length and start on a 16-bit boundary of the checksummed data.
+    """
+    total = ~checksum & 0xFFFF
+    for (old_word,), (new_word,) in zip(
+        struct.iter_unpack("!H", old), struct.iter_unpack("!H", new)
+    ):
+        total += (~old_word & 0xFFFF) + new_word
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+class LearningPacketTemplate:
+    """Learning packet built once per port, the sender MAC and IP are stamped into a copy for each address.
+
+    Offsets are in bytes from the start of the Ethernet frame.
+    """
+
+    ETHER_SMAC_OFFSET = 6
+    # sender MAC and IP after the ethernet header, all covered by the checksum if there is one
+    SMAC_OFFSETS: tuple = ()
+    SOURCE_IP_OFFSETS: tuple = ()
+    CHECKSUM_OFFSET: Union[int, None] = None
+
+    def __init__(self, packet: str, smac: MacAddress, source_ip: Union[IPv4Address, IPv6Address]) -> None:
+        self._template = bytearray.fromhex(packet)
+        self._smac = bytes(smac.to_bytearray())
+        self._source_ip = source_ip.packed
+
+    def make_packet(self, smac: MacAddress, source_ip: Union[IPv4Address, IPv6Address]) -> str:
+        packet = bytearray(self._template)
+        smac_bytes = bytes(smac.to_bytearray())
+        source_ip_bytes = source_ip.packed
+        for offset in (self.ETHER_SMAC_OFFSET,) + self.SMAC_OFFSETS:
+            packet[offset : offset + 6] = smac_bytes
+        for offset in self.SOURCE_IP_OFFSETS:
+            packet[offset : offset + len(source_ip_bytes)] = source_ip_bytes
+        if self.CHECKSUM_OFFSET is not None:
+            old = self._smac * len(self.SMAC_OFFSETS) + self._source_ip * len(self.SOURCE_IP_OFFSETS)
+            new = smac_bytes * len(self.SMAC_OFFSETS) + source_ip_bytes * len(self.SOURCE_IP_OFFSETS)
+            checksum = struct.unpack_from("!H", self._template, self.CHECKSUM_OFFSET)[0]
+            struct.pack_into("!H", packet, self.CHECKSUM_OFFSET, update_checksum(checksum, old, new))
+        return packet.hex().upper()
+
+
+class ARPPacketTemplate(LearningPacketTemplate):
+    # ethernet header (14) + hardware/protocol type and sizes, opcode (8)
+    SMAC_OFFSETS = (22,)
+    SOURCE_IP_OFFSETS = (28,)
+
+    def __init__(self, smac: MacAddress, source_ip: IPv4Address, destination_ip: IPv4Address, dmac: MacAddress) -> None:
+        packet = ARPPacket(smac=smac, source_ip=source_ip, destination_ip=destination_ip, dmac=dmac).make_arp_packet()
+        super().__init__(packet, smac, source_ip)
+
+
+class NDPPacketTemplate(LearningPacketTemplate):
+    # ethernet header (14) + ipv6 header (40), then ICMPv6 type, code, checksum, flags (8) and target address (16).
+    # The ICMPv6 checksum covers the IPv6 source address through the pseudo header.
+    SOURCE_IP_OFFSETS = (22, 62)
+    SMAC_OFFSETS = (80,)
+    CHECKSUM_OFFSET = 56
+
+    def __init__(self, smac: MacAddress, source_ip: IPv6Address, destination_ip: IPv6Address, dmac: MacAddress) -> None:
+        packet = NDPPacket(smac=smac, source_ip=source_ip, destination_ip=destination_ip, dmac=dmac).make_ndp_packet()
+        super().__init__(packet, smac, source_ip)
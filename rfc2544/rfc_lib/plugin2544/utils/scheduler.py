@@ -1,6 +1,8 @@
 import asyncio
+import time
+from dataclasses import dataclass
 from enum import Enum
-from typing import Callable, Dict, Any
+from typing import Awaitable, Callable, Dict, Any, List
 
 
 async def empty(count: int, *args: Any, **kw: Dict[str, Any]) -> bool:
@@ -44,3 +46,87 @@ async def schedule(
     timing: float, unit: str = "s", do: Callable = empty, *args, **kw
 ) -> None:
     asyncio.create_task(periodical_job(timing, unit, do, *args, **kw))
+
+
+class TimerWheel:
+    """
+    Periodic timer wheel. The items are spread evenly over the slots of one revolution,
+    every tick returns the items of the next slot, so each item comes once per revolution.
+    Work per tick is one slot, independent of the number of items.
+    """
+
+    def __init__(self, items: List[Any], revolution: float, min_tick: float) -> None:
+        # the small epsilon keeps e.g. 4.0 / 0.1 from rounding down to 39 slots
+        slot_count = max(1, min(len(items), int(revolution / min_tick + 1e-9)))
+        self.tick = revolution / slot_count
+        self.slots: List[List[Any]] = [[] for _ in range(slot_count)]
+        for index, item in enumerate(items):
+            self.slots[index * slot_count // max(len(items), 1)].append(item)
+        self.cursor = 0
+
+    def advance(self, count: int = 1) -> List[Any]:
+        """
+        items of the next count slots
+        a slot is returned at most once, so an item is never repeated even if count is more than one revolution
+        """
+        slot_count = len(self.slots)
+        items: List[Any] = []
+        for offset in range(min(count, slot_count)):
+            items.extend(self.slots[(self.cursor + offset) % slot_count])
+        self.cursor = (self.cursor + count) % slot_count
+        return items
+
+
+@dataclass
+class TimerStatistics:
+    ticks: int = 0
+    missed_deadlines: int = 0
+    total_jitter: float = 0.0  # unit: second
+    max_jitter: float = 0.0
+
+    @property
+    def average_jitter(self) -> float:
+        return self.total_jitter / self.ticks if self.ticks else 0.0
+
+    def record(self, jitter: float, missed: int) -> None:
+        self.ticks += 1
+        self.missed_deadlines += missed
+        self.total_jitter += jitter
+        self.max_jitter = max(self.max_jitter, jitter)
+
+
+async def timer_wheel_job(
+    wheel: TimerWheel,
+    do: Callable[[List[Any]], Awaitable[bool]],
+    statistics: TimerStatistics,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+) -> None:
+    """
+    call do() with the items of each slot at its deadline, until do() returns True
+    deadlines are fixed from the start, so a slow do() does not shift the later ones;
+    slots whose deadline passed while the job was late are merged into the current call and counted as missed,
+    at most one revolution is merged so an item is sent once per call
+    """
+    start = clock()
+    tick = 0
+    while True:
+        deadline = start + tick * wheel.tick
+        now = clock()
+        if deadline > now:
+            await sleep(deadline - now)
+            now = clock()
+        missed = max(0, int((now - start) // wheel.tick) - tick)
+        items = wheel.advance(missed + 1)
+        statistics.record(now - deadline, missed)
+        tick += missed + 1
+        if await do(items):
+            break
+
+
+async def schedule_timer_wheel(
+    wheel: TimerWheel,
+    do: Callable[[List[Any]], Awaitable[bool]],
+    statistics: TimerStatistics,
+) -> None:
+    asyncio.create_task(timer_wheel_job(wheel, do, statistics))
@@ -47,6 +47,11 @@ XOA_CONFIG = PROJECT_PATH / "test.json"
 CHASSIS_IP = "10.165.136.70"
 RUN_FROM_GUI_CONFIG = True
 
+# Set to True to log how long building the packet headers of BENCHMARK_STREAMS streams takes
+# for every protocol segment profile of an RFC2544 XOA_CONFIG, before running the test.
+RUN_BENCHMARK = False
+BENCHMARK_STREAMS = 10_000
+
 
 #---------------------------
 # internal functions
@@ -188,6 +193,11 @@ async def run_xoa_rfc(chassis: str, plugin_path: Path, gui_config: Path, xoa_con
 
 async def main():
     stop_event =asyncio.Event()
+    if RUN_BENCHMARK:
+        sys.path.insert(0, str(PLUGINS_PATH))
+        from plugin2544.plugin.header_template import benchmark_header_template
+        with open(XOA_CONFIG, "r") as f:
+            benchmark_header_template(json.load(f), BENCHMARK_STREAMS)
     try:
         await run_xoa_rfc(
             chassis=CHASSIS_IP,
@@ -0,0 +1,98 @@
+import asyncio
+import importlib.util
+import sys
+from collections import Counter
+from pathlib import Path
+
+# scheduler.py only uses the standard library, so it is loaded on its own and the test does not need xoa-core
+_path = Path(__file__).parents[1] / "rfc_lib" / "plugin2544" / "utils" / "scheduler.py"
+_spec = importlib.util.spec_from_file_location("plugin2544_scheduler", _path)
+scheduler = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = scheduler
+_spec.loader.exec_module(scheduler)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps = 0
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps += 1
+        self.now += seconds
+
+
+def run_job(wheel, clock, do, statistics):
+    asyncio.run(scheduler.timer_wheel_job(wheel, do, statistics, clock=clock, sleep=clock.sleep))
+
+
+def test_wheel_spreads_items_evenly():
+    items = list(range(1003))
+    wheel = scheduler.TimerWheel(items, revolution=4.0, min_tick=0.1)
+    assert len(wheel.slots) == 40
+    assert abs(wheel.tick - 0.1) < 1e-12
+    assert {len(slot) for slot in wheel.slots} == {25, 26}
+    revolution = [item for _ in wheel.slots for item in wheel.advance()]
+    assert sorted(revolution) == items
+
+
+def test_wheel_with_fewer_items_than_slots():
+    wheel = scheduler.TimerWheel(["a", "b", "c"], revolution=4.0, min_tick=0.1)
+    assert len(wheel.slots) == 3
+    assert abs(wheel.tick - 4.0 / 3) < 1e-12
+
+
+def test_advance_past_a_revolution_returns_each_item_once():
+    items = list(range(100))
+    wheel = scheduler.TimerWheel(items, revolution=1.0, min_tick=0.1)
+    merged = wheel.advance(25)
+    assert sorted(merged) == items
+    assert wheel.cursor == 25 % len(wheel.slots)
+
+
+def test_job_sends_one_slot_per_tick_on_fixed_deadlines():
+    clock = FakeClock()
+    wheel = scheduler.TimerWheel(list(range(1000)), revolution=2.0, min_tick=0.1)
+    statistics = scheduler.TimerStatistics()
+    calls = []
+
+    async def do(items):
+        calls.append((clock(), items))
+        return len(calls) == 2 * len(wheel.slots)
+
+    run_job(wheel, clock, do, statistics)
+
+    # work per tick is one slot, whatever the number of items
+    assert max(len(items) for _, items in calls) == 50
+    for tick, (t, _) in enumerate(calls):
+        assert abs(t - tick * wheel.tick) < 1e-9
+    sent = Counter(item for _, items in calls for item in items)
+    assert set(sent.values()) == {2}
+    assert statistics.ticks == len(calls)
+    assert statistics.missed_deadlines == 0
+    assert statistics.max_jitter < 1e-9
+
+
+def test_stalled_send_merges_missed_slots_without_duplicates():
+    clock = FakeClock()
+    wheel = scheduler.TimerWheel(list(range(200)), revolution=1.0, min_tick=0.1)
+    statistics = scheduler.TimerStatistics()
+    calls = []
+
+    async def do(items):
+        calls.append(items)
+        if len(calls) == 1:
+            # the first send stalls for more than two revolutions
+            clock.now += 2.55
+        return len(calls) == 3
+
+    run_job(wheel, clock, do, statistics)
+
+    late = calls[1]
+    assert len(late) == len(set(late)) == 200
+    assert statistics.missed_deadlines == 25 - 1
+    # deadlines stay fixed, the next call is on the grid again
+    assert len(calls[2]) == 20
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """Monitor run_xoa_rfc.py progress by tailing the log file."""
-import re, time, subprocess, sys
+import heapq, re, time, subprocess, sys
 from pathlib import Path
 from datetime import datetime
 
@@ -11,7 +11,13 @@ MAX_WAIT = 4 * 3600  # 4 hours hard cap
 
 RE_FINAL = re.compile(r"test result \(final\)")
 RE_INIT  = re.compile(r"__do_test \| init.*?(test_\w+)")
+RE_TB    = re.compile(r"Traceback")
 RE_TS    = re.compile(r"(\d{2}:\d{2}:\d{2})")
+# each pattern starts with a literal, which is much faster to scan for
+# separately than as one alternation; the matches are merged by position
+EVENT_PATTERNS = (("final", RE_FINAL), ("suite", RE_INIT), ("traceback", RE_TB))
+TRACEBACK_CHARS = 500
+READ_BLOCK = 16 * 1024 * 1024  # bounds the memory used to catch up on a large log
 
 
 def is_running() -> bool:
@@ -20,19 +26,153 @@ def is_running() -> bool:
     return r.returncode == 0
 
 
-def scan_log():
-    if not LOG.exists():
-        return 0, set(), ""
-    text = LOG.read_text(errors="replace")
-    finals = len(RE_FINAL.findall(text))
-    suites = list(dict.fromkeys(RE_INIT.findall(text)))  # ordered unique
-    timestamps = RE_TS.findall(text)
-    last_ts = timestamps[-1] if timestamps else ""
-    return finals, suites, last_ts
+class SuiteSummary:
+    def __init__(self, name: str, first_ts: str):
+        self.name = name
+        self.first_ts = first_ts
+        self.last_ts = first_ts
+        self.finals = 0
+        self.tracebacks = 0
+
+
+class LogTailer:
+    """Parse only the lines appended to the log since the last poll.
+
+    The byte offset and inode of the file are kept between polls.  A new
+    inode means the log was rotated: the rest of the old file is read
+    before switching to the new one.  A file shorter than the offset was
+    truncated, i.e. a new run started, and the summaries are reset.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+        self._inode = None
+        self._offset = 0
+        self._partial = b""
+        self.reset()
+
+    def reset(self):
+        self.finals = 0
+        self.tracebacks = 0
+        self.last_ts = ""
+        self.last_traceback = ""
+        self.suites = {}  # name -> SuiteSummary, in start order
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _open(self, st):
+        self.close()
+        self._file = open(self.path, "rb")
+        self._inode = (st.st_dev, st.st_ino)
+        self._offset = 0
+        self._partial = b""
+
+    def _read_block(self) -> bytes:
+        """Complete lines of the next block, None at the end of the file."""
+        data = self._file.read(READ_BLOCK)
+        if not data:
+            return None
+        self._offset += len(data)
+        data = self._partial + data
+        cut = data.rfind(b"\n") + 1
+        self._partial = data[cut:]
+        return data[:cut]
+
+    def _parse_new(self):
+        while (data := self._read_block()) is not None:
+            self._parse(data)
+
+    def poll(self):
+        """Read and parse what was appended since the last call."""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return
+        if self._file is None:
+            self._open(st)
+        elif (st.st_dev, st.st_ino) != self._inode:
+            self._parse_new()
+            self._parse(self._partial)
+            self._open(st)
+        elif st.st_size < self._offset:
+            self._open(st)
+            self.reset()
+        self._parse_new()
+
+    def _parse(self, data: bytes):
+        if not data:
+            return
+        text = data.decode(errors="replace")
+        if self.last_traceback and len(self.last_traceback) < TRACEBACK_CHARS:
+            self.last_traceback += text[:TRACEBACK_CHARS - len(self.last_traceback)]
+        current = self.current_suite
+        events = heapq.merge(
+            *[self._events(kind, rx, text) for kind, rx in EVENT_PATTERNS],
+            key=lambda event: event[0],
+        )
+        for _, kind, m in events:
+            if kind == "final":
+                self.finals += 1
+                if current is not None:
+                    current.finals += 1
+            elif kind == "suite":
+                line_start = text.rfind("\n", 0, m.start()) + 1
+                if current is not None:
+                    current.last_ts = self._last_timestamp(text, line_start, current.last_ts)
+                name = m.group(1)
+                if name not in self.suites:
+                    self.suites[name] = SuiteSummary(name, self._last_timestamp(text, m.end(), self.last_ts))
+                current = self.suites[name]
+            else:
+                self.tracebacks += 1
+                self.last_traceback = text[m.start():m.start() + TRACEBACK_CHARS]
+                if current is not None:
+                    current.tracebacks += 1
+        self.last_ts = self._last_timestamp(text, len(text), self.last_ts)
+        if current is not None:
+            current.last_ts = self.last_ts
+
+    @staticmethod
+    def _events(kind: str, rx, text: str):
+        for m in rx.finditer(text):
+            yield m.start(), kind, m
+
+    @staticmethod
+    def _last_timestamp(text: str, end: int, default: str) -> str:
+        # search backwards line by line, the timestamp is usually on the last line
+        while end > 0:
+            line_start = text.rfind("\n", 0, end - 1) + 1
+            timestamps = RE_TS.findall(text, line_start, end)
+            if timestamps:
+                return timestamps[-1]
+            end = line_start
+        return default
+
+    @property
+    def current_suite(self):
+        return next(reversed(self.suites.values()), None)
+
+    def scan(self):
+        self.poll()
+        return self.finals, list(self.suites), self.last_ts
+
+
+def suite_details(summaries, name: str) -> str:
+    summary = (summaries or {}).get(name)
+    if summary is None:
+        return ""
+    details = f"  {summary.first_ts}-{summary.last_ts}  finals {summary.finals}"
+    if summary.tracebacks:
+        details += f"  tracebacks {summary.tracebacks}"
+    return details
 
 
 def report(elapsed: int, finals: int, suites: list, last_ts: str,
-           running: bool):
+           running: bool, summaries: dict = None):
     now = datetime.now().strftime("%H:%M:%S")
     mins = elapsed // 60
     status = "🟢 RUNNING" if running else "🏁 FINISHED"
@@ -44,9 +184,9 @@ def report(elapsed: int, finals: int, suites: list, last_ts: str,
     if suites:
         done = suites[:-1] if running else suites
         for s in done:
-            print(f"    ✅ {s}")
+            print(f"    ✅ {s}{suite_details(summaries, s)}")
         if running:
-            print(f"    ⏳ {current}")
+            print(f"    ⏳ {current}{suite_details(summaries, current)}")
     print(f"{'='*60}")
 
 
@@ -57,30 +197,28 @@ def main():
     start = time.time()
     last_report = -INTERVAL  # force immediate first report
     prev_finals = -1
+    tailer = LogTailer(LOG)
 
     while True:
         elapsed = int(time.time() - start)
         running = is_running()
-        finals, suites, last_ts = scan_log()
+        finals, suites, last_ts = tailer.scan()
 
         # report every INTERVAL or when test finishes
         if elapsed - last_report >= INTERVAL or not running or finals != prev_finals and elapsed - last_report >= 30:
-            report(elapsed, finals, suites, last_ts, running)
+            report(elapsed, finals, suites, last_ts, running, tailer.suites)
             last_report = elapsed
             prev_finals = finals
 
         if not running:
             print("\nTest process exited.")
             # check for errors
-            if LOG.exists():
-                text = LOG.read_text(errors="replace")
-                tbs = text.count("Traceback")
-                print(f"Tracebacks in log: {tbs}")
-                if tbs:
-                    # print last traceback
-                    idx = text.rfind("Traceback")
-                    print("--- last traceback ---")
-                    print(text[idx:idx+500])
+            tailer.poll()
+            print(f"Tracebacks in log: {tailer.tracebacks}")
+            if tailer.tracebacks:
+                # print last traceback
+                print("--- last traceback ---")
+                print(tailer.last_traceback)
             break
 
         if elapsed >= MAX_WAIT:
@@ -89,6 +227,8 @@ def main():
 
         time.sleep(1)
 
+    tailer.close()
+
 
 if __name__ == "__main__":
     try:
@@ -15,6 +15,7 @@ DELAY_LEARNING_ADDRESS = 1
 DELAY_CREATE_PORT_PAIR = 3
 DELAY_WAIT_RESET_PORT = 5
 DELAY_WAIT_RESET_STATS = 2
+DELAY_TRAFFIC_SYNC_START = 2
 INTERVAL_CHECK_SHOULD_STOP_TRAFFIC = 0.01
 INTERVAL_CHECK_PORT_SYNC = 1
 INTERVAL_CHECK_PORT_RESERVE = 0.5
@@ -111,6 +112,11 @@ class StatisticsStatus(Enum):
         return self == StatisticsStatus.FAIL
 
 
+class StatisticsBackend(Enum):
+    DECIMAL = "decimal"  # reference, every value goes through Decimal
+    NATIVE = "native"  # int/float64 on the counters, Decimal only for the results
+
+
 class BRRModeStr(Enum):
     MASTER = "master"
     SLAVE = "slave"
@@ -244,6 +244,7 @@ class AddressCachingCapacityConfiguration(TestCaseBaseConfiguration):
     switch_test_port_roles: bool
     dut_aging_time: int
     fast_run_resolution_enabled: bool
+    pipelined_search: bool = False
 
     def check_configuration(self) -> None:
         self.check_address_test_port_roles()
@@ -265,6 +266,7 @@ class AddressLearningRateConfiguration(TestCaseBaseConfiguration):
     dut_aging_time: int
     only_use_capacity: bool
     set_end_address_to_capacity: bool
+    pipelined_search: bool = False
 
     def check_configuration(self) -> None:
         self.check_address_test_port_roles()
@@ -1,4 +1,5 @@
 import asyncio
+import copy
 import inspect
 import sys
 import time
@@ -17,6 +18,7 @@ from typing import (
     List,
     Optional,
     Protocol,
+    Tuple,
     TypeVar,
     Union,
 )
@@ -63,6 +65,23 @@ class AddressLearningPortRolePortNameMapping:
     monitoring: str = ''
 
 
+@dataclass
+class LearningModifier:
+    position: int
+    mask: str
+    action: ModifierActionOption
+    repetition: int
+    min_val: int
+    max_val: int
+
+
+@dataclass
+class LearningPlan:
+    """learning traffic of a port for one binary search value, prepared before the iteration that uses it"""
+    modifiers: List[LearningModifier]
+    stream_tokens: List[Any]
+
+
 T = TypeVar("T", bound=Union[int, Decimal])
 
 
@@ -81,6 +100,10 @@ class PBinarySearch(Protocol, Generic[T]):
     def set_ended(self, is_test_pass: bool) -> None:
         ...
 
+    @property
+    def candidates(self) -> List[T]:
+        ...
+
 
 @dataclass
 class BinarySearchBase(ABC, Generic[T]):
@@ -106,11 +129,11 @@ class BinarySearchBase(ABC, Generic[T]):
         raise NotImplementedError
 
     @abstractmethod
-    def _determine_should_end_in_pass(self) -> None:
+    def _should_end_in_pass(self) -> bool:
         raise NotImplementedError
 
     @abstractmethod
-    def _determine_should_end_in_fail(self) -> None:
+    def _should_end_in_fail(self) -> bool:
         raise NotImplementedError
 
     def __post_init__(self) -> None:
@@ -133,17 +156,37 @@ class BinarySearchBase(ABC, Generic[T]):
             if self.success_callback_function:
                 self.success_callback_function(self.current)
 
-        if not self.is_ended and is_test_pass:
+        if not self.is_ended:
+            self._move(is_test_pass)
+        return self.is_ended
+
+    def _step(self, is_test_pass: bool) -> bool:
+        """move the search bounds and the current value, return whether the search should end"""
+        if is_test_pass:
             self.passed = self.current
             self.left = self.current
             self.current = self._calculate_move_right()
-            self._determine_should_end_in_pass()
-        if not self.is_ended and not is_test_pass:
-            self.failed = self.current
-            self.right = self.current
-            self.current = self._calculate_move_left()
-            self._determine_should_end_in_fail()
-        return self.is_ended
+            return self._should_end_in_pass()
+        self.failed = self.current
+        self.right = self.current
+        self.current = self._calculate_move_left()
+        return self._should_end_in_fail()
+
+    def _move(self, is_test_pass: bool) -> None:
+        if self._step(is_test_pass):
+            self.set_ended(is_test_pass)
+
+    def peek(self, is_test_pass: bool) -> Optional[T]:
+        """value of the next iteration if the current one passes or fails, None if the search would end"""
+        if self.is_ended:
+            return None
+        probe = copy.copy(self)
+        return None if probe._step(is_test_pass) else probe.current
+
+    @property
+    def candidates(self) -> List[T]:
+        """values the next iteration can run with, whatever the result of the current one is"""
+        return [value for value in (self.peek(True), self.peek(False)) if value is not None]
 
 
 class DecimalBinarySearch(BinarySearchBase[Decimal]):
@@ -156,17 +199,17 @@ class DecimalBinarySearch(BinarySearchBase[Decimal]):
     def _calculate_move_left(self) -> Decimal:
         return ((self.failed + self.left) / Decimal(2.0)).quantize(Decimal('.001'), rounding=ROUND_DOWN)
 
-    def _determine_should_end_in_pass(self) -> None:
-        if self.current >= self.rate_iteration_options.maximum_value:
-            self.set_ended(is_test_pass=True)
-        elif (self.failed - self.passed) <= self.rate_iteration_options.value_resolution:
-            self.set_ended(is_test_pass=True)
+    def _should_end_in_pass(self) -> bool:
+        return (
+            self.current >= self.rate_iteration_options.maximum_value
+            or (self.failed - self.passed) <= self.rate_iteration_options.value_resolution
+        )
 
-    def _determine_should_end_in_fail(self) -> None:
-        if self.failed <= (self.rate_iteration_options.minimum_value + self.rate_iteration_options.value_resolution):
-            self.set_ended(is_test_pass=False)
-        elif abs(self.passed - Decimal(self.rate_iteration_options.maximum_value)) < sys.float_info.epsilon:
-            self.set_ended(is_test_pass=False)
+    def _should_end_in_fail(self) -> bool:
+        return (
+            self.failed <= (self.rate_iteration_options.minimum_value + self.rate_iteration_options.value_resolution)
+            or abs(self.passed - Decimal(self.rate_iteration_options.maximum_value)) < sys.float_info.epsilon
+        )
 
 
 class IntBinarySearch(BinarySearchBase[int]):
@@ -179,17 +222,17 @@ class IntBinarySearch(BinarySearchBase[int]):
     def _calculate_move_left(self) -> int:
         return int((self.failed + self.left) / 2)
 
-    def _determine_should_end_in_pass(self) -> None:
-        if self.current >= self.rate_iteration_options.maximum_value:
-            self.set_ended(is_test_pass=True)
-        elif (self.failed - self.passed) <= int(self.rate_iteration_options.value_resolution):
-            self.set_ended(is_test_pass=True)
+    def _should_end_in_pass(self) -> bool:
+        return (
+            self.current >= self.rate_iteration_options.maximum_value
+            or (self.failed - self.passed) <= int(self.rate_iteration_options.value_resolution)
+        )
 
-    def _determine_should_end_in_fail(self) -> None:
-        if self.failed <= self.passed:
-            self.set_ended(is_test_pass=False)
-        elif self.failed <= int(self.rate_iteration_options.minimum_value + self.rate_iteration_options.value_resolution):
-            self.set_ended(is_test_pass=False)
+    def _should_end_in_fail(self) -> bool:
+        return (
+            self.failed <= self.passed
+            or self.failed <= int(self.rate_iteration_options.minimum_value + self.rate_iteration_options.value_resolution)
+        )
 
 
 class BinarySearchMixin(Generic[T]):
@@ -330,6 +373,8 @@ class AddressLearningBase(TestBase[TCFG], BinarySearchMixin[T]):
     port_name: AddressLearningPortRolePortNameMapping
     learning_rate_pps: int
     learning_adress_count: int
+    learning_plans: Dict[Tuple[str, bool, Any], LearningPlan]
+    traffic_stopped_at: Optional[float] = None
 
     def get_mac_address(self, resource: "TestResource", resource_current_address: "MacAddress") -> "MacAddress":
         new_address = resource_current_address
@@ -381,64 +426,66 @@ class AddressLearningBase(TestBase[TCFG], BinarySearchMixin[T]):
         assert learning_port_mac_address
         await self.resources[self.port_name.test].set_stream_peer_mac_address(learning_port_mac_address)
 
-    async def set_learning_modifiers(self, port_name: str) -> None:
-        modifier_count = 2 if self.binary_search.current > 0xfffe else 1
-        modifier_position = 3 if port_name == self.port_name.test else 9
-
-        tokens = []
-        stream = self.resources[port_name].port.streams.obtain(0)
-        modifiers = stream.packet.header.modifiers
-        if self.test_suit_config.learning_sequence_port_dmac_mode.is_incr:
-            await modifiers.configure(modifier_count)
-            if modifier_count == 1:
-                modifier = modifiers.obtain(0)
-                tokens.extend(
-                    [
-                        modifier.specification.set(position=modifier_position + 1, mask=Hex("ffff0000"), action=ModifierActionOption.INC.to_xmp(), repetition=1),
-                        modifier.range.set(min_val=1, step=1, max_val=0xffff)
-                    ]
-                )
-            else:
-                modifier0 = modifiers.obtain(0)
-                modifier1 = modifiers.obtain(1)
-                tokens.extend(
-                    [
-                        modifier0.specification.set(position=modifier_position, mask=Hex("fff00000"), action=ModifierActionOption.INC.to_xmp(), repetition=0x1000),
-                        modifier0.range.set(min_val=1, step=1, max_val=0xfff),
-                        modifier1.specification.set(position=modifier_position + 1, mask=Hex("0fff0000"), action=ModifierActionOption.INC.to_xmp(), repetition=1),
-                        modifier1.range.set(min_val=1, step=1, max_val=0xfff),
-                    ]
-                )
+    def learning_plan_parameters(self, value: T) -> Tuple[int, int]:
+        """address count and learning rate in pps of an iteration run with the binary search value"""
+        return self.learning_adress_count, self.learning_rate_pps
+
+    def build_learning_plan(self, port_name: str, is_test_port: bool, value: T) -> LearningPlan:
+        address_count, rate_pps = self.learning_plan_parameters(value)
+        modifier_position = 3 if is_test_port else 9
+        if not self.test_suit_config.learning_sequence_port_dmac_mode.is_incr:
+            modifiers = [
+                LearningModifier(modifier_position - 1, "ffff0000", ModifierActionOption.RANDOM, 1, 0, 0xfff),
+                LearningModifier(modifier_position + 1, "0fff0000", ModifierActionOption.RANDOM, 1, 1, 0xfff),
+            ]
+        elif value > 0xfffe:
+            modifiers = [
+                LearningModifier(modifier_position, "fff00000", ModifierActionOption.INC, 0x1000, 1, 0xfff),
+                LearningModifier(modifier_position + 1, "0fff0000", ModifierActionOption.INC, 1, 1, 0xfff),
+            ]
         else:
-            await modifiers.configure(2)
-            modifier0 = modifiers.obtain(0)
-            modifier1 = modifiers.obtain(1)
+            modifiers = [LearningModifier(modifier_position + 1, "ffff0000", ModifierActionOption.INC, 1, 1, 0xffff)]
+
+        stream_tokens = []
+        for stream in self.resources[port_name].port.streams:
+            stream_tokens.extend([stream.rate.pps.set(rate_pps), stream.packet.limit.set(address_count)])
+        return LearningPlan(modifiers=modifiers, stream_tokens=stream_tokens)
+
+    def prepare_learning_plans(self) -> None:
+        """build the learning traffic of the next iteration for both outcomes of the current one"""
+        learning, test = self.port_name.learning, self.port_name.test
+        if self.test_suit_config.switch_test_port_roles:
+            learning, test = test, learning
+        self.learning_plans = {}
+        for value in self.binary_search.candidates:
+            for port_name, is_test_port in ((learning, False), (test, True)):
+                self.learning_plans[(port_name, is_test_port, value)] = self.build_learning_plan(port_name, is_test_port, value)
+
+    def get_learning_plan(self, port_name: str) -> LearningPlan:
+        key = (port_name, port_name == self.port_name.test, self.binary_search.current)
+        return self.learning_plans.pop(key, None) or self.build_learning_plan(*key)
+
+    async def apply_learning_plan(self, port_name: str, plan: LearningPlan) -> None:
+        modifiers = self.resources[port_name].port.streams.obtain(0).packet.header.modifiers
+        if len(modifiers) != len(plan.modifiers):
+            await modifiers.configure(len(plan.modifiers))
+        tokens = list(plan.stream_tokens)
+        for modifier, m in zip(modifiers, plan.modifiers):
             tokens.extend(
                 [
-                    modifier0.specification.set(position=modifier_position - 1, mask=Hex("ffff0000"), action=ModifierActionOption.RANDOM.to_xmp(), repetition=1),
-                    modifier0.range.set(min_val=0, step=1, max_val=0xfff),
-                    modifier1.specification.set(position=modifier_position + 1, mask=Hex("0fff0000"), action=ModifierActionOption.RANDOM.to_xmp(), repetition=1),
-                    modifier1.range.set(min_val=1, step=1, max_val=0xfff),
+                    modifier.specification.set(position=m.position, mask=Hex(m.mask), action=m.action.to_xmp(), repetition=m.repetition),
+                    modifier.range.set(min_val=m.min_val, step=1, max_val=m.max_val),
                 ]
             )
         await apply(*tokens)
 
-    async def set_learning_limit(self, port_name: str) -> None:
-        asyncio.gather(
-            *[
-                self.resources[port_name].set_rate_pps(self.learning_rate_pps),
-                self.resources[port_name].set_packet_limit(self.learning_adress_count),
-            ]
-        )
-
     def reprocess_result(self, result: "ResultData", is_live: bool = True) -> "ResultData":
         result.extra['port_name'] = self.port_name
         result.extra['binary_search'] = self.binary_search
         return result
 
     async def setup_learning_traffic(self, port_name: str) -> None:
-        await self.set_learning_modifiers(port_name)
-        await self.set_learning_limit(port_name)
+        await self.apply_learning_plan(port_name, self.get_learning_plan(port_name))
         self.resources.enable_single_port_traffic(port_name)
 
     async def reset_DUT_mac_address_table(self) -> None:
@@ -448,7 +495,11 @@ class AddressLearningBase(TestBase[TCFG], BinarySearchMixin[T]):
             sync_on_duration=self.test_suit_config.sync_on_duration,
         )
         if not self.test_suit_config.toggle_sync_state and not self.test_suit_config.switch_test_port_roles:
-            await sleep_log(self.test_suit_config.dut_aging_time)
+            aging_time: float = self.test_suit_config.dut_aging_time
+            if self.test_suit_config.pipelined_search and self.traffic_stopped_at is not None:
+                # the DUT has been aging its table since the last frame was sent
+                aging_time = max(0.0, aging_time - (time.monotonic() - self.traffic_stopped_at))
+            await sleep_log(aging_time)
 
     def check_statistic_status(self, result: ResultData, is_live: bool = False) -> const.StatisticsStatus:
         status = const.StatisticsStatus.FAIL
@@ -466,31 +517,47 @@ class AddressLearningBase(TestBase[TCFG], BinarySearchMixin[T]):
             self.port_name.learning, self.port_name.test = self.port_name.test, self.port_name.learning
             await self.test_port_set_peer_mac_address()
 
-    async def address_learning_test(self, packet_size: int) -> Optional[ResultData]:
-        result: Optional[ResultData] = None
-        logger.debug(self.binary_search)
-        await self.reset_DUT_mac_address_table()
-        await self.resources.limit_ports_mac_learning([self.port_name.test])
-        await sleep_log(const.DELAY_LEARNING_MAC)
+    async def setup_learning_streams(self, packet_size: int) -> None:
         await self.learning_port_set_broadcast_mac_address()
         await self.resources.set_stream_packet_size(packet_size)
         await self.resources.set_stream_rate_and_packet_limit(packet_size, const.DECIMAL_100, self.test_suit_config.duration)
-
         await self.setup_learning_traffic(self.port_name.learning)
-        traffic_info: Optional[TrafficInfo] = None
-        async for traffic_info in self.generate_traffic():
-            result = traffic_info.result
-            if self.is_stop_on_los:
-                self.binary_search.set_ended(is_test_pass=False)
-                return result
 
-        await sleep_log(const.DELAY_WAIT_TRAFFIC_STOP)
-        await self.setup_learning_traffic(self.port_name.test)
-        async for traffic_info in self.generate_traffic():
-            result = traffic_info.result
-            if self.is_stop_on_los or self.is_should_fast_stop(result):
-                self.binary_search.set_ended(is_test_pass=False)
-                return result
+    async def address_learning_test(self, packet_size: int) -> Optional[ResultData]:
+        result: Optional[ResultData] = None
+        logger.debug(self.binary_search)
+        if self.test_suit_config.pipelined_search:
+            # no frame is sent while the streams are configured, so it is done during the DUT aging wait
+            await asyncio.gather(self.reset_DUT_mac_address_table(), self.setup_learning_streams(packet_size))
+            await self.resources.limit_ports_mac_learning([self.port_name.test])
+            await sleep_log(const.DELAY_LEARNING_MAC)
+        else:
+            await self.reset_DUT_mac_address_table()
+            await self.resources.limit_ports_mac_learning([self.port_name.test])
+            await sleep_log(const.DELAY_LEARNING_MAC)
+            await self.setup_learning_streams(packet_size)
+
+        is_plans_prepared = not self.test_suit_config.pipelined_search
+        try:
+            traffic_info: Optional[TrafficInfo] = None
+            async for traffic_info in self.generate_traffic():
+                if not is_plans_prepared:
+                    self.prepare_learning_plans()
+                    is_plans_prepared = True
+                result = traffic_info.result
+                if self.is_stop_on_los:
+                    self.binary_search.set_ended(is_test_pass=False)
+                    return result
+
+            await sleep_log(const.DELAY_WAIT_TRAFFIC_STOP)
+            await self.setup_learning_traffic(self.port_name.test)
+            async for traffic_info in self.generate_traffic():
+                result = traffic_info.result
+                if self.is_stop_on_los or self.is_should_fast_stop(result):
+                    self.binary_search.set_ended(is_test_pass=False)
+                    return result
+        finally:
+            self.traffic_stopped_at = time.monotonic()
 
         await sleep_log(const.DELAY_WAIT_TRAFFIC_STOP)
         await sleep_log(const.DELAY_LEARNING_ADDRESS)
@@ -1,6 +1,6 @@
 from math import ceil
 from functools import partial
-from typing import Generator, Optional
+from typing import Generator, Optional, Tuple
 
 from plugin2889.const import DECIMAL_100
 from plugin2889.plugin.base_class import AddressLearningBase, IntBinarySearch
@@ -39,9 +39,13 @@ class AddressCachingCapacityTest(AddressLearningBase[AddressCachingCapacityConfi
     def learning_rate_pps(self) -> int:
         return ceil(self.test_suit_config.learning_rate_fps)
 
+    def learning_plan_parameters(self, value: int) -> Tuple[int, int]:
+        return int(value), self.learning_rate_pps
+
     async def run_test(self, run_props: BaseRunProps) -> None:
         logger.debug(f'iter props: {run_props}')
         logger.debug(self.test_suit_config.address_iteration_options)
+        self.learning_plans = {}
         self.resources[self.port_name.monitoring].statistics.add_tx_resources(
             resource=self.resources[self.port_name.test],
             tpld_id=self.resources[self.port_name.test].streams[0].tpld_id
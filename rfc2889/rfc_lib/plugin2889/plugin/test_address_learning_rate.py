@@ -1,7 +1,7 @@
 from math import ceil
 from decimal import Decimal
 from functools import partial
-from typing import Generator, Iterable, Optional
+from typing import Generator, Iterable, Optional, Tuple
 
 from plugin2889.const import DECIMAL_100
 from plugin2889.plugin.base_class import AddressLearningBase, DecimalBinarySearch
@@ -45,13 +45,17 @@ class AddressLearningRateTest(AddressLearningBase[AddressLearningRateConfigurati
 
     @property
     def learning_rate_pps(self) -> int:
-        return ceil(Decimal(self.test_suit_config.learning_rate_fps) * self.binary_search.current / 100)
+        return self.learning_plan_parameters(self.binary_search.current)[1]
+
+    def learning_plan_parameters(self, value: Decimal) -> Tuple[int, int]:
+        return self.learning_adress_count, ceil(Decimal(self.test_suit_config.learning_rate_fps) * value / 100)
 
     async def run_test(self, run_props: AddressLearningRateRunProps) -> None:
         logger.debug(f'iter props: {run_props}')
         logger.debug(self.test_suit_config.rate_iteration_options)
         self.learning_adress_count = run_props.address_count
         self.binary_search = DecimalBinarySearch(rate_iteration_options=self.test_suit_config.rate_iteration_options)
+        self.learning_plans = {}
         self.resources[self.port_name.monitoring].statistics.add_tx_resources(
             resource=self.resources[self.port_name.test],
             tpld_id=self.resources[self.port_name.test].streams[0].tpld_id
@@ -11,11 +11,12 @@ from typing import (
 )
 from decimal import Decimal
 from dataclasses import dataclass, fields
+import numpy as np
 from xoa_driver import utils, ports
 
 from plugin2889.dataset import PortJitter, PortLatency, StatisticsData, TxStream, RxTPLDId
 from plugin2889.util.logger import logger
-from plugin2889.const import DEFAULT_INTERFRAME_GAP
+from plugin2889.const import DEFAULT_INTERFRAME_GAP, StatisticsBackend
 
 if TYPE_CHECKING:
     from plugin2889.resource.test_resource import TestResource
@@ -23,6 +24,29 @@ if TYPE_CHECKING:
 
 __all__ = ("PortStatistics",)
 
+RX_TPLD_DTYPE = np.dtype([
+    ("tpld_id", np.int64),
+    ("packet_size", np.int64),
+    ("bit_count_last_sec", np.int64),
+    ("packet_count_last_sec", np.int64),
+    ("packet_count_since_cleared", np.int64),
+    ("packet_loss_by_seq", np.int64),
+    ("latency_min", np.int64),
+    ("latency_avg", np.int64),
+    ("latency_max", np.int64),
+    ("jitter_min", np.int64),
+    ("jitter_avg", np.int64),
+    ("jitter_max", np.int64),
+])
+
+TX_STREAM_DTYPE = np.dtype([
+    ("tpld_id", np.int64),
+    ("packet_size", np.int64),
+    ("bit_count_last_sec", np.int64),
+    ("packet_count_last_sec", np.int64),
+    ("packet_count_since_cleared", np.int64),
+])
+
 
 @dataclass(init=False, repr=False)
 class PortMax:
@@ -49,12 +73,45 @@ class PortMax:
     update_rx_bps_l2 = functools.partialmethod(__update_value, "rx_bps_l2")
 
 
-def _bps_l2_to_bps_l1(bps: int, packet_size: int) -> int:
-    return int(bps * (packet_size + DEFAULT_INTERFRAME_GAP) / packet_size)
+def _sum_bps_l2_to_bps_l1(bps: np.ndarray, packet_size: np.ndarray) -> int:
+    """ L1 bit rate of each stream, truncated per stream, summed over the streams """
+    return int(np.trunc(bps * (packet_size + DEFAULT_INTERFRAME_GAP) / packet_size).astype(np.int64).sum())
+
+
+def _prepare_table(table: np.ndarray, dtype: np.dtype, size: int) -> np.ndarray:
+    """ reuse the table of the previous collection if the stream count did not change """
+    if len(table) != size:
+        return np.zeros(size, dtype=dtype)
+    return table
+
+
+def _to_microseconds(value: int) -> Decimal:
+    """ same as PortLatency._pre_process for a value in nanoseconds """
+    return Decimal(value).scaleb(-3)
+
+
+def _fill_delay(delay: PortLatency, tpld_ids: np.ndarray, minimum: np.ndarray, average: np.ndarray, maximum: np.ndarray) -> PortLatency:
+    """ same result as setting minimum, maximum and average stream by stream, Decimal is only built for the results """
+    nonzero_minimum = minimum[minimum != 0]
+    if len(nonzero_minimum):
+        delay.minimum_ = _to_microseconds(int(nonzero_minimum.min()))
+    if len(maximum) and maximum.max() >= 0:
+        delay.maximum_ = _to_microseconds(int(maximum.max()))
+    nonzero_average = average != 0
+    delay.average_ = {
+        tpld_id: _to_microseconds(value)
+        for tpld_id, value in zip(tpld_ids[nonzero_average].tolist(), average[nonzero_average].tolist())
+    }
+    return delay
+
+
+async def _query_all(tokens: list) -> list:
+    """ send all queries in one batch """
+    return [response async for response in utils.apply_iter(*tokens)]
 
 
 class PortStatistics:
-    __slots__ = ("__tx_resources", "__port", "max", "__streams_sending_out", "__tx_tpld_ids", "__only_collect_rx_total", "__port_name", "__collect_rx_function")
+    __slots__ = ("__tx_resources", "__port", "max", "__streams_sending_out", "__tx_tpld_ids", "__only_collect_rx_total", "__port_name", "__collect_rx_function", "__rx_table", "__tx_table", "backend")
 
     def __init__(self, port: "ports.GenericL23Port", streams: List["StreamManager"], port_name: str) -> None:
         self.__port = port
@@ -65,6 +122,9 @@ class PortStatistics:
         self.max = PortMax()
         self.__only_collect_rx_total: bool = False  # do not collect data from each tpld_id
         self.__collect_rx_function: Callable = self.collect_rx_by_streams
+        self.__rx_table = np.zeros(0, dtype=RX_TPLD_DTYPE)
+        self.__tx_table = np.zeros(0, dtype=TX_STREAM_DTYPE)
+        self.backend = StatisticsBackend.NATIVE
 
     async def clear(self) -> None:
         logger.debug("invoked")
@@ -81,51 +141,69 @@ class PortStatistics:
                 if stream.tpld_id in self.__tx_tpld_ids:
                     yield stream
 
-    async def collect_rx_single_stream(self, rx_tpld_statistics, packet_size, tpld_id) -> Tuple[int, int, int, int, int, int]:
-        receive, latency, jitter, error = await utils.apply(
-            rx_tpld_statistics.traffic.get(),
-            rx_tpld_statistics.latency.get(),
-            rx_tpld_statistics.jitter.get(),
-            rx_tpld_statistics.errors.get(),
-
-        )
-        return packet_size, tpld_id, receive, latency, jitter, error
-
-    async def collect_rx_by_streams(self, statistics: StatisticsData, packet_size: int) -> None:
-        rx_bit_count_last_sec = rx_packet_count_last_sec = non_incre_seq_event_count = rx_packet = rx_bps_l1 = 0
-
-        port_latency = PortLatency()
-        port_jitter = PortJitter()
-        per_rx_tpld_id: Dict[int, RxTPLDId]  = {}
-        coroutines = []
-        for rx_stream in self.__streams_sending_in:
+    async def collect_rx_table(self, packet_size: int) -> np.ndarray:
+        """ query traffic, latency, jitter and errors of every incoming TPLD in one batch """
+        rx_streams = list(self.__streams_sending_in)
+        tokens = []
+        for rx_stream in rx_streams:
             rx_tpld_statistics = self.__port.statistics.rx.access_tpld(rx_stream.tpld_id)
-            coroutines.append(self.collect_rx_single_stream(rx_tpld_statistics=rx_tpld_statistics, packet_size=rx_stream.packet_size, tpld_id=rx_stream.tpld_id))
-
-        for (stream_packet_size, tpld_id, receive, latency, jitter, error) in await asyncio.gather(*coroutines):
-            rx_bps_l1 += _bps_l2_to_bps_l1(receive.bit_count_last_sec, stream_packet_size or packet_size)
-            self.max.update_rx_bps_l1(rx_bps_l1)
+            tokens.extend((
+                rx_tpld_statistics.traffic.get(),
+                rx_tpld_statistics.latency.get(),
+                rx_tpld_statistics.jitter.get(),
+                rx_tpld_statistics.errors.get(),
+            ))
+        responses = await _query_all(tokens) if tokens else []
+
+        table = self.__rx_table = _prepare_table(self.__rx_table, RX_TPLD_DTYPE, len(rx_streams))
+        for index, rx_stream in enumerate(rx_streams):
+            receive, latency, jitter, error = responses[4 * index : 4 * index + 4]
+            table[index] = (
+                rx_stream.tpld_id,
+                rx_stream.packet_size or packet_size,
+                receive.bit_count_last_sec,
+                receive.packet_count_last_sec,
+                receive.packet_count_since_cleared,
+                error.packet_loss_by_seq,
+                latency.min_val,
+                latency.avg_val,
+                latency.max_val,
+                jitter.min_val,
+                jitter.avg_val,
+                jitter.max_val,
+            )
+        return table
 
-            rx_packet += int(receive.packet_count_since_cleared)
-            rx_bit_count_last_sec += receive.bit_count_last_sec
-            rx_packet_count_last_sec += receive.packet_count_last_sec
-            non_incre_seq_event_count += int(error.packet_loss_by_seq)
-
-            port_latency.minimum = latency.min_val
-            port_latency.maximum = latency.max_val
-            port_latency.set_average(tpld_id, latency.avg_val)
-
-            port_jitter.minimum = jitter.min_val
-            port_jitter.maximum = jitter.max_val
-            port_jitter.set_average(tpld_id, jitter.avg_val)
+    async def collect_rx_by_streams(self, statistics: StatisticsData, packet_size: int) -> None:
+        table = await self.collect_rx_table(packet_size)
+
+        # the running sums only grow, so their maximum is the port total
+        self.max.update_rx_bps_l1(_sum_bps_l2_to_bps_l1(table["bit_count_last_sec"], table["packet_size"]))
+        self.max.update_rx_bps_l2(int(table["bit_count_last_sec"].sum()))
+        self.max.update_rx_pps(int(table["packet_count_last_sec"].sum()))
+
+        per_rx_tpld_id: Dict[int, RxTPLDId] = {
+            tpld_id: RxTPLDId(packet=packet, pps=pps)
+            for tpld_id, packet, pps in zip(table["tpld_id"].tolist(), table["packet_count_since_cleared"].tolist(), table["packet_count_last_sec"].tolist())
+        }
+        if self.backend == StatisticsBackend.NATIVE:
+            port_latency = _fill_delay(PortLatency(), table["tpld_id"], table["latency_min"], table["latency_avg"], table["latency_max"])
+            port_jitter = _fill_delay(PortJitter(), table["tpld_id"], table["jitter_min"], table["jitter_avg"], table["jitter_max"])
+        else:
+            port_latency = PortLatency()
+            port_jitter = PortJitter()
+            for (tpld_id, lat_min, lat_avg, lat_max, jit_min, jit_avg, jit_max) in table[["tpld_id", "latency_min", "latency_avg", "latency_max", "jitter_min", "jitter_avg", "jitter_max"]].tolist():
+                port_latency.minimum = lat_min
+                port_latency.maximum = lat_max
+                port_latency.set_average(tpld_id, lat_avg)
 
-            per_rx_tpld_id[tpld_id] = RxTPLDId(packet=int(receive.packet_count_since_cleared), pps=receive.packet_count_last_sec)
+                port_jitter.minimum = jit_min
+                port_jitter.maximum = jit_max
+                port_jitter.set_average(tpld_id, jit_avg)
 
-        self.max.update_rx_bps_l2(rx_bit_count_last_sec)
-        self.max.update_rx_pps(rx_packet_count_last_sec)
         statistics.rx_packet = sum(rx_tpld.packet for rx_tpld in per_rx_tpld_id.values())
         statistics.rx_bps_l1 = self.max.rx_bps_l1
-        statistics.loss = non_incre_seq_event_count
+        statistics.loss = int(table["packet_loss_by_seq"].sum())
         statistics.rx_bps_l2 = self.max.rx_bps_l2
         statistics.per_rx_tpld_id = per_rx_tpld_id
         statistics.latency = port_latency
@@ -139,28 +217,41 @@ class PortStatistics:
         statistics.fcs = int(extra.fcs_error_count)
         statistics.flood = int(no_tpld.packet_count_since_cleared)
 
+    async def collect_tx_table(self, packet_size: int) -> np.ndarray:
+        """ query the counters of every outgoing stream in one batch """
+        tokens = [
+            self.__port.statistics.tx.obtain_from_stream(idx).get()
+            for idx in range(len(self.__streams_sending_out))
+        ]
+        responses = await _query_all(tokens) if tokens else []
+
+        table = self.__tx_table = _prepare_table(self.__tx_table, TX_STREAM_DTYPE, len(tokens))
+        for idx, (tx_stream, transmit) in enumerate(zip(self.__streams_sending_out, responses)):
+            table[idx] = (
+                tx_stream.tpld_id,
+                # we will calculate separately if stream have specific valid packet size
+                tx_stream.packet_size or packet_size,
+                transmit.bit_count_last_sec,
+                transmit.packet_count_last_sec,
+                transmit.packet_count_since_cleared,
+            )
+        return table
+
     async def collect_tx_by_streams(self, statistics: StatisticsData, packet_size: int) -> None:
-        tx_bit_count_last_sec = tx_packet_count_last_sec = tx_packet = tx_bps_l1 = 0
-        per_tx_stream = {}
-        tx_coroutines = []
-        for idx, tx_stream in enumerate(self.__streams_sending_out):
-            tx_coroutines.append(self.__port.statistics.tx.obtain_from_stream(idx).get())
-
-        for idx, transmit in enumerate(await asyncio.gather(*tx_coroutines)):
-            tx_stream = self.__streams_sending_out[idx]
-            tx_packet += int(transmit.packet_count_since_cleared)
-            tx_packet_count_last_sec += transmit.packet_count_last_sec
-            self.max.update_tx_pps(tx_packet_count_last_sec)
-            per_tx_stream[idx] = TxStream(tpld_id=tx_stream.tpld_id, packet=int(transmit.packet_count_since_cleared), pps=tx_packet_count_last_sec)
-
-            tx_bit_count_last_sec += transmit.bit_count_last_sec
-            self.max.update_tx_bps_l2(tx_bit_count_last_sec)
-
-            # we will calculate separately if stream have specific valid packet size
-            tx_bps_l1 += _bps_l2_to_bps_l1(transmit.bit_count_last_sec, tx_stream.packet_size or packet_size)
-            self.max.update_tx_bps_l1(tx_bps_l1)
-
-        statistics.tx_packet = tx_packet
+        table = await self.collect_tx_table(packet_size)
+
+        # the pps reported per stream is the running sum up to that stream
+        running_pps = np.cumsum(table["packet_count_last_sec"]).tolist()
+        per_tx_stream = {
+            idx: TxStream(tpld_id=tpld_id, packet=packet, pps=pps)
+            for idx, (tpld_id, packet, pps) in enumerate(zip(table["tpld_id"].tolist(), table["packet_count_since_cleared"].tolist(), running_pps))
+        }
+        # the running sums only grow, so their maximum is the port total
+        self.max.update_tx_pps(int(table["packet_count_last_sec"].sum()))
+        self.max.update_tx_bps_l2(int(table["bit_count_last_sec"].sum()))
+        self.max.update_tx_bps_l1(_sum_bps_l2_to_bps_l1(table["bit_count_last_sec"], table["packet_size"]))
+
+        statistics.tx_packet = int(table["packet_count_since_cleared"].sum())
         statistics.tx_bps_l1 = self.max.tx_bps_l1
         statistics.tx_bps_l2 = self.max.tx_bps_l2
         statistics.per_tx_stream = per_tx_stream
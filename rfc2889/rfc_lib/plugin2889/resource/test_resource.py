@@ -11,7 +11,7 @@ from xoa_driver.utils import apply
 from xoa_driver.ports import PThor400G7S1P_b, PThor400G7S1P_c, POdin1G3S6PT1RJ45
 from xoa_driver.misc import Hex
 
-from plugin2889.const import DELAY_LEARNING_MAC, INTERVAL_CHECK_PORT_RESERVE, FECModeStr
+from plugin2889.const import DELAY_LEARNING_MAC, DELAY_TRAFFIC_SYNC_START, INTERVAL_CHECK_PORT_RESERVE, FECModeStr
 from plugin2889.model import exceptions
 from plugin2889.dataset import AutoNegPorts, IPv4Address, IPv6Address, MacAddress, MdixPorts
 from plugin2889.resource._port_stream import StreamManager
@@ -189,7 +189,7 @@ class TestResource:
 
     async def start_traffic_sync(self, module_ports: List[int]) -> None:
         local_time = (await self.tester.time.get()).local_time
-        await self.tester.traffic_sync.set(enums.OnOff.ON, local_time + 2, module_ports)  # add 2 second delay
+        await self.tester.traffic_sync.set(enums.OnOff.ON, local_time + DELAY_TRAFFIC_SYNC_START, module_ports)
 
     async def set_stream_peer_mac_address(self, new_peer_mac_address: "MacAddress") -> None:
         await asyncio.gather(*[stream.set_peer_mac_address(new_peer_mac_address) for stream in self.streams])
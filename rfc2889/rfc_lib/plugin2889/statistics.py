@@ -28,8 +28,14 @@ class ResultData(BaseModel):
     extra: Dict[str, Any] = {}
 
 
+# counters summed over the ports into the total
+TOTAL_COUNTER_FIELDS = tuple(
+    name for name, field in StatisticsData.model_fields.items() if field.annotation is int
+)
+
+
 class StatisticsProcessor:
-    __slots__ = ("is_used_criteria", "acceptable_loss_unit", "acceptable_loss", "__resources", "__check_statistic_status_function", "__test_type")
+    __slots__ = ("is_used_criteria", "acceptable_loss_unit", "acceptable_loss", "__resources", "__check_statistic_status_function", "__test_type", "__backend")
 
     def __init__(
         self,
@@ -39,6 +45,7 @@ class StatisticsProcessor:
         is_used_criteria: bool = False,
         acceptable_loss_unit: "const.AcceptableType" = const.AcceptableType.PERCENT,
         acceptable_loss: float = 0.0,
+        backend: const.StatisticsBackend = const.StatisticsBackend.NATIVE,
     ) -> None:
         self.is_used_criteria = is_used_criteria
         self.acceptable_loss_unit = acceptable_loss_unit
@@ -46,6 +53,9 @@ class StatisticsProcessor:
         self.__check_statistic_status_function = check_statistic_status_function
         self.__resources = resources
         self.__test_type = test_type
+        self.__backend = backend
+        for r in self.__resources:
+            r.statistics.backend = backend
 
     async def collect_data(
         self,
@@ -67,11 +77,19 @@ class StatisticsProcessor:
             is_live=is_live,
         )
         coroutines = [r.statistics.collect_data(duration, packet_size, is_live) for r in self.__resources]
-        for port_name, statistics in await asyncio.gather(*coroutines):
-            total += statistics
-            row_data.ports[port_name] = statistics
-            if not is_live:
+        if self.__backend == const.StatisticsBackend.NATIVE:
+            for port_name, statistics in await asyncio.gather(*coroutines):
+                row_data.ports[port_name] = statistics
+            for name in TOTAL_COUNTER_FIELDS:
+                setattr(total, name, sum(getattr(statistics, name) for statistics in row_data.ports.values()))
+            if not is_live and row_data.ports:
                 total.loss = total.tx_packet - total.rx_packet
+        else:
+            for port_name, statistics in await asyncio.gather(*coroutines):
+                total += statistics
+                row_data.ports[port_name] = statistics
+                if not is_live:
+                    total.loss = total.tx_packet - total.rx_packet
 
         total.loss_percent = round(Decimal(total.loss * 100 / total.tx_packet if total.tx_packet else 0), 2)
         row_data.total = total
@@ -1,28 +1,79 @@
 import asyncio
 import contextlib
 import time
-from typing import Awaitable, TypeVar, AsyncGenerator
+from typing import TYPE_CHECKING, Awaitable, Optional, Set, TypeVar, AsyncGenerator
 
-from plugin2889.const import DELAY_WAIT_RESET_STATS, INTERVAL_CHECK_SHOULD_STOP_TRAFFIC
+from plugin2889.const import DELAY_TRAFFIC_SYNC_START, DELAY_WAIT_RESET_STATS
 from plugin2889.resource.manager import ResourcesManager
 from plugin2889.plugin.utils import sleep_log
 from plugin2889.util.logger import logger
 
 
+if TYPE_CHECKING:
+    from xoa_driver import ports
+    from xoa_driver.lli import commands
+
 T = TypeVar("T", bound="L23TestManager")
 
 
 class L23TestManager:
-    __slots__ = ("__testers", "__resources", "__lock")
+    __slots__ = ("__testers", "__resources", "__lock", "__running_ports", "__traffic_started", "__traffic_stopped", "__started_at", "stop_overshoot")
 
     def __init__(self, resources: ResourcesManager) -> None:
         self.__resources = resources
         self.__lock = asyncio.Lock()
+        self.__running_ports: Set[str] = set()
+        self.__traffic_started = asyncio.Event()
+        self.__traffic_stopped = asyncio.Event()
+        self.__started_at: Optional[float] = None  # monotonic time the first port reported traffic on
+        self.stop_overshoot: Optional[float] = None  # seconds the last traffic stop came after the configured duration
 
     async def setup(self):
         await self.__resources.setup()
+        for resource in self.__resources:
+            resource.port.on_traffic_change(self.__on_traffic_change)
         return self
 
+    async def __on_traffic_change(self, port: "ports.GenericL23Port", get_attr: "commands.P_TRAFFIC.GetDataAttr") -> None:
+        """ set the traffic started event when the first port reports traffic on, and the traffic stopped event once every port that was started reports traffic off """
+        if get_attr.on_off:
+            if not self.__traffic_started.is_set():
+                self.__started_at = time.monotonic()
+                self.__traffic_started.set()
+            return
+        for resource in self.__resources:
+            if resource.port is port:
+                self.__running_ports.discard(resource.port_name)
+        if not self.__running_ports:
+            self.__traffic_stopped.set()
+
+    async def __stop_at_deadline(self, duration: int, latest_start: float) -> None:
+        """
+        stop the traffic at the duration after the first port reported traffic on, or as soon as all ports have stopped by themselves
+        a sync start begins up to DELAY_TRAFFIC_SYNC_START seconds after it is scheduled, if no port reports traffic on by latest_start the duration counts from there
+        """
+        try:
+            await asyncio.wait_for(self.__traffic_started.wait(), max(0.0, latest_start - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.__started_at = latest_start
+            self.__traffic_started.set()
+        deadline = self.__deadline(duration)
+        try:
+            await asyncio.wait_for(self.__traffic_stopped.wait(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            pass
+        await self.__stop_traffic(deadline)
+
+    def __deadline(self, duration: int) -> float:
+        return (time.monotonic() if self.__started_at is None else self.__started_at) + duration
+
+    async def __stop_traffic(self, deadline: float) -> None:
+        logger.debug("\033[31mTraffic STOP\x1B[0m")
+        async with self.__lock:
+            await self.__resources.stop_traffic()
+        self.stop_overshoot = time.monotonic() - deadline
+        logger.debug(f"traffic stopped {self.stop_overshoot:+.3f}s after the configured duration")
+
     async def __aenter__(self: Awaitable[T]) -> T:
         return await self
 
@@ -35,32 +86,41 @@ class L23TestManager:
         return self.setup().__await__()
 
     @contextlib.asynccontextmanager
-    async def __traffic_runner(self) -> AsyncGenerator[None, None]:
+    async def __traffic_runner(self, duration: int) -> AsyncGenerator["asyncio.Task[None]", None]:
         logger.debug("\033[31mStart traffic...\x1B[0m")
         await self.__resources.clear_statistic_counters()
         await sleep_log(DELAY_WAIT_RESET_STATS)
+        self.__running_ports = {r.port_name for r in self.__resources if r.streams}
+        self.__traffic_started.clear()
+        self.__traffic_stopped.clear()
+        self.__started_at = None
+        self.stop_overshoot = None
         await self.__resources.start_traffic()
+        stopper = asyncio.create_task(self.__stop_at_deadline(duration, time.monotonic() + DELAY_TRAFFIC_SYNC_START))
         try:
-            yield
+            yield stopper
         finally:
-            logger.debug("\033[31mTraffic STOP\x1B[0m")
-            async with self.__lock:
-                await self.__resources.stop_traffic()
+            if not stopper.done():
+                # the caller left early, e.g. stop on loss of signal
+                stopper.cancel()
+                await self.__stop_traffic(self.__deadline(duration))
 
     async def generate_traffic(self, duration: int, *, sampling_rate: float = 1.0) -> AsyncGenerator[int, None]:
-        # await self.__resources.set_time_limit(duration)
-        # await self.__resources.set_frame_limit(duration)
-        time_clock = 0
-        start_ts = time.time()
+        """
+        yield the progress in percent every 1/sampling_rate seconds while the traffic runs
+        the traffic is stopped by a separate task at the duration deadline, so a slow consumer of the samples does not delay the stop
+        """
         time_step = 1.0 / sampling_rate
-        duration_accived = False
-        async with self.__traffic_runner():
-            while time.time() - start_ts <= duration + 2:  # traffic stop delay
-                begin = time.time()
-                time_clock = await self.__resources.get_time_elipsed()
-                if time_clock == 0 or duration_accived:
-                    await sleep_log(INTERVAL_CHECK_SHOULD_STOP_TRAFFIC)
-                    continue
-                duration_accived = time_clock == duration
-                yield int(time_clock / (duration) * 100)
-                await sleep_log(round(time_step - (time.time() - begin), 3))
+        async with self.__traffic_runner(duration) as stopper:
+            next_sample = time.monotonic() + time_step
+            while True:
+                done, _ = await asyncio.wait({stopper}, timeout=max(0.0, next_sample - time.monotonic()))
+                if done:
+                    break
+                now = time.monotonic()
+                # samples missed while the consumer was busy are skipped, not sent in a burst
+                next_sample += time_step * (int((now - next_sample) / time_step) + 1)
+                # the progress counts from the traffic start, which a sync start delays
+                elapsed = 0.0 if self.__started_at is None else max(0.0, now - self.__started_at)
+                yield min(int(elapsed / duration * 100), 100)
+            stopper.result()
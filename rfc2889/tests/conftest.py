@@ -0,0 +1,12 @@
+import sys
+import types
+from pathlib import Path
+
+# The plugin package __init__ registers the test suite with xoa-core. The modules under test do not need it,
+# so plugin2889 is registered as a bare package and its submodules are imported without running __init__.
+PLUGIN_PATH = Path(__file__).parents[1] / "rfc_lib" / "plugin2889"
+
+if "plugin2889" not in sys.modules:
+    package = types.ModuleType("plugin2889")
+    package.__path__ = [str(PLUGIN_PATH)]
+    sys.modules["plugin2889"] = package
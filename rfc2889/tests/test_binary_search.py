@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("xoa_core")
+
+from plugin2889.dataset import RateIterationOptions
+from plugin2889.plugin.base_class import DecimalBinarySearch, IntBinarySearch
+
+
+class FakeDut:
+    """ a switch that learns up to table_size addresses and floods the rest """
+
+    def __init__(self, table_size: int) -> None:
+        self.table_size = table_size
+
+    def run(self, address_count) -> SimpleNamespace:
+        return SimpleNamespace(status=SimpleNamespace(is_success=address_count <= self.table_size))
+
+
+def options(maximum_value: float, value_resolution: float) -> RateIterationOptions:
+    return RateIterationOptions(
+        initial_value=maximum_value,
+        minimum_value=1,
+        maximum_value=maximum_value,
+        value_resolution=value_resolution,
+        use_pass_threshold=False,
+        pass_threshold=0,
+    )
+
+
+def run_search(search, dut: FakeDut):
+    """ run the search against the fake DUT, check every next value was one of the prepared candidates """
+    while True:
+        candidates = search.candidates
+        if search.determine_should_end(dut.run(search.current)):
+            return search.passed
+        assert search.current in candidates
+
+
+@pytest.mark.parametrize("table_size", [2, 3, 100, 4095, 4096, 5000, 8191, 8192])
+def test_int_search_finds_table_size(table_size):
+    search = IntBinarySearch(rate_iteration_options=options(8192, 1))
+    assert run_search(search, FakeDut(table_size)) == table_size
+
+
+@pytest.mark.parametrize("table_size", [7, 33, 50])
+def test_decimal_search_finds_table_size(table_size):
+    search = DecimalBinarySearch(rate_iteration_options=options(100, 0.5))
+    assert table_size - 1 <= run_search(search, FakeDut(table_size)) <= table_size
+
+
+def test_peek_does_not_change_the_search():
+    search = IntBinarySearch(rate_iteration_options=options(8, 1))
+    ended_calls = []
+    set_ended = search.set_ended
+    search.set_ended = lambda is_test_pass: ended_calls.append(is_test_pass) or set_ended(is_test_pass)
+    dut = FakeDut(3)
+    while not search.is_ended:
+        state = dict(vars(search))
+        calls = len(ended_calls)
+        search.peek(True)
+        search.peek(False)
+        assert dict(vars(search)) == state
+        assert len(ended_calls) == calls
+        search.determine_should_end(dut.run(search.current))
+    assert ended_calls == [ended_calls[0]]
+    assert search.peek(True) is None and search.peek(False) is None
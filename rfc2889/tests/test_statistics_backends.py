@@ -0,0 +1,83 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from plugin2889 import const
+from plugin2889.dataset import PortJitter, PortLatency, StatisticsData
+from plugin2889.resource._port_statistics import _fill_delay
+from plugin2889.statistics import StatisticsProcessor
+
+LATENCY_SENTINEL = -2147483648
+
+
+def random_delay_value(rng: random.Random) -> int:
+    return rng.choice([0, 0, LATENCY_SENTINEL, rng.randint(-5, 5), rng.randint(0, 10**9), -rng.randint(0, 10**6)])
+
+
+def delay_by_stream(delay, tpld_ids, minimum, average, maximum):
+    """ the DECIMAL backend: set the values stream by stream """
+    for tpld_id, lat_min, lat_avg, lat_max in zip(tpld_ids, minimum, average, maximum):
+        delay.minimum = lat_min
+        delay.maximum = lat_max
+        delay.set_average(tpld_id, lat_avg)
+    return delay
+
+
+def as_strings(delay):
+    return str(delay.minimum_), str(delay.maximum_), [(k, str(v)) for k, v in delay.average_.items()]
+
+
+@pytest.mark.parametrize("delay_class", [PortLatency, PortJitter])
+def test_fill_delay_matches_stream_by_stream(delay_class):
+    rng = random.Random(2889)
+    for _ in range(1000):
+        count = rng.randint(0, 30)
+        tpld_ids = rng.sample(range(1000), count)
+        minimum, average, maximum = ([random_delay_value(rng) for _ in range(count)] for _ in range(3))
+        expected = delay_by_stream(delay_class(), tpld_ids, minimum, average, maximum)
+        native = _fill_delay(
+            delay_class(),
+            np.array(tpld_ids, dtype=np.int64),
+            np.array(minimum, dtype=np.int64),
+            np.array(average, dtype=np.int64),
+            np.array(maximum, dtype=np.int64),
+        )
+        assert as_strings(native) == as_strings(expected)
+
+
+def random_port_statistics(rng: random.Random) -> StatisticsData:
+    return StatisticsData(**{
+        name: rng.randint(0, 10**12)
+        for name, field in StatisticsData.model_fields.items()
+        if field.annotation is int
+    })
+
+
+def collect(backend, port_statistics, is_live):
+    def fake_resource(port_name, statistics):
+        async def collect_data(duration, packet_size, is_live):
+            return port_name, statistics
+
+        return SimpleNamespace(statistics=SimpleNamespace(collect_data=collect_data))
+
+    resources = [fake_resource(f"P{i}", s) for i, s in enumerate(port_statistics)]
+    processor = StatisticsProcessor(
+        resources,
+        list(const.TestType)[0],
+        lambda row_data, is_live: const.StatisticsStatus.PENDING,
+        backend=backend,
+    )
+    return asyncio.run(processor.collect_data(1, 10, packet_size=128, is_live=is_live))
+
+
+@pytest.mark.parametrize("is_live", [True, False])
+def test_native_total_matches_decimal_total(is_live):
+    rng = random.Random(37)
+    for _ in range(200):
+        port_statistics = [random_port_statistics(rng) for _ in range(rng.randint(0, 8))]
+        native = collect(const.StatisticsBackend.NATIVE, [s.model_copy(deep=True) for s in port_statistics], is_live)
+        decimal = collect(const.StatisticsBackend.DECIMAL, [s.model_copy(deep=True) for s in port_statistics], is_live)
+        assert native.model_dump_json() == decimal.model_dump_json()
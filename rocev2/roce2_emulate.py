@@ -18,6 +18,8 @@ from ipaddress import IPv4Address, IPv6Address
 from xoa_driver.misc import Hex
 from xoa_driver.hlfuncs import mgmt, headers
 import logging
+import time
+from typing import Any
 from headers import *
 
 #---------------------------
@@ -40,19 +42,53 @@ SRC_IP = "2000::10" # "10.10.10.10" # "2000::10"
 DST_IP = "2000::20" # "10.10.10.20" # "2000::20"
 
 RDMA_OP = "UD_SEND" # "RC_SEND" or "UD_SEND"
-RC_SEND_DST_QP = 5
+RC_SEND_DST_QPS = [5]               # One RC SEND flow (stream) is created per destination QP. The rate is shared evenly between them.
 UD_SEND_SRC_QP = 10
 UD_SEND_DST_QP = 11
 UD_SEND_Q_KEY = 1234
 
 DELAY_AFTER_RESET = 2
 
+CDF_CHUNK_SIZE = 200                # The number of CDF entries sent in one batch, utils.apply takes at most 200 commands
+
+#---------------------------
+# build_rc_send_cdf_entries
+#---------------------------
+def build_rc_send_cdf_entries(frames_per_flow: int) -> list[Hex]:
+    """Precompute the CDF entry of every frame in a RC SEND flow.
+
+    Each entry overwrites the first two bytes of the BTH, i.e. the opcode and the SE/M/PadCnt/TVer byte.
+    The first frame is SEND FIRST, the last frame SEND LAST, and all frames in between SEND MIDDLE.
+    A single-frame flow uses SEND ONLY.
+    """
+    def _entry(opcode: BTHOpcode) -> Hex:
+        return Hex(str(BTH(opcode=opcode))[:4])
+
+    if frames_per_flow == 1:
+        return [_entry(BTHOpcode.RC_SEND_ONLY)]
+    return [_entry(BTHOpcode.RC_SEND_FIRST)] + [_entry(BTHOpcode.RC_SEND_MIDDLE)]*(frames_per_flow-2) + [_entry(BTHOpcode.RC_SEND_LAST)]
+
+#---------------------------
+# program_cdf_table
+#---------------------------
+async def program_cdf_table(stream: Any, offset: int, entries: list[Hex], chunk_size: int) -> None:
+    """Write the CDF table of a stream in pipelined chunks instead of one round-trip per entry."""
+    await utils.apply(
+        stream.cdf.count.set(cdf_count=len(entries)),
+        stream.cdf.offset.set(offset=offset),
+    )
+    for _start in range(0, len(entries), chunk_size):
+        await utils.apply(*[
+            stream.cdf.data(cdf_index=_idx).set(hex_data=_entry)
+            for _idx, _entry in enumerate(entries[_start:_start+chunk_size], start=_start)
+        ])
+
 
 
 class XenaRoCEv2Emulator:
 
     @staticmethod
-    async def rc_send(chassis: str, username: str, port_str: str, frame_size: int, frames_per_flow: int, flow_repeat: int, rocev2_rate_frac: float, src_mac: str, dst_mac: str, ipver: str, src_ip: str, dst_ip: str, dst_qp: int, delay_after_reset: int) -> None:
+    async def rc_send(chassis: str, username: str, port_str: str, frame_size: int, frames_per_flow: int, flow_repeat: int, rocev2_rate_frac: float, src_mac: str, dst_mac: str, ipver: str, src_ip: str, dst_ip: str, dst_qps: list[int], delay_after_reset: int) -> None:
 
         # configure basic logger
         logging.basicConfig(
@@ -80,7 +116,7 @@ class XenaRoCEv2Emulator:
             logging.info(f"RoCEv2 Flow MAC (Dst):   {dst_mac}")
             logging.info(f"RoCEv2 Flow IP (Src):    {src_ip}")
             logging.info(f"RoCEv2 Flow IP (Dst):    {dst_ip}")
-            logging.info(f"RoCEv2 QP (Dst):         {dst_qp}")
+            logging.info(f"RoCEv2 QPs (Dst):        {dst_qps}")
             logging.info(f"#####################################################################")
 
             # access the module and port on the tester
@@ -119,12 +155,9 @@ class XenaRoCEv2Emulator:
             )
             
             #--------------------------------------
-            # Configure base_stream on the txport
+            # Configure RC SEND streams on the txport
             #--------------------------------------
-            logging.info(f"   Configure RC SEND stream on port {port_str}")
-
-            base_stream = await port_obj.streams.create()
-
+            # Ethernet/IP/UDP headers are shared by all flows on the port, only the BTH differs per QP.
             eth = headers.Ethernet()
             eth.src_mac = src_mac
             eth.dst_mac = dst_mac
@@ -143,60 +176,59 @@ class XenaRoCEv2Emulator:
             udp = headers.UDP()
             udp.src_port = 4791
             udp.dst_port = 4791
-            ib = IB()
-            ib.bth.opcode = BTHOpcode.RC_SEND_FIRST
-            ib.bth.destqp = dst_qp
-            ib.bth.psn = 0
-            _raw_header = "RAW_"+str(int(len(str(ib))/2))
             udp.length = frame_size - int(len(str(eth))/2 + len(str(ip))/2) - 4
-            
-            total_frames = int(frames_per_flow*flow_repeat)
-            stream_rate_ppm = int(rocev2_rate_frac*1_000_000)
-            await utils.apply(
-                base_stream.enable.set_on(),
-                base_stream.packet.limit.set(packet_count=total_frames),
-                base_stream.comment.set(f"{ipver.upper()} RC SEND"),
-                base_stream.rate.fraction.set(stream_rate_ppm=stream_rate_ppm),
-                base_stream.packet.length.set(length_type=enums.LengthType.FIXED, min_val=frame_size, max_val=frame_size),
-                base_stream.payload.content.set(
-                    payload_type=enums.PayloadType.PATTERN, 
-                    hex_data=Hex("AABBCCDD")
-                    ),
-                base_stream.tpld_id.set(test_payload_identifier = base_stream.kind.index_id),
-                base_stream.insert_packets_checksum.set_on()
-            )
-            if ipver == "ipv6":
-                await base_stream.packet.header.protocol.set(segments=[
-                    enums.ProtocolOption.ETHERNET,
-                    enums.ProtocolOption.IPV6,
-                    enums.ProtocolOption.UDP,
-                    enums.ProtocolOption[_raw_header],
-                    ])
-            else:
-                await base_stream.packet.header.protocol.set(segments=[
-                    enums.ProtocolOption.ETHERNET,
-                    enums.ProtocolOption.IP,
-                    enums.ProtocolOption.UDP,
-                    enums.ProtocolOption[_raw_header],
-                    ])
-            await base_stream.packet.header.data.set(hex_data=Hex(str(eth)+str(ip)+str(udp)+str(ib)))
-
-            # Configure a modifier on the base_stream
-            await base_stream.packet.header.modifiers.configure(1)
+            _l2_l4_header = str(eth)+str(ip)+str(udp)
 
-            # Modifier on the SQN
-            modifier = base_stream.packet.header.modifiers.obtain(0)
-            sqn_pos = int(len(str(eth)+str(ip)+str(udp))/2)+10
-            await modifier.specification.set(position=sqn_pos, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1)
-            await modifier.range.set(min_val=1, step=1, max_val=frames_per_flow)
-
-            # configure CDFs
-            await base_stream.cdf.count.set(cdf_count=frames_per_flow)
-            await base_stream.cdf.offset.set(offset=int(len(str(eth)+str(ip)+str(udp))/2))
-            await base_stream.cdf.data(cdf_index=0).set(hex_data=Hex("0010"))
-            for i in range(1, frames_per_flow):
-                await base_stream.cdf.data(cdf_index=i).set(hex_data=Hex("0110"))
-            await base_stream.cdf.data(cdf_index=frames_per_flow-1).set(hex_data=Hex("0210"))
+            # the CDF table is the same for all flows with the same length, so it is computed once
+            cdf_entries = build_rc_send_cdf_entries(frames_per_flow=frames_per_flow)
+            total_frames = int(frames_per_flow*flow_repeat)
+            stream_rate_ppm = int(rocev2_rate_frac*1_000_000/len(dst_qps))
+
+            for dst_qp in dst_qps:
+                logging.info(f"   Configure RC SEND stream (QP {dst_qp}) on port {port_str}")
+                _t0 = time.perf_counter()
+                base_stream = await port_obj.streams.create()
+
+                bth = BTH(opcode=BTHOpcode.RC_SEND_FIRST)
+                bth.destqp = dst_qp
+                bth.psn = 0
+                _raw_header = "RAW_"+str(int(len(str(bth))/2))
+
+                await utils.apply(
+                    base_stream.enable.set_on(),
+                    base_stream.packet.limit.set(packet_count=total_frames),
+                    base_stream.comment.set(f"{ipver.upper()} RC SEND QP {dst_qp}"),
+                    base_stream.rate.fraction.set(stream_rate_ppm=stream_rate_ppm),
+                    base_stream.packet.length.set(length_type=enums.LengthType.FIXED, min_val=frame_size, max_val=frame_size),
+                    base_stream.payload.content.set(
+                        payload_type=enums.PayloadType.PATTERN, 
+                        hex_data=Hex("AABBCCDD")
+                        ),
+                    base_stream.tpld_id.set(test_payload_identifier = base_stream.kind.index_id),
+                    base_stream.insert_packets_checksum.set_on(),
+                    base_stream.packet.header.protocol.set(segments=[
+                        enums.ProtocolOption.ETHERNET,
+                        enums.ProtocolOption.IPV6 if ipver == "ipv6" else enums.ProtocolOption.IP,
+                        enums.ProtocolOption.UDP,
+                        enums.ProtocolOption[_raw_header],
+                        ]),
+                    base_stream.packet.header.data.set(hex_data=Hex(_l2_l4_header+str(bth))),
+                )
+
+                # Configure a modifier on the base_stream
+                await base_stream.packet.header.modifiers.configure(1)
+
+                # Modifier on the SQN
+                modifier = base_stream.packet.header.modifiers.obtain(0)
+                sqn_pos = int(len(_l2_l4_header)/2)+10
+                await utils.apply(
+                    modifier.specification.set(position=sqn_pos, mask=Hex("FFFF0000"), action=enums.ModifierAction.INC, repetition=1),
+                    modifier.range.set(min_val=1, step=1, max_val=frames_per_flow),
+                )
+
+                # configure CDFs
+                await program_cdf_table(stream=base_stream, offset=int(len(_l2_l4_header)/2), entries=cdf_entries, chunk_size=CDF_CHUNK_SIZE)
+                logging.info(f"   QP {dst_qp}: {frames_per_flow} CDF entries configured in {time.perf_counter()-_t0:.3f} seconds")
 
             await port_obj.transceiver.access_rw(page_address=2000, register_address=0xf0036).set(value=Hex("00000001"))
 
@@ -363,7 +395,7 @@ async def main():
                 ipver = IP_VERSION,
                 src_ip=SRC_IP,
                 dst_ip=DST_IP,
-                dst_qp=RC_SEND_DST_QP,
+                dst_qps=RC_SEND_DST_QPS,
                 delay_after_reset = DELAY_AFTER_RESET,
             )
         else:
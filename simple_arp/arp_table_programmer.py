@@ -0,0 +1,281 @@
+################################################################
+#
+#                   ARP/NDP TABLE PROGRAMMER
+#
+# This script show you how to program large ARP and NDP tables
+# on many ports
+#
+# What this script example does:
+# 1. Generate the ARP and NDP entries of CIDR ranges, with
+#    consecutive MAC addresses from a MAC base, as arrays
+# 2. Split the entries in chunks of at most the table size of a
+#    port, one chunk per port
+# 3. Read the ARP and NDP tables of all ports in one batch and
+#    compare them with the desired tables
+# 4. Program only the ports whose tables differ, all in one batch
+# 5. Read the tables back and verify them
+#
+# A table set replaces the whole table on the port, so a port
+# gets its entries in one set command.
+#
+################################################################
+
+import asyncio
+
+from xoa_driver import testers
+from xoa_driver import modules
+from xoa_driver import enums
+from xoa_driver import utils
+from xoa_driver.hlfuncs import mgmt
+from xoa_driver.misc import Hex, ArpEntry, NdpEntry
+import ipaddress
+import logging
+import time
+from typing import Any, NamedTuple, Optional, Union
+
+import numpy as np
+
+#---------------------------
+# GLOBAL PARAMS
+#---------------------------
+CHASSIS_IP = "demo.xenanetworks.com"
+USERNAME = "arp_table_programmer"
+PORTS = ["2/0", "2/1", "2/2", "2/3"]
+
+# (CIDR range, MAC address of the first address of the range)
+ARP_RANGES = [
+    ("10.0.0.0/16", "aaaa.aaaa.0000"),
+    ("10.1.0.0/20", "aaaa.aaab.0000"),
+]
+NDP_RANGES = [
+    ("2001:db8::/112", "bbbb.bbbb.0000"),
+]
+# Entries that fit in the ARP and the NDP RX table of one port. The port
+# capabilities do not report the table sizes, so set them from the
+# specification of your test module. The ranges are split over the ports
+# in chunks of this size, and ranges with more entries than all the ports
+# can hold are refused before any address is generated.
+ARP_TABLE_MAX_ENTRIES = 131_072
+NDP_TABLE_MAX_ENTRIES = 131_072
+
+#---------------------------
+# AddressTable
+#---------------------------
+class AddressTable(NamedTuple):
+    """ARP (version 4) or NDP (version 6) table entries as arrays, one element per entry.
+
+    An IPv6 address is split in its upper and lower 64 bits, the upper bits of an IPv4 address are 0.
+    """
+    version: int
+    ip_hi: np.ndarray       # uint64
+    ip_lo: np.ndarray       # uint64
+    prefix: np.ndarray      # uint16
+    patched: np.ndarray     # bool
+    mac: np.ndarray         # uint64
+
+    def __len__(self) -> int:
+        return len(self.ip_lo)
+
+    @property
+    def columns(self) -> tuple[np.ndarray, ...]:
+        return (self.ip_hi, self.ip_lo, self.prefix, self.patched, self.mac)
+
+    def take(self, index: Union[slice, np.ndarray]) -> "AddressTable":
+        return AddressTable(self.version, *(c[index] for c in self.columns))
+
+    @classmethod
+    def empty(cls, version: int) -> "AddressTable":
+        return cls(version, np.zeros(0, np.uint64), np.zeros(0, np.uint64), np.zeros(0, np.uint16), np.zeros(0, bool), np.zeros(0, np.uint64))
+
+    @classmethod
+    def concatenate(cls, version: int, tables: list["AddressTable"]) -> "AddressTable":
+        if not tables:
+            return cls.empty(version)
+        return cls(version, *(np.concatenate(c) for c in zip(*(t.columns for t in tables))))
+
+    @classmethod
+    def from_range(cls, cidr: str, mac_base: str, max_entries: int) -> "AddressTable":
+        """Host addresses of a CIDR range with consecutive MAC addresses, matched by the full address.
+
+        A range of more than ``max_entries`` addresses, e.g. an IPv6 /64, raises a ValueError before the arrays are allocated.
+        """
+        network = ipaddress.ip_network(cidr)
+        full = network.max_prefixlen
+        first, last = int(network.network_address), int(network.broadcast_address)
+        if network.prefixlen < full - 1:
+            # like hosts(), without the network address and (IPv4) the broadcast address
+            first += 1
+            last -= network.version == 4
+        count = last - first + 1
+        if count > max_entries:
+            raise ValueError(f"{cidr} has {count} addresses, more than the {max_entries} table entries")
+        base_hi, base_lo = np.uint64(first >> 64), np.uint64(first & 0xFFFF_FFFF_FFFF_FFFF)
+        with np.errstate(over="ignore"):
+            ip_lo = base_lo + np.arange(count, dtype=np.uint64)
+        ip_hi = base_hi + (ip_lo < base_lo).astype(np.uint64)
+        mac = np.uint64(int(mac_base.replace(".", "").replace(":", "").replace("-", ""), 16)) + np.arange(count, dtype=np.uint64)
+        if count and int(mac[-1]) > 0xFFFF_FFFF_FFFF:
+            raise ValueError(f"The MAC addresses of {cidr} from {mac_base} exceed FFFFFFFFFFFF")
+        return cls(network.version, ip_hi, ip_lo, np.full(count, full, np.uint16), np.zeros(count, bool), mac)
+
+    @classmethod
+    def from_entries(cls, version: int, entries: list[Union[ArpEntry, NdpEntry]]) -> "AddressTable":
+        """Table of the entries read from a port."""
+        ips = [int(ipaddress.ip_address(e.ipv4_address if version == 4 else e.ipv6_address)) for e in entries]
+        return cls(
+            version,
+            np.array([ip >> 64 for ip in ips], np.uint64),
+            np.array([ip & 0xFFFF_FFFF_FFFF_FFFF for ip in ips], np.uint64),
+            np.array([e.prefix for e in entries], np.uint16),
+            np.array([enums.OnOff(e.patched_mac) == enums.OnOff.ON for e in entries], bool),
+            np.array([int(str(e.mac_address).lower().replace("0x", "") or "0", 16) for e in entries], np.uint64),
+        )
+
+    def entries(self) -> list[Union[ArpEntry, NdpEntry]]:
+        """Entries of the arp_rx_table or ndp_rx_table set command."""
+        on, off = enums.OnOff.ON, enums.OnOff.OFF
+        columns = zip(self.ip_hi.tolist(), self.ip_lo.tolist(), self.prefix.tolist(), self.patched.tolist(), self.mac.tolist())
+        if self.version == 4:
+            return [ArpEntry(ipv4_address=ipaddress.IPv4Address(lo), prefix=p, patched_mac=on if patched else off, mac_address=Hex(f"{mac:012X}")) for _, lo, p, patched, mac in columns]
+        return [NdpEntry(ipv6_address=ipaddress.IPv6Address((hi << 64) | lo), prefix=p, patched_mac=on if patched else off, mac_address=Hex(f"{mac:012X}")) for hi, lo, p, patched, mac in columns]
+
+    def sorted(self) -> "AddressTable":
+        return self.take(np.lexsort((self.mac, self.patched, self.prefix, self.ip_lo, self.ip_hi)))
+
+    def same_entries(self, other: "AddressTable") -> bool:
+        """Whether both tables have the same entries, in any order."""
+        if len(self) != len(other):
+            return False
+        a, b = self.sorted(), other.sorted()
+        return all(np.array_equal(x, y) for x, y in zip(a.columns, b.columns))
+
+#---------------------------
+# split_tables
+#---------------------------
+def split_tables(table: AddressTable, port_strs: list[str], max_entries: int) -> dict[str, AddressTable]:
+    """Consecutive chunks of at most ``max_entries`` entries, one per port in the order of the ports; ports without entries get an empty table."""
+    if len(table) > max_entries * len(port_strs):
+        raise ValueError(f"{len(table)} IPv{table.version} entries do not fit in {len(port_strs)} tables of {max_entries} entries")
+    return {port_str: table.take(slice(i * max_entries, (i + 1) * max_entries)) for i, port_str in enumerate(port_strs)}
+
+#---------------------------
+# read_tables
+#---------------------------
+async def read_tables(port_objs: dict[str, Any]) -> dict[str, tuple[AddressTable, AddressTable]]:
+    """ARP and NDP tables of all ports, read in one batch."""
+    tokens = []
+    for port_obj in port_objs.values():
+        tokens += [port_obj.arp_rx_table.get(), port_obj.ndp_rx_table.get()]
+    responses = [r async for r in utils.apply_iter(*tokens)]
+    return {
+        port_str: (AddressTable.from_entries(4, responses[2 * i].entries), AddressTable.from_entries(6, responses[2 * i + 1].entries))
+        for i, port_str in enumerate(port_objs)
+    }
+
+#---------------------------
+# program_tables
+#---------------------------
+async def program_tables(port_objs: dict[str, Any], desired: dict[str, tuple[AddressTable, AddressTable]], current: Optional[dict[str, tuple[AddressTable, AddressTable]]] = None) -> list[str]:
+    """Set the tables that differ from the current ones, all in one batch, and return the programmed ports.
+
+    Without the current tables, they are read from the ports first.
+    """
+    if current is None:
+        current = await read_tables(port_objs)
+    tokens = []
+    programmed = []
+    for port_str, port_obj in port_objs.items():
+        arp_table, ndp_table = desired[port_str]
+        current_arp, current_ndp = current[port_str]
+        changed = False
+        if not arp_table.same_entries(current_arp):
+            tokens.append(port_obj.arp_rx_table.set(entries=arp_table.entries()))
+            changed = True
+        if not ndp_table.same_entries(current_ndp):
+            tokens.append(port_obj.ndp_rx_table.set(entries=ndp_table.entries()))
+            changed = True
+        if changed:
+            programmed.append(port_str)
+    if tokens:
+        async for _ in utils.apply_iter(*tokens):
+            pass
+    return programmed
+
+#---------------------------
+# arp_table_programmer
+#---------------------------
+async def arp_table_programmer(chassis: str, username: str, port_strs: list[str], arp_ranges: list[tuple[str, str]], ndp_ranges: list[tuple[str, str]], arp_table_max_entries: int, ndp_table_max_entries: int):
+    # configure basic logger
+    logging.basicConfig(
+        format="%(asctime)s  %(message)s",
+        level=logging.DEBUG,
+        handlers=[
+            logging.FileHandler(filename="test.log", mode="a"),
+            logging.StreamHandler()]
+        )
+
+    # Establish connection to a Valkyrie tester using Python context manager
+    # The connection will be automatically terminated when it is out of the block
+    async with testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False) as tester:
+        logging.info(f"===================================")
+        logging.info(f"{'Connect to chassis:':<20}{chassis}")
+        logging.info(f"{'Username:':<20}{username}")
+
+        port_objs = {}
+        for port_str in port_strs:
+            _mid = int(port_str.split("/")[0])
+            _pid = int(port_str.split("/")[1])
+            module = tester.modules.obtain(_mid)
+            if isinstance(module, modules.E100ChimeraModule):
+                logging.info(f"Module {_mid} is a Chimera module, skip port {port_str}")
+                continue # commands which used in this example are not supported by Chimera Module
+            port_objs[port_str] = module.ports.obtain(_pid)
+
+        # build the desired tables
+        _t0 = time.perf_counter()
+        arp_tables = split_tables(AddressTable.concatenate(4, [AddressTable.from_range(c, m, arp_table_max_entries * len(port_objs)) for c, m in arp_ranges]), list(port_objs), arp_table_max_entries)
+        ndp_tables = split_tables(AddressTable.concatenate(6, [AddressTable.from_range(c, m, ndp_table_max_entries * len(port_objs)) for c, m in ndp_ranges]), list(port_objs), ndp_table_max_entries)
+        desired = {port_str: (arp_tables[port_str], ndp_tables[port_str]) for port_str in port_objs}
+        logging.info(f"Built {sum(len(a) + len(n) for a, n in desired.values())} ARP/NDP entries in {(time.perf_counter()-_t0)*1000:.1f} ms")
+
+        # Forcibly reserve the ports without resetting them, so unchanged tables are kept
+        await mgmt.reserve_ports(ports=list(port_objs.values()))
+        async for _ in utils.apply_iter(*[
+            token
+            for port in port_objs.values()
+            for token in (port.net_config.ipv4.arp_reply.set_on(), port.net_config.ipv6.arp_reply.set_on())
+        ]):
+            pass
+
+        _t0 = time.perf_counter()
+        programmed = await program_tables(port_objs, desired)
+        logging.info(f"Programmed {len(programmed)} of {len(port_objs)} ports in {(time.perf_counter()-_t0)*1000:.1f} ms: {programmed}")
+
+        # read the tables back
+        readback = await read_tables(port_objs)
+        for port_str, (arp_table, ndp_table) in desired.items():
+            if not arp_table.same_entries(readback[port_str][0]):
+                logging.warning(f"{port_str} ARP table has {len(readback[port_str][0])} entries that differ from the {len(arp_table)} programmed entries")
+            if not ndp_table.same_entries(readback[port_str][1]):
+                logging.warning(f"{port_str} NDP table has {len(readback[port_str][1])} entries that differ from the {len(ndp_table)} programmed entries")
+
+        # release ports
+        await mgmt.release_ports(ports=list(port_objs.values()))
+
+async def main():
+    stop_event = asyncio.Event()
+    try:
+        await arp_table_programmer(
+            chassis=CHASSIS_IP,
+            username=USERNAME,
+            port_strs=PORTS,
+            arp_ranges=ARP_RANGES,
+            ndp_ranges=NDP_RANGES,
+            arp_table_max_entries=ARP_TABLE_MAX_ENTRIES,
+            ndp_table_max_entries=NDP_TABLE_MAX_ENTRIES,
+        )
+    except KeyboardInterrupt:
+        stop_event.set()
+
+if __name__ == "__main__":
+    asyncio.run(main())
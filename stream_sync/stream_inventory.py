@@ -0,0 +1,218 @@
+################################################################
+#
+#                   STREAM INVENTORY
+#
+# What this script example does:
+# 1. Connect to a tester
+# 2. Reserve many ports and synchronize their streams
+# 3. Query comment, enable state, rate, packet length, TPLD ID,
+#    header protocol and header data of every stream on every
+#    port, in one pipelined batch per port, ports in parallel
+# 4. Build a columnar table of the streams
+# 5. Compare it with the inventory saved by the previous run and
+#    log only what changed (configuration drift)
+# 6. Save the inventory for the next run
+#
+################################################################
+
+import asyncio
+from xoa_driver import (
+    testers,
+    modules,
+    utils,
+    enums,
+)
+from xoa_driver.hlfuncs import mgmt
+import json
+import logging
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional
+
+#---------------------------
+# GLOBAL PARAMS
+#---------------------------
+CHASSIS_IP = "10.20.1.170"
+USERNAME = "XOA"
+PORTS = ["0/0", "0/1", "1/0", "1/1"]
+INVENTORY_FILE = "stream_inventory.json"
+
+#---------------------------
+# INVENTORY COLUMNS
+#---------------------------
+class InventoryQuery(NamedTuple):
+    columns: tuple[str, ...]
+    get: Callable[[Any], Any]                       # stream -> token
+    values: Callable[[Any], tuple[Any, ...]]        # response -> one value per column
+
+INVENTORY_QUERIES = (
+    InventoryQuery(("comment",), lambda s: s.comment.get(), lambda r: (r.comment,)),
+    InventoryQuery(("enable",), lambda s: s.enable.get(), lambda r: (enums.OnOffWithSuppress(r.state).name,)),
+    InventoryQuery(("rate_ppm",), lambda s: s.rate.fraction.get(), lambda r: (r.stream_rate_ppm,)),
+    InventoryQuery(("rate_pps",), lambda s: s.rate.pps.get(), lambda r: (r.stream_rate_pps,)),
+    InventoryQuery(
+        ("length_type", "length_min", "length_max"),
+        lambda s: s.packet.length.get(),
+        lambda r: (enums.LengthType(r.length_type).name, r.min_val, r.max_val),
+    ),
+    InventoryQuery(("tpld_id",), lambda s: s.tpld_id.get(), lambda r: (r.test_payload_identifier,)),
+    InventoryQuery(
+        ("header_protocol",),
+        lambda s: s.packet.header.protocol.get(),
+        lambda r: (" ".join(enums.ProtocolOption(p).name for p in r.segments),),
+    ),
+    InventoryQuery(("header_data",), lambda s: s.packet.header.data.get(), lambda r: (str(r.hex_data),)),
+)
+KEY_COLUMNS = ("port", "stream")
+VALUE_COLUMNS = tuple(c for q in INVENTORY_QUERIES for c in q.columns)
+
+#---------------------------
+# StreamInventory
+#---------------------------
+class StreamInventory:
+    """Columnar table of stream configurations, one list per column and one row per stream.
+
+    A cell is None if its query failed, e.g. a command the port does not support.
+    """
+
+    def __init__(self, columns: Optional[dict[str, list]] = None) -> None:
+        self.columns = {c: [] for c in KEY_COLUMNS + VALUE_COLUMNS}
+        if columns:
+            for c in self.columns:
+                self.columns[c] = list(columns.get(c, []))
+        self._rows = {key: i for i, key in enumerate(zip(*(self.columns[c] for c in KEY_COLUMNS)))}
+
+    def __len__(self) -> int:
+        return len(self.columns["port"])
+
+    def append(self, port: str, stream: int, values: list) -> None:
+        self._rows[(port, stream)] = len(self)
+        for c, v in zip(KEY_COLUMNS + VALUE_COLUMNS, [port, stream, *values]):
+            self.columns[c].append(v)
+
+    def row(self, port: str, stream: int) -> dict[str, Any]:
+        i = self._rows[(port, stream)]
+        return {c: values[i] for c, values in self.columns.items()}
+
+    @property
+    def keys(self) -> dict[tuple[str, int], int]:
+        return self._rows
+
+    def save(self, path: str) -> None:
+        Path(path).write_text(json.dumps(self.columns))
+
+    @classmethod
+    def load(cls, path: str) -> "StreamInventory":
+        return cls(json.loads(Path(path).read_text()))
+
+#---------------------------
+# collect_inventory
+#---------------------------
+async def _collect_port(port_str: str, port_obj: Any) -> list[tuple[str, int, list]]:
+    streams = list(port_obj.streams)
+    tokens = [q.get(s) for s in streams for q in INVENTORY_QUERIES]
+    responses = [r async for r in utils.apply_iter(*tokens, return_exceptions=True)]
+    rows = []
+    for i, stream in enumerate(streams):
+        values = []
+        for q, resp in zip(INVENTORY_QUERIES, responses[i * len(INVENTORY_QUERIES):(i + 1) * len(INVENTORY_QUERIES)]):
+            values.extend((None,) * len(q.columns) if isinstance(resp, Exception) else q.values(resp))
+        rows.append((port_str, stream.idx, values))
+    return rows
+
+
+async def collect_inventory(port_objs: dict[str, Any]) -> StreamInventory:
+    """Inventory of the streams already synchronized on the port objects, one batch of queries per port."""
+    inventory = StreamInventory()
+    for rows in await asyncio.gather(*[_collect_port(port_str, port_obj) for port_str, port_obj in port_objs.items()]):
+        for port_str, stream_idx, values in rows:
+            inventory.append(port_str, stream_idx, values)
+    return inventory
+
+#---------------------------
+# diff_inventory
+#---------------------------
+class StreamChange(NamedTuple):
+    port: str
+    stream: int
+    column: str         # "" when the whole stream was added or removed
+    old: Any
+    new: Any
+
+
+def diff_inventory(old: StreamInventory, new: StreamInventory) -> list[StreamChange]:
+    """Streams added or removed, and the changed cells of the streams in both inventories."""
+    changes = []
+    old_keys, new_keys = old.keys, new.keys
+    for key in old_keys.keys() - new_keys.keys():
+        changes.append(StreamChange(*key, "", "present", None))
+    for key in new_keys.keys() - old_keys.keys():
+        changes.append(StreamChange(*key, "", None, "present"))
+    for key in old_keys.keys() & new_keys.keys():
+        i, j = old_keys[key], new_keys[key]
+        for c in VALUE_COLUMNS:
+            if old.columns[c][i] != new.columns[c][j]:
+                changes.append(StreamChange(*key, c, old.columns[c][i], new.columns[c][j]))
+    return sorted(changes)
+
+#---------------------------
+# stream_inventory
+#---------------------------
+async def stream_inventory(chassis: str, username: str, port_strs: list[str], inventory_file: str):
+    # configure basic logger
+    logging.basicConfig(
+        format="%(asctime)s  %(message)s",
+        level=logging.DEBUG,
+        handlers=[
+            logging.FileHandler(filename="test.log", mode="a"),
+            logging.StreamHandler()]
+        )
+
+    # create tester instance and establish connection
+    async with testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False) as tester:
+        logging.info(f"===================================")
+        logging.info(f"{'Connect to chassis:':<20}{chassis}")
+        logging.info(f"{'Username:':<20}{username}")
+
+        # access the port objects
+        port_objs = {}
+        for port_str in port_strs:
+            _mid = int(port_str.split("/")[0])
+            _pid = int(port_str.split("/")[1])
+            module_obj = tester.modules.obtain(_mid)
+            if isinstance(module_obj, modules.E100ChimeraModule):
+                continue
+            port_objs[port_str] = module_obj.ports.obtain(_pid)
+
+        # reserve the ports by force
+        await mgmt.reserve_ports(ports=list(port_objs.values()), force=True)
+
+        # synchronize the streams on the physical ports and the stream indices on the port objects
+        await asyncio.gather(*[p.streams.server_sync() for p in port_objs.values()])
+
+        inventory = await collect_inventory(port_objs)
+        logging.info(f"Number of streams on {len(port_objs)} ports: {len(inventory)}")
+
+        if Path(inventory_file).exists():
+            changes = diff_inventory(StreamInventory.load(inventory_file), inventory)
+            logging.info(f"Changes since the last inventory: {len(changes)}")
+            for change in changes:
+                logging.info(f"Port {change.port} Stream [{change.stream}] {change.column or 'stream'}: {change.old} -> {change.new}")
+        inventory.save(inventory_file)
+
+        # release the ports
+        await mgmt.release_ports(ports=list(port_objs.values()))
+
+async def main():
+    stop_event = asyncio.Event()
+    try:
+        await stream_inventory(
+            chassis=CHASSIS_IP,
+            username=USERNAME,
+            port_strs=PORTS,
+            inventory_file=INVENTORY_FILE,
+        )
+    except KeyboardInterrupt:
+        stop_event.set()
+
+if __name__ == "__main__":
+    asyncio.run(main())
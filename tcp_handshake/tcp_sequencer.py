@@ -0,0 +1,293 @@
+################################################################
+#
+#                   TCP SESSION SEQUENCER
+#
+# This script shows you how to replay scripted TCP sessions of
+# many flows between two test ports.
+#
+# What this script example does:
+# 1. Describe the TCP exchanges of a session (handshake, data,
+#    FIN, RST) as a list of steps
+# 2. Precompute every frame of every flow as bytes, with the
+#    IPv4 and TCP checksums and the seq/ack numbers of each
+#    side, before connecting to the tester
+# 3. Replay the packet bank from the client and server ports,
+#    one step of all flows at a time, with a configurable gap
+#    between the packets of a port. With a gap of 0 the packets
+#    of a step are sent in one batch.
+#
+################################################################
+import asyncio
+from xoa_driver import testers
+from xoa_driver import modules
+from xoa_driver import utils
+from ipaddress import IPv4Address
+from xoa_driver.misc import Hex
+from xoa_driver.hlfuncs import mgmt
+from dataclasses import dataclass, field
+import logging
+import random
+import struct
+import time
+from typing import Any, NamedTuple
+
+#---------------------------
+# Global parameters
+#---------------------------
+
+CHASSIS_IP = "10.165.136.66"      # Chassis IP address or hostname
+USERNAME = "XOA"                # Username
+CLIENT_PORT = "0/0"
+SERVER_PORT = "0/1"
+
+CLIENT_MAC = "aaaa.0a0a.0a0a"
+SERVER_MAC = "aaaa.0a0a.0a14"
+CLIENT_IP = "10.10.10.10"
+SERVER_IP = "10.10.10.20"
+S_PORT = 6000
+D_PORT = 22611
+FLOW_COUNT = 1000               # Flows from consecutive source ports, then consecutive client IP addresses
+PACKET_GAP = 0.0                # Seconds between the packets of a port, 0 sends a whole step in one batch
+STEP_GAP = 0.1                  # Seconds between the steps
+
+CLIENT = "client"
+SERVER = "server"
+
+class TcpStep(NamedTuple):
+    kind: str                   # "handshake", "data", "fin" or "rst"
+    side: str = CLIENT          # the side that sends the data, starts the close or resets
+    length: int = 0             # payload bytes of a data step
+
+SCRIPT = [
+    TcpStep("handshake"),
+    TcpStep("data", CLIENT, 100),
+    TcpStep("data", SERVER, 1000),
+    TcpStep("fin", CLIENT),
+]
+
+#------------------------------
+# TCP flags
+#------------------------------
+FIN = 0x01
+SYN = 0x02
+RST = 0x04
+PSH = 0x08
+ACK = 0x10
+
+FLAG_NAMES = ((SYN, "SYN"), (FIN, "FIN"), (RST, "RST"), (PSH, "PSH"), (ACK, "ACK"))
+
+ETH_HEADER = struct.Struct("!6s6sH")
+IPV4_HEADER = struct.Struct("!BBHHHBBH4s4s")
+TCP_HEADER = struct.Struct("!HHIIBBHHH")
+MIN_FRAME_LENGTH = 60           # without FCS
+FCS = bytes(4)                  # placeholder, the port writes a valid FCS into the last four bytes
+
+#------------------------------
+# frame building
+#------------------------------
+def checksum(data: bytes) -> int:
+    """Internet checksum (RFC 1071) of the data."""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def mac_bytes(mac: str) -> bytes:
+    return bytes.fromhex(mac.replace(".", "").replace(":", "").replace("-", ""))
+
+
+@dataclass
+class TcpFlow:
+    client_mac: bytes
+    server_mac: bytes
+    client_ip: bytes
+    server_ip: bytes
+    client_port: int
+    server_port: int
+    # next sequence number and IPv4 identification of each side
+    seq: dict[str, int] = field(default_factory=dict)
+    ip_id: dict[str, int] = field(default_factory=lambda: {CLIENT: 0, SERVER: 0})
+
+    def frame(self, side: str, flags: int, payload: bytes = b"") -> bytes:
+        """Ethernet/IPv4/TCP frame from a side with the current seq/ack numbers, advancing the sequence number of the side."""
+        peer = SERVER if side == CLIENT else CLIENT
+        if side == CLIENT:
+            src_mac, dst_mac, src_ip, dst_ip, src_port, dst_port = self.client_mac, self.server_mac, self.client_ip, self.server_ip, self.client_port, self.server_port
+        else:
+            src_mac, dst_mac, src_ip, dst_ip, src_port, dst_port = self.server_mac, self.client_mac, self.server_ip, self.client_ip, self.server_port, self.client_port
+        seq = self.seq[side]
+        ack = self.seq[peer] if flags & ACK else 0
+        tcp_length = TCP_HEADER.size + len(payload)
+
+        tcp = TCP_HEADER.pack(src_port, dst_port, seq, ack, (TCP_HEADER.size // 4) << 4, flags, 64240, 0, 0) + payload
+        pseudo_header = src_ip + dst_ip + struct.pack("!BBH", 0, 6, tcp_length)
+        tcp = tcp[:16] + struct.pack("!H", checksum(pseudo_header + tcp)) + tcp[18:]
+
+        ip = IPV4_HEADER.pack(0x45, 0, IPV4_HEADER.size + tcp_length, self.ip_id[side], 0x4000, 64, 6, 0, src_ip, dst_ip)
+        ip = ip[:10] + struct.pack("!H", checksum(ip)) + ip[12:]
+
+        self.seq[side] = (seq + len(payload) + (1 if flags & (SYN | FIN) else 0)) & 0xFFFFFFFF
+        self.ip_id[side] = (self.ip_id[side] + 1) & 0xFFFF
+        frame = ETH_HEADER.pack(dst_mac, src_mac, 0x0800) + ip + tcp
+        return frame.ljust(MIN_FRAME_LENGTH, b"\x00") + FCS
+
+
+def make_flows(count: int, client_mac: str, server_mac: str, client_ip: str, server_ip: str, first_source_port: int, dest_port: int, seed: int = 0) -> list[TcpFlow]:
+    """Flows from consecutive source ports, moving on to the next client IP address when the ports run out."""
+    rng = random.Random(seed)
+    span = 65536 - first_source_port
+    return [
+        TcpFlow(
+            client_mac=mac_bytes(client_mac),
+            server_mac=mac_bytes(server_mac),
+            client_ip=(IPv4Address(client_ip) + i // span).packed,
+            server_ip=IPv4Address(server_ip).packed,
+            client_port=first_source_port + i % span,
+            server_port=dest_port,
+            seq={CLIENT: rng.getrandbits(32), SERVER: rng.getrandbits(32)},
+        )
+        for i in range(count)
+    ]
+
+#------------------------------
+# PacketBank
+#------------------------------
+class PacketRound(NamedTuple):
+    side: str                   # the port that sends the frames
+    label: str                  # TCP flags of the frames
+    frames: list[bytes]         # one frame per flow
+
+
+def _packets(step: TcpStep) -> list[tuple[str, int, int]]:
+    """(side, flags, payload length) of the packets of a step."""
+    peer = SERVER if step.side == CLIENT else CLIENT
+    if step.kind == "handshake":
+        return [(CLIENT, SYN, 0), (SERVER, SYN | ACK, 0), (CLIENT, ACK, 0)]
+    if step.kind == "data":
+        return [(step.side, PSH | ACK, step.length), (peer, ACK, 0)]
+    if step.kind == "fin":
+        return [(step.side, FIN | ACK, 0), (peer, ACK, 0), (peer, FIN | ACK, 0), (step.side, ACK, 0)]
+    if step.kind == "rst":
+        return [(step.side, RST | ACK, 0)]
+    raise ValueError(f"Unknown TCP step {step.kind}")
+
+
+def build_packet_bank(flows: list[TcpFlow], script: list[TcpStep]) -> list[PacketRound]:
+    """Every frame of every flow, grouped in rounds of the same packet of all flows, in send order."""
+    rounds = []
+    for step in script:
+        for side, flags, length in _packets(step):
+            payload = bytes(i & 0xFF for i in range(length))
+            rounds.append(PacketRound(
+                side=side,
+                label="/".join(name for bit, name in FLAG_NAMES if flags & bit),
+                frames=[flow.frame(side, flags, payload) for flow in flows],
+            ))
+    return rounds
+
+#------------------------------
+# replay
+#------------------------------
+async def replay(port_objs: dict[str, Any], rounds: list[PacketRound], packet_gap: float, step_gap: float) -> None:
+    """Send the rounds one after the other from the port of their side."""
+    for r in rounds:
+        port_obj = port_objs[r.side]
+        tokens = [port_obj.tx_single_pkt.send.set(hex_data=Hex(frame.hex().upper())) for frame in r.frames]
+        if packet_gap <= 0:
+            async for _ in utils.apply_iter(*tokens):
+                pass
+        else:
+            # keep the gaps from the start of the round so the sending time does not add up
+            start = time.monotonic()
+            for i, token in enumerate(tokens):
+                await asyncio.sleep(max(0.0, start + i * packet_gap - time.monotonic()))
+                await token
+        logging.info(f"{r.side:<8}{r.label:<10}{len(r.frames)} packets")
+        await asyncio.sleep(step_gap)
+
+#------------------------------
+# tcp_sequencer
+#------------------------------
+async def tcp_sequencer(chassis: str, username: str, c_port_str: str, s_port_str: str, client_mac: str, server_mac: str, client_ip: str, server_ip: str, source_port_num: int, dest_port_num: int, flow_count: int, script: list[TcpStep], packet_gap: float, step_gap: float) -> None:
+    # configure basic logger
+    logging.basicConfig(
+        format="%(asctime)s  %(message)s",
+        level=logging.DEBUG,
+        handlers=[
+            logging.FileHandler(filename="test.log", mode="a"),
+            logging.StreamHandler()]
+        )
+
+    # precompute the packet bank before connecting
+    start = time.perf_counter()
+    flows = make_flows(flow_count, client_mac, server_mac, client_ip, server_ip, source_port_num, dest_port_num)
+    rounds = build_packet_bank(flows, script)
+    logging.info(f"Built {sum(len(r.frames) for r in rounds)} frames of {flow_count} flows in {time.perf_counter() - start:.3f} s")
+
+    # create tester instance and establish connection
+    async with testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False) as tester:
+
+        # access the module and port on the tester
+        _mid_c = int(c_port_str.split("/")[0])
+        _pid_c = int(c_port_str.split("/")[1])
+        _mid_s = int(s_port_str.split("/")[0])
+        _pid_s = int(s_port_str.split("/")[1])
+        c_module_obj = tester.modules.obtain(_mid_c)
+        s_module_obj = tester.modules.obtain(_mid_s)
+
+        # modules must not be Chimera
+        if isinstance(c_module_obj, modules.E100ChimeraModule):
+            return
+        if isinstance(s_module_obj, modules.E100ChimeraModule):
+            return
+
+        c_port_obj = c_module_obj.ports.obtain(_pid_c)
+        s_port_obj = s_module_obj.ports.obtain(_pid_s)
+
+        # reserve ports
+        await mgmt.release_modules(modules=[c_module_obj, s_module_obj], should_release_ports=False)
+        await mgmt.reserve_ports(ports=[c_port_obj, s_port_obj])
+
+        # port configuration
+        await asyncio.gather(*[
+            utils.apply(
+                port_obj.comment.set(comment=comment),
+                port_obj.tx_config.enable.set_on(),
+                port_obj.tpld_mode.set_normal(),
+                port_obj.payload_mode.set_normal(),
+            )
+            for port_obj, comment in ((c_port_obj, "TCP Client Port"), (s_port_obj, "TCP Server Port"))
+        ])
+
+        await replay({CLIENT: c_port_obj, SERVER: s_port_obj}, rounds, packet_gap, step_gap)
+
+        # free ports
+        await mgmt.release_ports(ports=[c_port_obj, s_port_obj])
+
+async def main():
+    stop_event = asyncio.Event()
+    try:
+        await tcp_sequencer(
+            chassis=CHASSIS_IP,
+            username=USERNAME,
+            c_port_str=CLIENT_PORT,
+            s_port_str=SERVER_PORT,
+            client_mac=CLIENT_MAC,
+            server_mac=SERVER_MAC,
+            client_ip=CLIENT_IP,
+            server_ip=SERVER_IP,
+            source_port_num=S_PORT,
+            dest_port_num=D_PORT,
+            flow_count=FLOW_COUNT,
+            script=SCRIPT,
+            packet_gap=PACKET_GAP,
+            step_gap=STEP_GAP,
+        )
+    except KeyboardInterrupt:
+        stop_event.set()
+
+if __name__ == "__main__":
+    asyncio.run(main())
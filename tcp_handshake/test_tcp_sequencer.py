@@ -0,0 +1,46 @@
+from ipaddress import IPv4Address
+
+import pytest
+
+from tcp_sequencer import CLIENT, SCRIPT, SERVER, TcpStep, build_packet_bank, checksum, make_flows
+
+FLOW_COUNT = 10000
+ETH_LENGTH = 14
+
+
+def reference_checksum(data: bytes) -> int:
+    """RFC 1071 checksum, one 16-bit word at a time with the end-around carry."""
+    total = 0
+    for i in range(0, len(data), 2):
+        word = data[i] << 8 | (data[i + 1] if i + 1 < len(data) else 0)
+        total += word
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def zero_checksum(data: bytes, offset: int) -> bytes:
+    return data[:offset] + b"\x00\x00" + data[offset + 2:]
+
+
+@pytest.mark.parametrize("data", [b"", b"\x01", b"\xff\xff", b"\x45\x00\x00\x73\x00\x00\x40\x00\x40\x11", bytes(range(256)) * 3 + b"\x07"])
+def test_checksum_matches_reference(data):
+    assert checksum(data) == reference_checksum(data)
+
+
+def test_checksums_of_10k_flows():
+    flows = make_flows(FLOW_COUNT, "aaaa.0a0a.0a0a", "aaaa.0a0a.0a14", "10.10.10.10", "10.10.10.20", 60000, 22611)
+    # an odd payload length checks the padding of the TCP checksum
+    rounds = build_packet_bank(flows, SCRIPT + [TcpStep("data", SERVER, 101), TcpStep("rst", CLIENT)])
+    assert len({(f.client_ip, f.client_port) for f in flows}) == FLOW_COUNT
+    assert IPv4Address(flows[-1].client_ip) > IPv4Address("10.10.10.10")
+
+    for r in rounds:
+        assert len(r.frames) == FLOW_COUNT
+        for frame in r.frames:
+            ip_length = int.from_bytes(frame[ETH_LENGTH + 2:ETH_LENGTH + 4], "big")
+            ip = frame[ETH_LENGTH:ETH_LENGTH + 20]
+            tcp = frame[ETH_LENGTH + 20:ETH_LENGTH + ip_length]
+            pseudo_header = ip[12:20] + bytes((0, 6)) + len(tcp).to_bytes(2, "big")
+
+            assert int.from_bytes(ip[10:12], "big") == reference_checksum(zero_checksum(ip, 10))
+            assert int.from_bytes(tcp[16:18], "big") == reference_checksum(pseudo_header + zero_checksum(tcp, 16))
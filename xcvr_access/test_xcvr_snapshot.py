@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+
+import xcvr_snapshot
+from xcvr_snapshot import LOWER_PAGE, PAGE_SIZE, TransceiverSnapshotEngine
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeTransceiver:
+    """Transceiver memory behind PX_RW_SEQ_BANK, counting the I2C transactions and the batches they came in."""
+
+    def __init__(self, identifier: int, temperature: float) -> None:
+        self.lower = bytearray(range(PAGE_SIZE))
+        self.upper: dict[tuple[int, int], bytearray] = {}
+        self.lower[0] = identifier
+        offset = xcvr_snapshot.TEMPERATURE_OFFSET_SFF8636 if identifier in xcvr_snapshot.SFF8636_IDENTIFIERS else xcvr_snapshot.TEMPERATURE_OFFSET_CMIS
+        self.lower[offset:offset + 2] = int(temperature * 256).to_bytes(2, "big", signed=True)
+        self.reads = 0
+        self.writes = 0
+
+    def memory(self, bank: int, page: int, register: int) -> tuple[bytearray, int]:
+        if register < PAGE_SIZE:
+            return self.lower, register
+        key = (bank, page)
+        if key not in self.upper:
+            self.upper[key] = bytearray((bank * 16 + page + i) % 256 for i in range(PAGE_SIZE))
+        return self.upper[key], register - PAGE_SIZE
+
+    def access_rw_seq_bank(self, bank_address: int, page_address: int, register_address: int, byte_count: int) -> "FakeAccess":
+        assert byte_count > 0
+        return FakeAccess(self, bank_address, page_address, register_address, byte_count)
+
+
+class FakeAccess:
+    def __init__(self, transceiver: FakeTransceiver, bank: int, page: int, register: int, count: int) -> None:
+        self.transceiver = transceiver
+        self.bank, self.page, self.register, self.count = bank, page, register, count
+
+    def get(self):
+        def execute():
+            self.transceiver.reads += 1
+            memory, offset = self.transceiver.memory(self.bank, self.page, self.register)
+            assert offset + self.count <= PAGE_SIZE
+            return type("Response", (), {"value": "0x" + memory[offset:offset + self.count].hex().upper()})
+        return execute
+
+    def set(self, value: str):
+        def execute():
+            self.transceiver.writes += 1
+            data = bytes.fromhex(value)
+            assert len(data) == self.count
+            memory, offset = self.transceiver.memory(self.bank, self.page, self.register)
+            memory[offset:offset + self.count] = data
+        return execute
+
+
+class FakePort:
+    def __init__(self, identifier: int = 0x18, temperature: float = 35.5) -> None:
+        self.transceiver = FakeTransceiver(identifier, temperature)
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Sizes of the batches sent with utils.apply."""
+    sizes = []
+
+    async def apply(*tokens):
+        assert len(tokens) <= 200
+        sizes.append(len(tokens))
+        return [token() for token in tokens]
+
+    monkeypatch.setattr(xcvr_snapshot.utils, "apply", apply)
+    return sizes
+
+
+def make_engine(port_count: int = 3, **kwargs) -> tuple[TransceiverSnapshotEngine, dict[str, FakePort], FakeClock]:
+    ports = {f"0/{i}": FakePort() for i in range(port_count)}
+    clock = FakeClock()
+    return TransceiverSnapshotEngine(ports, clock=clock, **kwargs), ports, clock
+
+
+def expected_page(port: FakePort, key) -> bytes:
+    bank, page = (0, 0) if key is LOWER_PAGE else key
+    memory, _ = port.transceiver.memory(bank, page, 0 if key is LOWER_PAGE else PAGE_SIZE)
+    return bytes(memory)
+
+
+def test_snapshot_reads_every_page_in_bursts_once_per_port(batches):
+    engine, ports, _ = make_engine(max_burst=32)
+    snapshot = asyncio.run(engine.snapshot())
+    pages = len(xcvr_snapshot.SNAPSHOT_PAGES)
+    assert engine.transactions == len(ports) * pages * 4
+    assert batches == [pages * 4] * len(ports)
+    for name, port in ports.items():
+        assert port.transceiver.reads == pages * 4
+        for key, data in snapshot[name].items():
+            assert data == expected_page(port, key)
+
+
+def test_batches_are_split_at_the_command_limit(batches):
+    engine, ports, _ = make_engine(port_count=1, max_burst=1)
+    asyncio.run(engine.snapshot([LOWER_PAGE, (0, 0x00)]))
+    assert batches == [200, 2 * PAGE_SIZE - 200]
+    assert ports["0/0"].transceiver.reads == 2 * PAGE_SIZE
+
+
+def test_polls_within_the_ttl_are_served_from_the_store(batches):
+    ports = {"0/0": FakePort(), "0/1": FakePort(identifier=0x11, temperature=-5.25)}
+    clock = FakeClock()
+    engine = TransceiverSnapshotEngine(ports, ttl=1.0, clock=clock)
+    asyncio.run(engine.snapshot())
+    reads = engine.transactions
+    for _ in range(10):
+        clock.now += 0.05
+        temperatures = [asyncio.run(engine.temperature(name)) for name in ports]
+    assert temperatures == [35.5, -5.25]
+    assert engine.transactions == reads
+
+    clock.now += 1.0
+    asyncio.run(engine.temperature("0/0"))
+    assert engine.transactions == reads + PAGE_SIZE // xcvr_snapshot.MAX_I2C_BURST
+
+
+def test_staged_writes_are_coalesced_and_survive_a_reread(batches):
+    engine, ports, clock = make_engine(port_count=1, max_burst=32, ttl=1.0)
+    transceiver = ports["0/0"].transceiver
+    key = (0, 0x10)
+    asyncio.run(engine.snapshot([key]))
+    engine.write("0/0", key, 10, bytes(range(100, 142)))
+    engine.write("0/0", key, 100, b"\xff")
+    assert asyncio.run(engine.read("0/0", key, 10, 42)) == bytes(range(100, 142))
+
+    clock.now += 2.0
+    assert asyncio.run(engine.read("0/0", key, 100, 1)) == b"\xff"
+    assert transceiver.writes == 0
+
+    asyncio.run(engine.flush())
+    assert transceiver.writes == 3
+    assert engine.stores["0/0"].dirty_pages == []
+    assert transceiver.upper[key][10:52] == bytes(range(100, 142))
+    assert transceiver.upper[key][100] == 0xFF
+
+
+def test_write_outside_the_page_is_rejected():
+    engine, _, _ = make_engine(port_count=1)
+    with pytest.raises(ValueError):
+        engine.write("0/0", LOWER_PAGE, 120, bytes(10))
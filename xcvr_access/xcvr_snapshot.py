@@ -0,0 +1,304 @@
+################################################################
+#
+#                   XCVR SNAPSHOT
+#
+# What this script example does:
+# 1. Connect to a tester
+# 2. Reserve many ports
+# 3. Read whole transceiver pages (lower memory and bank/page
+#    upper pages, 128 bytes each) of all ports concurrently.
+#    Each page is read with sequential I2C reads no longer than
+#    the maximum burst size, sent in one batch per port.
+# 4. Keep the pages in a per-port page store. Reads of a page
+#    younger than the TTL, e.g. temperature or Rx power polled
+#    again and again, are served from the store.
+# 5. Stage register writes in the store and flush them as
+#    coalesced sequential writes
+# 6. Release the ports
+#
+################################################################
+
+import asyncio
+
+from xoa_driver import testers
+from xoa_driver import modules
+from xoa_driver import utils
+from xoa_driver.hlfuncs import mgmt
+from xoa_driver.misc import Hex
+import logging
+import time
+from typing import Any, Callable, Optional
+
+#---------------------------
+# GLOBAL PARAMS
+#---------------------------
+CHASSIS_IP = "demo.xenanetworks.com"
+USERNAME = "xoa"
+PORTS = ["3/0", "3/1", "6/0", "6/1"]
+MAX_I2C_BURST = 32          # Largest byte count of one sequential I2C transaction
+CACHE_TTL = 1.0             # Seconds a page read from the transceiver is served from the store
+POLL_COUNT = 10             # Number of temperature polls in the example
+POLL_INTERVAL = 0.2         # Seconds between temperature polls
+
+#---------------------------
+# PAGE ADDRESSING
+#---------------------------
+PAGE_SIZE = 128
+# Bytes 0-127, the same whatever bank and page are selected
+LOWER_PAGE = None
+# Upper pages are addressed by (bank, page), e.g. CMIS page 0x11 of bank 0 is (0, 0x11)
+SNAPSHOT_PAGES = [LOWER_PAGE, (0, 0x00), (0, 0x01), (0, 0x02), (0, 0x11)]
+MAX_COMMANDS_PER_APPLY = 200    # utils.apply takes at most 200 commands
+
+PageKey = Optional[tuple[int, int]]
+
+# Identifier (byte 0) of the modules that follow SFF-8636, the others are read as CMIS
+SFF8636_IDENTIFIERS = (0x0C, 0x0D, 0x11)
+TEMPERATURE_OFFSET_CMIS = 14
+TEMPERATURE_OFFSET_SFF8636 = 22
+
+
+def hex_to_bytes(value: str) -> bytes:
+    if value[:2].lower() == "0x":
+        value = value[2:]
+    return bytes.fromhex(value)
+
+
+def split_bursts(offset: int, count: int, max_burst: int) -> list[tuple[int, int]]:
+    """Split a sequential access of ``count`` bytes from ``offset`` into (offset, count) transactions."""
+    return [(o, min(max_burst, offset + count - o)) for o in range(offset, offset + count, max_burst)]
+
+
+def register_address(key: PageKey, offset: int) -> int:
+    return offset if key is LOWER_PAGE else PAGE_SIZE + offset
+
+
+#---------------------------
+# TransceiverPage
+#---------------------------
+class TransceiverPage:
+    """128 bytes of a page, when they were read, and the bytes written locally but not yet flushed."""
+
+    __slots__ = ("data", "read_at", "dirty")
+
+    def __init__(self) -> None:
+        self.data = bytearray(PAGE_SIZE)
+        self.read_at: Optional[float] = None
+        self.dirty = bytearray(PAGE_SIZE)   # 1 for each byte waiting to be written
+
+    def is_fresh(self, now: float, max_age: float) -> bool:
+        return self.read_at is not None and now - self.read_at < max_age
+
+    def dirty_runs(self) -> list[tuple[int, bytes]]:
+        """Contiguous runs of dirty bytes as (offset, data)."""
+        runs = []
+        offset = 0
+        while (start := self.dirty.find(1, offset)) >= 0:
+            end = self.dirty.find(0, start)
+            end = PAGE_SIZE if end < 0 else end
+            runs.append((start, bytes(self.data[start:end])))
+            offset = end
+        return runs
+
+
+#---------------------------
+# TransceiverPageStore
+#---------------------------
+class TransceiverPageStore:
+    """Pages of one transceiver."""
+
+    def __init__(self) -> None:
+        self.pages: dict[PageKey, TransceiverPage] = {}
+
+    def page(self, key: PageKey) -> TransceiverPage:
+        if key not in self.pages:
+            self.pages[key] = TransceiverPage()
+        return self.pages[key]
+
+    def stale(self, keys: list[PageKey], now: float, max_age: float) -> list[PageKey]:
+        return [k for k in keys if not self.page(k).is_fresh(now, max_age)]
+
+    def update(self, key: PageKey, data: bytes, read_at: float) -> None:
+        """Store a page read from the transceiver. Bytes staged for writing keep their staged value."""
+        page = self.page(key)
+        for i, b in enumerate(data):
+            if not page.dirty[i]:
+                page.data[i] = b
+        page.read_at = read_at
+
+    def write(self, key: PageKey, offset: int, data: bytes) -> None:
+        if offset < 0 or offset + len(data) > PAGE_SIZE:
+            raise ValueError(f"write of {len(data)} bytes at {offset} does not fit in a page")
+        page = self.page(key)
+        page.data[offset:offset + len(data)] = data
+        page.dirty[offset:offset + len(data)] = b"\x01" * len(data)
+
+    def invalidate(self, keys: Optional[list[PageKey]] = None) -> None:
+        """Make the next read of the pages, all pages if None, go to the transceiver."""
+        for k, page in self.pages.items():
+            if keys is None or k in keys:
+                page.read_at = None
+
+    @property
+    def dirty_pages(self) -> list[PageKey]:
+        return [k for k, page in self.pages.items() if any(page.dirty)]
+
+
+#---------------------------
+# TransceiverSnapshotEngine
+#---------------------------
+class TransceiverSnapshotEngine:
+    """Read and write transceiver pages of many ports.
+
+    The I2C reads of all stale pages of a port are sent in one batch, and the ports are handled concurrently.
+    ``clock`` is injectable so the TTL can be tested without waiting.
+    """
+
+    def __init__(self, ports: dict[str, Any], max_burst: int = MAX_I2C_BURST, ttl: float = CACHE_TTL, clock: Callable[[], float] = time.monotonic) -> None:
+        if not 0 < max_burst <= PAGE_SIZE:
+            raise ValueError(f"max_burst must be within 1..{PAGE_SIZE}")
+        self.ports = ports
+        self.max_burst = max_burst
+        self.ttl = ttl
+        self.clock = clock
+        self.stores = {name: TransceiverPageStore() for name in ports}
+        self.transactions = 0
+
+    def _access(self, port: Any, key: PageKey, offset: int, count: int) -> Any:
+        bank, page = (0, 0) if key is LOWER_PAGE else key
+        return port.transceiver.access_rw_seq_bank(bank_address=bank, page_address=page, register_address=register_address(key, offset), byte_count=count)
+
+    async def _apply(self, tokens: list) -> list:
+        self.transactions += len(tokens)
+        responses = []
+        for i in range(0, len(tokens), MAX_COMMANDS_PER_APPLY):
+            responses += await utils.apply(*tokens[i:i + MAX_COMMANDS_PER_APPLY])
+        return responses
+
+    async def _read_pages(self, name: str, keys: list[PageKey]) -> None:
+        port = self.ports[name]
+        bursts = [(k, o, n) for k in keys for o, n in split_bursts(0, PAGE_SIZE, self.max_burst)]
+        responses = await self._apply([self._access(port, k, o, n).get() for k, o, n in bursts])
+        read_at = self.clock()
+        pages = {k: bytearray(PAGE_SIZE) for k in keys}
+        for (k, o, n), resp in zip(bursts, responses):
+            pages[k][o:o + n] = hex_to_bytes(resp.value)[:n]
+        for k, data in pages.items():
+            self.stores[name].update(k, data, read_at)
+
+    async def snapshot(self, keys: list[PageKey] = SNAPSHOT_PAGES, port_names: Optional[list[str]] = None, max_age: Optional[float] = None) -> dict[str, dict[PageKey, bytes]]:
+        """Pages of the ports, reading from the transceivers only the pages older than ``max_age`` (default the TTL)."""
+        port_names = list(self.ports) if port_names is None else port_names
+        max_age = self.ttl if max_age is None else max_age
+        now = self.clock()
+        stale = {name: self.stores[name].stale(keys, now, max_age) for name in port_names}
+        await asyncio.gather(*[self._read_pages(name, k) for name, k in stale.items() if k])
+        return {name: {k: bytes(self.stores[name].page(k).data) for k in keys} for name in port_names}
+
+    async def read(self, name: str, key: PageKey, offset: int, count: int, max_age: Optional[float] = None) -> bytes:
+        """Bytes of a page, from the store if the page is younger than ``max_age`` (default the TTL)."""
+        pages = await self.snapshot([key], [name], max_age)
+        return pages[name][key][offset:offset + count]
+
+    def write(self, name: str, key: PageKey, offset: int, data: bytes) -> None:
+        """Stage a write. It is visible to reads at once and sent to the transceiver by flush()."""
+        self.stores[name].write(key, offset, data)
+
+    async def _flush_port(self, name: str) -> None:
+        port = self.ports[name]
+        store = self.stores[name]
+        tokens = []
+        pages = [store.page(k) for k in store.dirty_pages]
+        for k, page in zip(store.dirty_pages, pages):
+            for start, data in page.dirty_runs():
+                for o, n in split_bursts(start, len(data), self.max_burst):
+                    tokens.append(self._access(port, k, o, n).set(Hex(data[o - start:o - start + n].hex().upper())))
+        await self._apply(tokens)
+        for page in pages:
+            page.dirty[:] = bytes(PAGE_SIZE)
+
+    async def flush(self, port_names: Optional[list[str]] = None) -> None:
+        """Send the staged writes, adjacent bytes coalesced into sequential writes."""
+        port_names = list(self.ports) if port_names is None else port_names
+        await asyncio.gather(*[self._flush_port(name) for name in port_names if self.stores[name].dirty_pages])
+
+    async def temperature(self, name: str) -> float:
+        """Module temperature in degrees Celsius, signed 1/256 degree units of CMIS or SFF-8636."""
+        identifier = (await self.read(name, LOWER_PAGE, 0, 1))[0]
+        offset = TEMPERATURE_OFFSET_SFF8636 if identifier in SFF8636_IDENTIFIERS else TEMPERATURE_OFFSET_CMIS
+        raw = await self.read(name, LOWER_PAGE, offset, 2)
+        return int.from_bytes(raw, "big", signed=True) / 256
+
+
+#---------------------------
+# xcvr_snapshot
+#---------------------------
+async def xcvr_snapshot(chassis: str, username: str, port_strs: list[str], max_burst: int, ttl: float, poll_count: int, poll_interval: float):
+    # configure basic logger
+    logging.basicConfig(
+        format="%(asctime)s  %(message)s",
+        level=logging.DEBUG,
+        handlers=[
+            logging.FileHandler(filename="test.log", mode="a"),
+            logging.StreamHandler()]
+        )
+
+    # Establish connection to a Valkyrie tester
+    async with testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False) as my_tester:
+        logging.info(f"===================================")
+        logging.info(f"{'Connect to chassis:':<20}{chassis}")
+        logging.info(f"{'Username:':<20}{username}")
+
+        port_objs = {}
+        for port_str in port_strs:
+            _mid = int(port_str.split("/")[0])
+            _pid = int(port_str.split("/")[1])
+            module_obj = my_tester.modules.obtain(_mid)
+
+            # commands which used in this example are not supported by Chimera Module
+            if isinstance(module_obj, modules.E100ChimeraModule):
+                logging.info(f"Module {_mid} is a Chimera module, skip port {port_str}")
+                continue
+            port_objs[port_str] = module_obj.ports.obtain(_pid)
+
+        # use high-level func to reserve the ports
+        await mgmt.reserve_ports(ports=list(port_objs.values()))
+
+        engine = TransceiverSnapshotEngine(port_objs, max_burst=max_burst, ttl=ttl)
+
+        # Read all pages of all ports
+        start = time.monotonic()
+        snapshot = await engine.snapshot(SNAPSHOT_PAGES)
+        logging.info(f"Snapshot of {len(SNAPSHOT_PAGES)} pages of {len(snapshot)} ports: {engine.transactions} I2C reads in {time.monotonic() - start:.3f}s")
+        for port_str, pages in snapshot.items():
+            for key, data in pages.items():
+                logging.info(f"Port {port_str} Page {'lower' if key is LOWER_PAGE else f'bank {key[0]} page {key[1]:#04x}'}: {data.hex()}")
+
+        # Poll the temperature. Only polls after the TTL expired read from the transceivers.
+        for _ in range(poll_count):
+            temperatures = await asyncio.gather(*[engine.temperature(port_str) for port_str in port_objs])
+            for port_str, temperature in zip(port_objs, temperatures):
+                logging.info(f"Port {port_str} Transceiver temperature: {temperature:.2f} degrees Celsius.")
+            await asyncio.sleep(poll_interval)
+        logging.info(f"I2C reads in total: {engine.transactions}")
+
+        # Release the ports
+        await mgmt.release_ports(ports=list(port_objs.values()))
+
+async def main():
+    stop_event = asyncio.Event()
+    try:
+        await xcvr_snapshot(
+            chassis=CHASSIS_IP,
+            username=USERNAME,
+            port_strs=PORTS,
+            max_burst=MAX_I2C_BURST,
+            ttl=CACHE_TTL,
+            poll_count=POLL_COUNT,
+            poll_interval=POLL_INTERVAL,
+        )
+    except KeyboardInterrupt:
+        stop_event.set()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,334 @@
+################################################################
+#
+#                   XCVR TELEMETRY
+#
+# What this script example does:
+# 1. Connect to a tester
+# 2. Reserve many ports
+# 3. Every second, read the monitor pages of all transceivers
+#    with the snapshot engine of xcvr_snapshot.py
+# 4. Decode temperature, Vcc, per-lane Tx bias, Tx power,
+#    Rx power and the alarm/warning flags of all ports in one
+#    vectorized pass, for both CMIS and SFF-8636 modules
+# 5. Append the samples to a ring-buffered trend store
+# 6. Evaluate per-lane thresholds and log the violations
+# 7. Release the ports
+#
+################################################################
+
+import asyncio
+
+from xoa_driver import testers
+from xoa_driver import modules
+from xoa_driver.hlfuncs import mgmt
+import logging
+import time
+import warnings
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from xcvr_snapshot import LOWER_PAGE, MAX_I2C_BURST, PAGE_SIZE, SFF8636_IDENTIFIERS, TransceiverSnapshotEngine
+
+#---------------------------
+# GLOBAL PARAMS
+#---------------------------
+CHASSIS_IP = "demo.xenanetworks.com"
+USERNAME = "xoa"
+PORTS = ["3/0", "3/1", "6/0", "6/1"]
+DURATION = 60               # Monitoring duration in seconds
+SAMPLE_INTERVAL = 1.0       # Seconds between samples
+TREND_CAPACITY = 3600       # Number of samples kept per port
+REPORT_INTERVAL = 10        # Number of samples between trend reports
+
+#---------------------------
+# REGISTER MAP
+#---------------------------
+MAX_LANES = 8
+# CMIS lane monitors and flags are on bank 0 page 11h, SFF-8636 modules have them on the lower page and have no page 11h
+CMIS_LANE_PAGE = (0, 0x11)
+SFF8636_TELEMETRY_PAGES = [LOWER_PAGE]
+CMIS_TELEMETRY_PAGES = [LOWER_PAGE, CMIS_LANE_PAGE]
+
+# Offsets within the 128-byte pages
+CMIS_MODULE_FLAGS = 9           # lower page, temperature flags in bits 0-3, Vcc flags in bits 4-7
+CMIS_TEMPERATURE = 14           # lower page
+CMIS_VCC = 16                   # lower page
+CMIS_TX_POWER_FLAGS = 11        # page 11h bytes 139-142, one byte per flag, one bit per lane
+CMIS_TX_BIAS_FLAGS = 15         # page 11h bytes 143-146
+CMIS_RX_POWER_FLAGS = 21        # page 11h bytes 149-152
+CMIS_TX_POWER = 26              # page 11h bytes 154-169
+CMIS_TX_BIAS = 42               # page 11h bytes 170-185
+CMIS_RX_POWER = 58              # page 11h bytes 186-201
+
+SFF8636_LANES = 4
+SFF8636_TEMPERATURE_FLAGS = 6   # high nibble
+SFF8636_VCC_FLAGS = 7           # high nibble
+SFF8636_RX_POWER_FLAGS = 9      # two lanes per byte, one nibble per lane
+SFF8636_TX_BIAS_FLAGS = 11
+SFF8636_TX_POWER_FLAGS = 13
+SFF8636_TEMPERATURE = 22
+SFF8636_VCC = 26
+SFF8636_RX_POWER = 34
+SFF8636_TX_BIAS = 42
+SFF8636_TX_POWER = 50
+
+# Decoded flags, one nibble per value
+FLAG_HIGH_ALARM = 0x1
+FLAG_LOW_ALARM = 0x2
+FLAG_HIGH_WARNING = 0x4
+FLAG_LOW_WARNING = 0x8
+# SFF-8636 nibbles are high alarm, low alarm, high warning, low warning from bit 3 down to bit 0
+_REVERSE_NIBBLE = np.array([int(f"{i:04b}"[::-1], 2) for i in range(16)], dtype=np.uint8)
+
+#---------------------------
+# TelemetrySample
+#---------------------------
+@dataclass
+class TelemetrySample:
+    """Telemetry of N ports. Lane arrays are N x MAX_LANES, NaN for lanes the module does not have."""
+    temperature: np.ndarray     # degrees Celsius
+    vcc: np.ndarray             # V
+    tx_bias: np.ndarray         # mA
+    tx_power: np.ndarray        # mW
+    rx_power: np.ndarray        # mW
+    module_flags: np.ndarray    # N x 2 nibbles of FLAG_*: temperature, Vcc
+    tx_bias_flags: np.ndarray   # N x MAX_LANES nibbles of FLAG_*
+    tx_power_flags: np.ndarray
+    rx_power_flags: np.ndarray
+
+LANE_FIELDS = ("tx_bias", "tx_power", "rx_power")
+
+
+def _u16(raw: np.ndarray, offset: int, count: int = 1) -> np.ndarray:
+    """Big-endian 16-bit words from bytes ``offset`` on of every row."""
+    words = raw[:, offset:offset + 2 * count].astype(np.uint16)
+    return (words[:, 0::2] << 8) | words[:, 1::2]
+
+
+def _cmis_lane_flags(page: np.ndarray, offset: int) -> np.ndarray:
+    """One byte per flag (high alarm, low alarm, high warning, low warning) with a bit per lane, into a nibble per lane."""
+    bits = np.unpackbits(page[:, offset:offset + 4, np.newaxis], axis=2, bitorder="little")    # N x flag x lane
+    return (bits * np.array([FLAG_HIGH_ALARM, FLAG_LOW_ALARM, FLAG_HIGH_WARNING, FLAG_LOW_WARNING], dtype=np.uint8)[:, np.newaxis]).sum(axis=1, dtype=np.uint8)
+
+
+def _sff8636_lane_flags(lower: np.ndarray, offset: int) -> np.ndarray:
+    """Two bytes with a nibble per lane, lane 1 in the high nibble of the first byte."""
+    pair = lower[:, offset:offset + 2]
+    nibbles = np.stack((pair >> 4, pair & 0x0F), axis=2).reshape(len(lower), SFF8636_LANES)
+    flags = np.zeros((len(lower), MAX_LANES), dtype=np.uint8)
+    flags[:, :SFF8636_LANES] = _REVERSE_NIBBLE[nibbles]
+    return flags
+
+
+def decode_telemetry(lower: np.ndarray, lane_page: np.ndarray) -> TelemetrySample:
+    """Decode N x 128 byte arrays of the lower page and of CMIS page 11h, one row per port.
+
+    The layout of each row is chosen by its identifier byte, SFF-8636 or CMIS. The Tx bias is decoded with the
+    CMIS bias multiplier of 1.
+    """
+    lower = np.asarray(lower, dtype=np.uint8)
+    lane_page = np.asarray(lane_page, dtype=np.uint8)
+    n = len(lower)
+    sff = np.isin(lower[:, 0], SFF8636_IDENTIFIERS)
+    sff_lanes = sff[:, np.newaxis]
+
+    temperature = np.where(sff, _u16(lower, SFF8636_TEMPERATURE)[:, 0], _u16(lower, CMIS_TEMPERATURE)[:, 0]).astype(np.int16) / 256
+    vcc = np.where(sff, _u16(lower, SFF8636_VCC)[:, 0], _u16(lower, CMIS_VCC)[:, 0]) * 1e-4
+
+    def lanes(sff_offset: int, cmis_offset: int, scale: float) -> np.ndarray:
+        values = np.full((n, MAX_LANES), np.nan)
+        values[:, :SFF8636_LANES] = _u16(lower, sff_offset, SFF8636_LANES)
+        return np.where(sff_lanes, values, _u16(lane_page, cmis_offset, MAX_LANES)) * scale
+
+    module_flags = np.where(
+        sff_lanes,
+        np.stack((_REVERSE_NIBBLE[lower[:, SFF8636_TEMPERATURE_FLAGS] >> 4], _REVERSE_NIBBLE[lower[:, SFF8636_VCC_FLAGS] >> 4]), axis=1),
+        np.stack((lower[:, CMIS_MODULE_FLAGS] & 0x0F, lower[:, CMIS_MODULE_FLAGS] >> 4), axis=1),
+    ).astype(np.uint8)
+
+    return TelemetrySample(
+        temperature=temperature,
+        vcc=vcc,
+        tx_bias=lanes(SFF8636_TX_BIAS, CMIS_TX_BIAS, 2e-3),
+        tx_power=lanes(SFF8636_TX_POWER, CMIS_TX_POWER, 1e-4),
+        rx_power=lanes(SFF8636_RX_POWER, CMIS_RX_POWER, 1e-4),
+        module_flags=module_flags,
+        tx_bias_flags=np.where(sff_lanes, _sff8636_lane_flags(lower, SFF8636_TX_BIAS_FLAGS), _cmis_lane_flags(lane_page, CMIS_TX_BIAS_FLAGS)),
+        tx_power_flags=np.where(sff_lanes, _sff8636_lane_flags(lower, SFF8636_TX_POWER_FLAGS), _cmis_lane_flags(lane_page, CMIS_TX_POWER_FLAGS)),
+        rx_power_flags=np.where(sff_lanes, _sff8636_lane_flags(lower, SFF8636_RX_POWER_FLAGS), _cmis_lane_flags(lane_page, CMIS_RX_POWER_FLAGS)),
+    )
+
+
+def mw_to_dbm(mw: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 10 * np.log10(mw)
+
+#---------------------------
+# TelemetryThresholds
+#---------------------------
+@dataclass
+class TelemetryThresholds:
+    """Limits checked on every sample, None to skip. Powers are in dBm."""
+    temperature_max: Optional[float] = 70.0
+    temperature_min: Optional[float] = 0.0
+    vcc_max: Optional[float] = 3.465
+    vcc_min: Optional[float] = 3.135
+    tx_bias_max: Optional[float] = None
+    tx_power_min: Optional[float] = -8.0
+    rx_power_max: Optional[float] = 4.0
+    rx_power_min: Optional[float] = -12.0
+
+    def evaluate(self, sample: TelemetrySample) -> dict[str, np.ndarray]:
+        """Boolean arrays of the values out of their limits, by limit name. NaN lanes never violate."""
+        values = {
+            "temperature": sample.temperature,
+            "vcc": sample.vcc,
+            "tx_bias": sample.tx_bias,
+            "tx_power": mw_to_dbm(sample.tx_power),
+            "rx_power": mw_to_dbm(sample.rx_power),
+        }
+        violations = {}
+        for name, value in values.items():
+            for suffix, compare in (("max", np.greater), ("min", np.less)):
+                limit = getattr(self, f"{name}_{suffix}", None)
+                if limit is not None:
+                    violations[f"{name}_{suffix}"] = compare(value, limit)
+        return violations
+
+#---------------------------
+# TelemetryTrendStore
+#---------------------------
+class TelemetryTrendStore:
+    """Ring buffer of the last ``capacity`` samples of N ports, in preallocated arrays."""
+
+    def __init__(self, port_count: int, capacity: int) -> None:
+        self.capacity = capacity
+        self.count = 0
+        self._next = 0
+        self.time = np.full(capacity, np.nan)
+        self.temperature = np.full((capacity, port_count), np.nan)
+        self.vcc = np.full((capacity, port_count), np.nan)
+        for name in LANE_FIELDS:
+            setattr(self, name, np.full((capacity, port_count, MAX_LANES), np.nan))
+
+    def append(self, t: float, sample: TelemetrySample) -> None:
+        i = self._next
+        self.time[i] = t
+        self.temperature[i] = sample.temperature
+        self.vcc[i] = sample.vcc
+        for name in LANE_FIELDS:
+            getattr(self, name)[i] = getattr(sample, name)
+        self._next = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def series(self, name: str, last: Optional[int] = None) -> np.ndarray:
+        """The last samples of a field, oldest first."""
+        last = self.count if last is None else min(last, self.count)
+        index = (self._next - last + np.arange(last)) % self.capacity
+        return getattr(self, name)[index]
+
+    def summary(self, name: str, last: Optional[int] = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Minimum, mean and maximum of a field over the last samples, per port (and lane)."""
+        values = self.series(name, last)
+        # the unused lanes of SFF-8636 modules are all NaN
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return np.nanmin(values, axis=0), np.nanmean(values, axis=0), np.nanmax(values, axis=0)
+
+#---------------------------
+# xcvr_telemetry
+#---------------------------
+async def xcvr_telemetry(chassis: str, username: str, port_strs: list[str], duration: float, sample_interval: float, capacity: int, report_interval: int):
+    # configure basic logger
+    logging.basicConfig(
+        format="%(asctime)s  %(message)s",
+        level=logging.DEBUG,
+        handlers=[
+            logging.FileHandler(filename="test.log", mode="a"),
+            logging.StreamHandler()]
+        )
+
+    # Establish connection to a Valkyrie tester
+    async with testers.L23Tester(host=chassis, username=username, password="xena", port=22606, enable_logging=False) as my_tester:
+        logging.info(f"===================================")
+        logging.info(f"{'Connect to chassis:':<20}{chassis}")
+        logging.info(f"{'Username:':<20}{username}")
+
+        port_objs = {}
+        for port_str in port_strs:
+            _mid = int(port_str.split("/")[0])
+            _pid = int(port_str.split("/")[1])
+            module_obj = my_tester.modules.obtain(_mid)
+
+            # commands which used in this example are not supported by Chimera Module
+            if isinstance(module_obj, modules.E100ChimeraModule):
+                logging.info(f"Module {_mid} is a Chimera module, skip port {port_str}")
+                continue
+            port_objs[port_str] = module_obj.ports.obtain(_pid)
+        names = list(port_objs)
+
+        # use high-level func to reserve the ports
+        await mgmt.reserve_ports(ports=list(port_objs.values()))
+
+        engine = TransceiverSnapshotEngine(port_objs, max_burst=MAX_I2C_BURST)
+        trend = TelemetryTrendStore(len(names), capacity)
+        thresholds = TelemetryThresholds()
+
+        # page 11h is only read from CMIS modules, the identifiers are read once
+        identifiers = await engine.snapshot([LOWER_PAGE], names, max_age=0)
+        sff_names = [n for n in names if identifiers[n][LOWER_PAGE][0] in SFF8636_IDENTIFIERS]
+        cmis_names = [n for n in names if n not in sff_names]
+
+        start = time.monotonic()
+        tick = 0
+        while time.monotonic() - start < duration:
+            tick += 1
+            # every sample reads the transceivers, the TTL of the engine is for other readers
+            sff_snapshot, cmis_snapshot = await asyncio.gather(
+                engine.snapshot(SFF8636_TELEMETRY_PAGES, sff_names, max_age=0),
+                engine.snapshot(CMIS_TELEMETRY_PAGES, cmis_names, max_age=0),
+            )
+            snapshot = {**sff_snapshot, **cmis_snapshot}
+            lower = np.frombuffer(b"".join(snapshot[n][LOWER_PAGE] for n in names), dtype=np.uint8).reshape(len(names), -1)
+            lane_page = np.frombuffer(b"".join(snapshot[n].get(CMIS_LANE_PAGE, bytes(PAGE_SIZE)) for n in names), dtype=np.uint8).reshape(len(names), -1)
+            sample = decode_telemetry(lower, lane_page)
+            trend.append(time.monotonic() - start, sample)
+
+            for limit, violated in thresholds.evaluate(sample).items():
+                for index in zip(*np.nonzero(violated)):
+                    lane = f" Lane {index[1]}" if len(index) > 1 else ""
+                    logging.info(f"Port {names[index[0]]}{lane}: {limit} violated")
+            flagged = np.nonzero(sample.module_flags.any(axis=1) | (sample.tx_bias_flags | sample.tx_power_flags | sample.rx_power_flags).any(axis=1))[0]
+            for i in flagged:
+                logging.info(f"Port {names[i]}: module flags {sample.module_flags[i].tolist()}, Tx bias {sample.tx_bias_flags[i].tolist()}, Tx power {sample.tx_power_flags[i].tolist()}, Rx power {sample.rx_power_flags[i].tolist()}")
+
+            if tick % report_interval == 0:
+                t_min, t_mean, t_max = trend.summary("temperature", report_interval)
+                rx_min, _, rx_max = trend.summary("rx_power", report_interval)
+                for i, name in enumerate(names):
+                    logging.info(f"Port {name}: Temperature min/mean/max {t_min[i]:.2f}/{t_mean[i]:.2f}/{t_max[i]:.2f} C, Rx power dBm min {np.round(mw_to_dbm(rx_min[i]), 2).tolist()} max {np.round(mw_to_dbm(rx_max[i]), 2).tolist()}")
+
+            await asyncio.sleep(max(0.0, start + tick * sample_interval - time.monotonic()))
+
+        # Release the ports
+        await mgmt.release_ports(ports=list(port_objs.values()))
+
+async def main():
+    stop_event = asyncio.Event()
+    try:
+        await xcvr_telemetry(
+            chassis=CHASSIS_IP,
+            username=USERNAME,
+            port_strs=PORTS,
+            duration=DURATION,
+            sample_interval=SAMPLE_INTERVAL,
+            capacity=TREND_CAPACITY,
+            report_interval=REPORT_INTERVAL,
+        )
+    except KeyboardInterrupt:
+        stop_event.set()
+
+if __name__ == "__main__":
+    asyncio.run(main())